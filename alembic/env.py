@@ -20,7 +20,9 @@ from app.models.activity import Activity
 from app.models.building import Building
 from app.models.organization import Organization
 from app.models.organization_activity import OrganizationActivity
+from app.models.organization_activity_closure import OrganizationActivityClosure
 from app.models.phone import Phone
+from app.models.table_version import TableVersion
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,43 @@
+"""Add trigram name indexes
+
+Revision ID: 141f93951b27
+Revises: b8aeb8b9e505
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "141f93951b27"
+down_revision: Union[str, Sequence[str], None] = "b8aeb8b9e505"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Триграммы позволяют использовать индекс для ILIKE '%...%'
+    # и для нечеткого поиска по similarity
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+
+    op.execute(
+        """
+        CREATE INDEX ix_organization_name_trgm
+        ON organization
+        USING gin (name gin_trgm_ops);
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX ix_activity_name_trgm
+        ON activity
+        USING gin (name gin_trgm_ops);
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_activity_name_trgm;")
+    op.execute("DROP INDEX IF EXISTS ix_organization_name_trgm;")
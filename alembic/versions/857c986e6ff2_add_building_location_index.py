@@ -0,0 +1,33 @@
+"""Add building location index
+
+Revision ID: 857c986e6ff2
+Revises: 1fe1a3983282
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "857c986e6ff2"
+down_revision: Union[str, Sequence[str], None] = "1fe1a3983282"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # GiST-индекс по координатам здания для предварительного отбора
+    # по ограничивающему прямоугольнику при поиске в радиусе
+    op.execute(
+        """
+        CREATE INDEX ix_building_location
+        ON building
+        USING gist (point(longitude, latitude));
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_building_location;")
@@ -0,0 +1,109 @@
+"""Add building cell
+
+Revision ID: a3c7e19f4d62
+Revises: d69b69a16be5
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "a3c7e19f4d62"
+down_revision: Union[str, Sequence[str], None] = "d69b69a16be5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+
+    # 0. Координаты обязательны (как в модели Building): у здания без координат
+    # нет ячейки, а greatest(NULL, 0) превратил бы его в ячейку 0.
+    # Такие здания не заполняются автоматически: миграция останавливается,
+    # их нужно исправить или удалить вручную
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            missing BIGINT;
+        BEGIN
+            SELECT count(*) INTO missing
+            FROM building
+            WHERE latitude IS NULL OR longitude IS NULL;
+
+            IF missing > 0 THEN
+                RAISE EXCEPTION
+                    'building: зданий без координат (latitude или longitude IS NULL): %',
+                    missing
+                USING HINT = 'Заполните координаты или удалите эти здания и повторите миграцию';
+            END IF;
+        END;
+        $$;
+        """
+    )
+    op.alter_column("building", "latitude", nullable=False)
+    op.alter_column("building", "longitude", nullable=False)
+
+    # 1. Ключ ячейки сетки (quadkey в виде числа, 26 уровней): номера ячейки
+    # по долготе и широте с чередующимися битами. Вычисляется так же,
+    # как app.queries.cell.cell_key
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION building_cell(
+            latitude DOUBLE PRECISION,
+            longitude DOUBLE PRECISION
+        )
+        RETURNS BIGINT AS $$
+        DECLARE
+            x BIGINT := least(greatest(floor((longitude + 180.0) / 360.0 * 67108864.0), 0), 67108863);
+            y BIGINT := least(greatest(floor((latitude + 90.0) / 180.0 * 67108864.0), 0), 67108863);
+        BEGIN
+            x := (x | (x << 16)) & x'0000FFFF0000FFFF'::BIGINT;
+            x := (x | (x << 8)) & x'00FF00FF00FF00FF'::BIGINT;
+            x := (x | (x << 4)) & x'0F0F0F0F0F0F0F0F'::BIGINT;
+            x := (x | (x << 2)) & x'3333333333333333'::BIGINT;
+            x := (x | (x << 1)) & x'5555555555555555'::BIGINT;
+
+            y := (y | (y << 16)) & x'0000FFFF0000FFFF'::BIGINT;
+            y := (y | (y << 8)) & x'00FF00FF00FF00FF'::BIGINT;
+            y := (y | (y << 4)) & x'0F0F0F0F0F0F0F0F'::BIGINT;
+            y := (y | (y << 2)) & x'3333333333333333'::BIGINT;
+            y := (y | (y << 1)) & x'5555555555555555'::BIGINT;
+
+            RETURN (x << 1) | y;
+        END;
+        $$ LANGUAGE plpgsql IMMUTABLE PARALLEL SAFE;
+        """
+    )
+
+    # 2. Столбец вычисляется при любой вставке и обновлении координат.
+    # Добавление STORED-столбца перезаписывает всю таблицу building
+    # под ACCESS EXCLUSIVE: до конца миграции таблица недоступна
+    # ни для чтения, ни для записи. На большой таблице миграцию нужно
+    # выполнять в окно обслуживания
+    op.execute(
+        """
+        ALTER TABLE building
+        ADD COLUMN cell BIGINT NOT NULL
+        GENERATED ALWAYS AS (building_cell(latitude, longitude)) STORED;
+        """
+    )
+
+    # 3. Ячейка любого уровня - диапазон ключей, поэтому подходит B-tree
+    op.create_index("ix_building_cell", "building", ["cell"])
+
+    # 4. Индекс для CLUSTER building: здания соседних ячеек - на соседних
+    # страницах, поиск в радиусе читает меньше страниц таблицы. Сама
+    # перезапись таблицы держит ACCESS EXCLUSIVE и выполняется отдельно,
+    # в окно обслуживания (см. README)
+    op.execute("ALTER TABLE building CLUSTER ON ix_building_cell;")
+
+
+def downgrade() -> None:
+    op.drop_index("ix_building_cell", table_name="building")
+    op.execute("ALTER TABLE building DROP COLUMN IF EXISTS cell;")
+    op.execute("DROP FUNCTION IF EXISTS building_cell(DOUBLE PRECISION, DOUBLE PRECISION);")
+    op.alter_column("building", "longitude", nullable=True)
+    op.alter_column("building", "latitude", nullable=True)
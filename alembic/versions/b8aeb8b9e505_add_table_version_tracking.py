@@ -0,0 +1,74 @@
+"""Add table version tracking
+
+Revision ID: b8aeb8b9e505
+Revises: 857c986e6ff2
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "b8aeb8b9e505"
+down_revision: Union[str, Sequence[str], None] = "857c986e6ff2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+
+    # 1. Таблица версий данных
+    op.create_table(
+        "table_version",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("table_name", sa.String(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default="1"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("table_name"),
+    )
+
+    # 2. Функция увеличивает версию таблицы и уведомляет слушателей
+    # через канал table_version_changed (payload: "<таблица>:<версия>")
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION bump_table_version()
+        RETURNS TRIGGER AS $$
+        DECLARE
+            new_version BIGINT;
+        BEGIN
+            INSERT INTO table_version (table_name, version)
+            VALUES (TG_TABLE_NAME, 1)
+            ON CONFLICT (table_name)
+            DO UPDATE SET version = table_version.version + 1
+            RETURNING version INTO new_version;
+
+            PERFORM pg_notify(
+                'table_version_changed',
+                TG_TABLE_NAME || ':' || new_version
+            );
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+    # 3. Триггер на изменение дерева деятельностей
+    op.execute("INSERT INTO table_version (table_name, version) VALUES ('activity', 1);")
+    op.execute(
+        """
+        CREATE TRIGGER bump_activity_version
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON activity
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION bump_table_version();
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS bump_activity_version ON activity;")
+    op.execute("DROP FUNCTION IF EXISTS bump_table_version();")
+    op.drop_table("table_version")
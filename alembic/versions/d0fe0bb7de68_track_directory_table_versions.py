@@ -0,0 +1,43 @@
+"""Track directory table versions
+
+Revision ID: d0fe0bb7de68
+Revises: 141f93951b27
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "d0fe0bb7de68"
+down_revision: Union[str, Sequence[str], None] = "141f93951b27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TABLES = ("building", "organization", "organization_activity", "phone")
+
+
+def upgrade() -> None:
+    # Версии и уведомления об изменениях для всех таблиц справочника
+    # (для activity триггер уже создан)
+    for table_name in TABLES:
+        op.execute(
+            f"INSERT INTO table_version (table_name, version) VALUES ('{table_name}', 1);"
+        )
+        op.execute(
+            f"""
+            CREATE TRIGGER bump_{table_name}_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table_name}
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION bump_table_version();
+            """
+        )
+
+
+def downgrade() -> None:
+    for table_name in TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS bump_{table_name}_version ON {table_name};")
+        op.execute(f"DELETE FROM table_version WHERE table_name = '{table_name}';")
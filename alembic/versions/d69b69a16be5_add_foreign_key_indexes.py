@@ -0,0 +1,69 @@
+"""Add foreign key indexes
+
+Revision ID: d69b69a16be5
+Revises: eff48e66a0ff
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = "d69b69a16be5"
+down_revision: Union[str, Sequence[str], None] = "eff48e66a0ff"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+
+    # 1. Организации в зданиях (фильтр building_ids, поиск по радиусу)
+    op.create_index(
+        "ix_organization_building_id",
+        "organization",
+        ["building_id"],
+    )
+
+    # 2. Виды деятельности организации: оба направления связи,
+    # второй столбец делает индексы покрывающими
+    op.create_index(
+        "ix_organization_activity_organization_id",
+        "organization_activity",
+        ["organization_id", "activity_id"],
+    )
+    op.create_index(
+        "ix_organization_activity_activity_id",
+        "organization_activity",
+        ["activity_id", "organization_id"],
+    )
+
+    # 3. Телефоны организации в порядке id, номер читается из индекса
+    op.create_index(
+        "ix_phone_organization_id",
+        "phone",
+        ["organization_id", "id"],
+        postgresql_include=["phone_number"],
+    )
+
+    # 4. Дочерние виды деятельности (обход дерева, проверка внешнего ключа)
+    op.create_index(
+        "ix_activity_parent_id",
+        "activity",
+        ["parent_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_activity_parent_id", table_name="activity")
+    op.drop_index("ix_phone_organization_id", table_name="phone")
+    op.drop_index(
+        "ix_organization_activity_activity_id",
+        table_name="organization_activity",
+    )
+    op.drop_index(
+        "ix_organization_activity_organization_id",
+        table_name="organization_activity",
+    )
+    op.drop_index("ix_organization_building_id", table_name="organization")
@@ -0,0 +1,215 @@
+"""Add organization activity closure
+
+Revision ID: eff48e66a0ff
+Revises: d0fe0bb7de68
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "eff48e66a0ff"
+down_revision: Union[str, Sequence[str], None] = "d0fe0bb7de68"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+
+    # 1. Таблица: организация -> каждый предок каждого ее вида деятельности
+    op.create_table(
+        "organization_activity_closure",
+        sa.Column("activity_id", sa.Integer(), nullable=False),
+        sa.Column("organization_id", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("activity_id", "organization_id"),
+    )
+    op.create_index(
+        "ix_organization_activity_closure_organization_id",
+        "organization_activity_closure",
+        ["organization_id"],
+    )
+
+    # 2. Пересчет замыкания для указанных организаций
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION refresh_organization_activity_closure(
+            organization_ids INTEGER[]
+        )
+        RETURNS VOID AS $$
+        BEGIN
+            IF cardinality(organization_ids) = 0 THEN
+                RETURN;
+            END IF;
+
+            -- Пересчет одной организации в параллельных транзакциях идет по очереди:
+            -- иначе DELETE второй не видит строк, вставленных первой.
+            -- Блокируются строки организаций: в отличие от advisory-блокировок
+            -- их число не ограничено max_locks_per_transaction (массовая привязка).
+            -- Строки блокируются в порядке ID, чтобы не было взаимоблокировок.
+            PERFORM 1
+            FROM organization
+            WHERE id = ANY(organization_ids)
+            ORDER BY id
+            FOR NO KEY UPDATE;
+
+            DELETE FROM organization_activity_closure
+            WHERE organization_id = ANY(organization_ids);
+
+            INSERT INTO organization_activity_closure (activity_id, organization_id)
+            WITH RECURSIVE ancestors (organization_id, activity_id, parent_id) AS (
+                SELECT oa.organization_id, a.id, a.parent_id
+                FROM organization_activity oa
+                JOIN activity a ON a.id = oa.activity_id
+                WHERE oa.organization_id = ANY(organization_ids)
+                UNION
+                SELECT ancestors.organization_id, a.id, a.parent_id
+                FROM ancestors
+                JOIN activity a ON a.id = ancestors.parent_id
+            )
+            SELECT DISTINCT activity_id, organization_id
+            FROM ancestors
+            ON CONFLICT DO NOTHING;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+    # 3. Изменение связей: пересчитываем затронутые организации
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION organization_activity_closure_on_link()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM refresh_organization_activity_closure(ARRAY(
+                    SELECT DISTINCT organization_id FROM new_links
+                    WHERE organization_id IS NOT NULL
+                ));
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM refresh_organization_activity_closure(ARRAY(
+                    SELECT DISTINCT organization_id FROM old_links
+                    WHERE organization_id IS NOT NULL
+                ));
+            ELSE
+                PERFORM refresh_organization_activity_closure(ARRAY(
+                    SELECT organization_id FROM old_links
+                    WHERE organization_id IS NOT NULL
+                    UNION
+                    SELECT organization_id FROM new_links
+                    WHERE organization_id IS NOT NULL
+                ));
+            END IF;
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+    # 4. Изменение parent_id: пересчитываем организации всего поддерева
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION organization_activity_closure_on_activity()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            PERFORM refresh_organization_activity_closure(ARRAY(
+                WITH RECURSIVE subtree (id) AS (
+                    SELECT new_activities.id
+                    FROM new_activities
+                    JOIN old_activities ON old_activities.id = new_activities.id
+                    WHERE old_activities.parent_id IS DISTINCT FROM new_activities.parent_id
+                    UNION
+                    SELECT a.id
+                    FROM activity a
+                    JOIN subtree ON a.parent_id = subtree.id
+                )
+                SELECT DISTINCT oa.organization_id
+                FROM organization_activity oa
+                JOIN subtree ON subtree.id = oa.activity_id
+                WHERE oa.organization_id IS NOT NULL
+            ));
+
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION organization_activity_closure_on_truncate()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            TRUNCATE organization_activity_closure;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """
+    )
+
+    # Таблицы переходов разрешены только для триггеров на одно событие
+    for event, referencing in (
+        ("INSERT", "NEW TABLE AS new_links"),
+        ("UPDATE", "OLD TABLE AS old_links NEW TABLE AS new_links"),
+        ("DELETE", "OLD TABLE AS old_links"),
+    ):
+        op.execute(
+            f"""
+            CREATE TRIGGER organization_activity_closure_{event.lower()}
+            AFTER {event} ON organization_activity
+            REFERENCING {referencing}
+            FOR EACH STATEMENT
+            EXECUTE FUNCTION organization_activity_closure_on_link();
+            """
+        )
+    op.execute(
+        """
+        CREATE TRIGGER organization_activity_closure_truncate
+        AFTER TRUNCATE ON organization_activity
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION organization_activity_closure_on_truncate();
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER organization_activity_closure_update
+        AFTER UPDATE ON activity
+        REFERENCING OLD TABLE AS old_activities NEW TABLE AS new_activities
+        FOR EACH STATEMENT
+        EXECUTE FUNCTION organization_activity_closure_on_activity();
+        """
+    )
+
+    # 5. Начальное заполнение
+    op.execute(
+        """
+        SELECT refresh_organization_activity_closure(ARRAY(
+            SELECT DISTINCT organization_id FROM organization_activity
+            WHERE organization_id IS NOT NULL
+        ));
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS organization_activity_closure_update ON activity;")
+    for event in ("insert", "update", "delete", "truncate"):
+        op.execute(
+            f"DROP TRIGGER IF EXISTS organization_activity_closure_{event} "
+            "ON organization_activity;"
+        )
+    op.execute("DROP FUNCTION IF EXISTS organization_activity_closure_on_truncate();")
+    op.execute("DROP FUNCTION IF EXISTS organization_activity_closure_on_activity();")
+    op.execute("DROP FUNCTION IF EXISTS organization_activity_closure_on_link();")
+    op.execute(
+        "DROP FUNCTION IF EXISTS refresh_organization_activity_closure(INTEGER[]);"
+    )
+    op.drop_index(
+        "ix_organization_activity_closure_organization_id",
+        table_name="organization_activity_closure",
+    )
+    op.drop_table("organization_activity_closure")
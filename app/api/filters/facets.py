@@ -0,0 +1,35 @@
+from typing import Literal, get_args
+
+from pydantic import BaseModel, Field, computed_field
+
+Facet = Literal["activity", "building"]
+
+# Все фасеты в порядке вывода в ответе
+FACETS: tuple[Facet, ...] = get_args(Facet)
+
+
+class FacetsSchema(BaseModel):
+    """Схема для запроса количества организаций по группам (фасетов)."""
+
+    facets: str | None = Field(
+        default=None,
+        description="Группы через запятую: activity (виды деятельности "
+        "верхнего уровня), building (здания)",
+    )
+
+    @computed_field
+    @property
+    def facets_list(
+        self,
+    ) -> list[str] | None:
+        return (
+            list(
+                dict.fromkeys(
+                    facet.strip()
+                    for facet in self.facets.split(",")
+                    if facet.strip()
+                )
+            )
+            if self.facets
+            else None
+        )
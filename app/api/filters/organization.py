@@ -1,4 +1,6 @@
-from pydantic import BaseModel, computed_field
+from typing import Literal
+
+from pydantic import BaseModel, Field, computed_field
 
 
 class OrganizationFilterSchema(BaseModel):
@@ -7,12 +9,19 @@ class OrganizationFilterSchema(BaseModel):
     organization_ids: str | None = None
     building_ids: str | None = None
     activity_ids: str | None = None
+    include_activity_descendants: bool = False
     search_str: str | None = None
+    search_mode: Literal["substring", "fuzzy"] = "substring"
     activity_search_str: str | None = None
 
     latitude: float | None = None
     longitude: float | None = None
     radius: float | None = None
+    nearest: int | None = Field(default=None, ge=1, le=1000)
+    bbox: str | None = Field(
+        default=None,
+        description="Область карты: minLon,minLat,maxLon,maxLat",
+    )
 
     @computed_field
     @property
@@ -44,6 +53,19 @@ class OrganizationFilterSchema(BaseModel):
             else None
         )
 
+    @computed_field
+    @property
+    def bbox_list(
+        self,
+    ) -> list[float] | None:
+        if not self.bbox:
+            return None
+        try:
+            values = [float(value) for value in self.bbox.split(",")]
+        except ValueError:
+            return None
+        return values if len(values) == 4 else None
+
     @computed_field
     @property
     def activity_ids_list(
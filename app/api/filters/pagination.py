@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class PaginationSchema(BaseModel):
+    """Схема для курсорной пагинации."""
+
+    limit: int = Field(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+    cursor: str | None = None
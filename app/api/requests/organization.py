@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+
+MAX_BATCH_SIZE = 500
+
+
+class OrganizationsBatchGetRequest(BaseModel):
+    """Схема запроса пакетного получения организаций."""
+
+    ids: list[int] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
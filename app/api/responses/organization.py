@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 from app.api.responses.activity import ActivityResponse
 from app.api.responses.building import BuildingResponse
@@ -14,6 +14,18 @@ class OrganizationResponse(BaseModel):
     building: BuildingResponse
     phones: list[str] | None = None
     activities: list[ActivityResponse] | None = None
+    distance: float | None = Field(
+        default=None,
+        description="Расстояние до точки поиска (км), только в режиме nearest",
+    )
+
+
+class OrganizationFacetValueResponse(BaseModel):
+    """Схема одного значения фасета."""
+
+    id: int
+    name: str = Field(description="Название деятельности или адрес здания")
+    count: int = Field(description="Количество организаций по фильтрам")
 
 
 class OrganizationsListResponse(BaseModel):
@@ -22,3 +34,41 @@ class OrganizationsListResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
     results: list[OrganizationResponse]
+    next_cursor: str | None = None
+    facets: dict[str, list[OrganizationFacetValueResponse]] | None = Field(
+        default=None,
+        description="Количество организаций по значениям фасетов "
+        "(по всем фильтрам, без учета пагинации), только если передан facets",
+    )
+
+
+class OrganizationClusterResponse(BaseModel):
+    """Схема одной ячейки сетки с организациями."""
+
+    cell: int = Field(description="Ключ ячейки на уровне zoom")
+    count: int
+    latitude: float = Field(description="Средняя широта зданий организаций ячейки")
+    longitude: float = Field(description="Средняя долгота зданий организаций ячейки")
+    bbox: list[float] = Field(description="Границы ячейки: minLon, minLat, maxLon, maxLat")
+
+
+class OrganizationClustersResponse(BaseModel):
+    """Схема количества организаций по ячейкам сетки."""
+
+    zoom: int
+    total: int
+    clusters: list[OrganizationClusterResponse]
+
+
+class OrganizationBatchItemResponse(BaseModel):
+    """Схема результата пакетного получения для одного ID."""
+
+    id: int
+    found: bool
+    organization: OrganizationResponse | None = None
+
+
+class OrganizationsBatchGetResponse(BaseModel):
+    """Схема ответа пакетного получения организаций (в порядке запроса)."""
+
+    results: list[OrganizationBatchItemResponse]
@@ -1,13 +1,25 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Header, Query, status
+from fastapi.responses import Response, StreamingResponse
 
+from app.api.filters.facets import FacetsSchema
 from app.api.filters.organization import OrganizationFilterSchema
+from app.api.filters.pagination import PaginationSchema
+from app.api.requests.organization import OrganizationsBatchGetRequest
 from app.api.responses.organization import (
+    OrganizationClustersResponse,
+    OrganizationsBatchGetResponse,
     OrganizationsListResponse,
     OrganizationResponse,
 )
 from app.authentication import check_permission
+from app.cache.etag import etag_matches
+from app.queries.cell import CELL_LEVELS
 from app.services.organization import OrganizationService
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+JSON_MEDIA_TYPE = "application/json"
+
 organization_router = APIRouter(
     tags=["Organizations"],
     dependencies=[Depends(check_permission)],
@@ -19,15 +31,116 @@ organization_router = APIRouter(
     name="Get organizations list",
     status_code=status.HTTP_200_OK,
     response_model=OrganizationsListResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {NDJSON_MEDIA_TYPE: {}},
+            "description": "При stream=true или Accept: application/x-ndjson "
+            "все организации отдаются потоком, по одной в строке.",
+        },
+        status.HTTP_304_NOT_MODIFIED: {
+            "description": "Данные не изменились (If-None-Match совпал с ETag).",
+        },
+    },
 )
 async def get_organizations(
     filters: OrganizationFilterSchema = Depends(),
+    pagination: PaginationSchema = Depends(),
+    facets: FacetsSchema = Depends(),
+    stream: bool = False,
+    accept: str | None = Header(default=None, include_in_schema=False),
+    if_none_match: str | None = Header(default=None),
     service: OrganizationService = Depends(),
-) -> OrganizationsListResponse:
+) -> Response:
     """Получить организации."""
 
-    return await service.get_organizations(
+    if stream or (accept and NDJSON_MEDIA_TYPE in accept):
+        return StreamingResponse(
+            service.stream_organizations(filters=filters),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+
+    etag = service.get_organizations_etag(
         filters=filters,
+        pagination=pagination,
+        facets=facets,
+    )
+    if etag and etag_matches(if_none_match, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag},
+        )
+
+    return Response(
+        content=await service.get_organizations(
+            filters=filters,
+            pagination=pagination,
+            facets=facets,
+        ),
+        media_type=JSON_MEDIA_TYPE,
+        headers={"ETag": etag} if etag else None,
+    )
+
+
+@organization_router.get(
+    path="/organizations:clusters",
+    name="Get organization clusters",
+    status_code=status.HTTP_200_OK,
+    response_model=OrganizationClustersResponse,
+    responses={
+        status.HTTP_304_NOT_MODIFIED: {
+            "description": "Данные не изменились (If-None-Match совпал с ETag).",
+        },
+    },
+)
+async def get_organization_clusters(
+    zoom: int = Query(
+        ge=0,
+        le=CELL_LEVELS,
+        description="Уровень сетки: 2**zoom ячеек по долготе и по широте",
+    ),
+    filters: OrganizationFilterSchema = Depends(),
+    if_none_match: str | None = Header(default=None),
+    service: OrganizationService = Depends(),
+) -> Response:
+    """Получить количество организаций по ячейкам сетки (для карты)."""
+
+    etag = service.get_organization_clusters_etag(
+        filters=filters,
+        zoom=zoom,
+    )
+    if etag and etag_matches(if_none_match, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag},
+        )
+
+    return Response(
+        content=await service.get_organization_clusters(
+            filters=filters,
+            zoom=zoom,
+        ),
+        media_type=JSON_MEDIA_TYPE,
+        headers={"ETag": etag} if etag else None,
+    )
+
+
+@organization_router.post(
+    path="/organizations:batchGet",
+    name="Batch get organizations",
+    status_code=status.HTTP_200_OK,
+    response_model=OrganizationsBatchGetResponse,
+)
+async def batch_get_organizations(
+    request: OrganizationsBatchGetRequest,
+    service: OrganizationService = Depends(),
+) -> Response:
+    """Получить организации по списку ID (результаты в порядке запроса)."""
+
+    return Response(
+        content=await service.batch_get_organizations(
+            organization_ids=request.ids,
+        ),
+        media_type=JSON_MEDIA_TYPE,
     )
 
 
@@ -36,13 +149,40 @@ async def get_organizations(
     name="Get organization detail",
     status_code=status.HTTP_200_OK,
     response_model=OrganizationResponse,
+    responses={
+        status.HTTP_304_NOT_MODIFIED: {
+            "description": "Данные не изменились (If-None-Match совпал с ETag).",
+        },
+    },
 )
 async def get_organization(
     organization_id: int,
+    if_none_match: str | None = Header(default=None),
     service: OrganizationService = Depends(),
-) -> OrganizationResponse:
+) -> Response:
     """Получить детальную информацию об организации."""
 
-    return await service.get_organization(
+    etag = service.get_organization_etag(
         organization_id=organization_id,
     )
+    # "*" до загрузки не учитывается: организации может не быть (404)
+    if etag and etag_matches(if_none_match, etag, match_any=False):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag},
+        )
+
+    content = await service.get_organization(
+        organization_id=organization_id,
+    )
+    if etag and etag_matches(if_none_match, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag},
+        )
+
+    return Response(
+        content=content,
+        media_type=JSON_MEDIA_TYPE,
+        headers={"ETag": etag} if etag else None,
+    )
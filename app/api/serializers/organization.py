@@ -0,0 +1,142 @@
+import json
+from collections.abc import Iterable
+from typing import Any
+
+import sqlalchemy as sa
+
+from app.queries.cell import cell_bounds
+
+# Точность средних координат ячейки: сумма в БД накапливается
+# в произвольном порядке, последние знаки не стабильны
+CLUSTER_COORDINATE_DIGITS = 6
+
+
+def dump_json(content: Any) -> bytes:
+    """Сериализовать в JSON так же, как это делает JSONResponse."""
+
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def organization_to_dict(
+    row: sa.Row,
+) -> dict[str, Any]:
+    """Преобразовать строку запроса организаций в структуру OrganizationResponse.
+
+    Порядок и значения полей совпадают с OrganizationResponse, поэтому
+    результат не нужно повторно валидировать. Поле distance выводится
+    только в режиме nearest.
+    """
+
+    organization = {
+        "id": row.id,
+        "name": row.name,
+        "building": {
+            "id": row.building_id,
+            "address": row.building_address,
+            "latitude": row.building_latitude,
+            "longitude": row.building_longitude,
+        },
+        "phones": list(row.phones) if row.phones else None,
+        # Объекты собраны json_build_object в порядке полей ActivityResponse
+        "activities": row.activities or None,
+    }
+
+    # Расстояние есть только в режиме nearest
+    distance = getattr(row, "distance", None)
+    if distance is not None:
+        organization["distance"] = distance
+
+    return organization
+
+
+def dump_organizations_list(
+    rows: Iterable[sa.Row],
+    next_cursor: str | None,
+    facets: dict[str, Iterable[sa.Row]] | None = None,
+) -> bytes:
+    """Сериализовать OrganizationsListResponse.
+
+    Поле facets выводится, только если фасеты запрошены.
+    """
+
+    content = {
+        "results": [organization_to_dict(row) for row in rows],
+        "next_cursor": next_cursor,
+    }
+    if facets is not None:
+        content["facets"] = {
+            facet: [
+                {"id": row.id, "name": row.name, "count": row.count}
+                for row in facet_rows
+            ]
+            for facet, facet_rows in facets.items()
+        }
+    return dump_json(content)
+
+
+def dump_organization(
+    row: sa.Row,
+) -> bytes:
+    """Сериализовать OrganizationResponse."""
+
+    return dump_json(organization_to_dict(row))
+
+
+def dump_organizations_batch(
+    organization_ids: Iterable[int],
+    rows: Iterable[sa.Row],
+) -> bytes:
+    """Сериализовать OrganizationsBatchGetResponse в порядке запрошенных ID."""
+
+    organizations = {row.id: organization_to_dict(row) for row in rows}
+    return dump_json(
+        {
+            "results": [
+                {
+                    "id": organization_id,
+                    "found": organization_id in organizations,
+                    "organization": organizations.get(organization_id),
+                }
+                for organization_id in organization_ids
+            ],
+        }
+    )
+
+
+def dump_organization_clusters(
+    zoom: int,
+    rows: Iterable[sa.Row],
+) -> bytes:
+    """Сериализовать OrganizationClustersResponse."""
+
+    clusters = [
+        {
+            "cell": row.cell,
+            "count": row.count,
+            "latitude": round(row.latitude, CLUSTER_COORDINATE_DIGITS),
+            "longitude": round(row.longitude, CLUSTER_COORDINATE_DIGITS),
+            "bbox": list(cell_bounds(row.cell, zoom)),
+        }
+        for row in rows
+    ]
+    return dump_json(
+        {
+            "zoom": zoom,
+            "total": sum(cluster["count"] for cluster in clusters),
+            "clusters": clusters,
+        }
+    )
+
+
+def dump_organizations_ndjson(
+    rows: Iterable[sa.Row],
+) -> bytes:
+    """Сериализовать организации в NDJSON (по одной в строке)."""
+
+    return b"".join(dump_organization(row) + b"\n" for row in rows)
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import re
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from app.database import async_session
+from app.repositories.activity import ActivityRepository
+from app.repositories.table_version import TableVersionRepository
+
+logger = logging.getLogger(__name__)
+
+
+def ilike_regex(pattern: str) -> re.Pattern:
+    """Преобразовать шаблон ILIKE в регулярное выражение."""
+
+    parts = []
+    characters = iter(pattern)
+    for character in characters:
+        if character == "\\":
+            parts.append(re.escape(next(characters, "\\")))
+        elif character == "%":
+            parts.append(".*")
+        elif character == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(character))
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+@dataclass(frozen=True)
+class ActivityTreeSnapshot:
+    """Снимок дерева деятельностей."""
+
+    version: int
+    names: dict[int, str]
+    parents: dict[int, int | None]
+    children: dict[int, tuple[int, ...]]
+    descendants: dict[int, frozenset[int]]
+
+    @classmethod
+    def build(
+        cls,
+        activities: Iterable,
+        version: int,
+    ) -> "ActivityTreeSnapshot":
+        """Построить снимок по строкам (id, name, parent_id)."""
+
+        names = {}
+        parents = {}
+        children: dict[int, list[int]] = {}
+        for activity in activities:
+            names[activity.id] = activity.name
+            parents[activity.id] = activity.parent_id
+            children.setdefault(activity.id, [])
+            if activity.parent_id is not None:
+                children.setdefault(activity.parent_id, []).append(activity.id)
+
+        descendants: dict[int, frozenset[int]] = {}
+
+        def collect(activity_id: int) -> frozenset[int]:
+            if activity_id not in descendants:
+                result = {activity_id}
+                for child_id in children.get(activity_id, []):
+                    result |= collect(child_id)
+                descendants[activity_id] = frozenset(result)
+            return descendants[activity_id]
+
+        for activity_id in names:
+            collect(activity_id)
+
+        return cls(
+            version=version,
+            names=names,
+            parents=parents,
+            children={key: tuple(value) for key, value in children.items()},
+            descendants=descendants,
+        )
+
+    def expand(
+        self,
+        activity_ids: Iterable[int],
+    ) -> set[int]:
+        """Получить виды деятельности вместе со всеми их потомками."""
+
+        result = set()
+        for activity_id in activity_ids:
+            result |= self.descendants.get(activity_id, {activity_id})
+        return result
+
+    def root(
+        self,
+        activity_id: int,
+    ) -> int:
+        """Получить вид деятельности верхнего уровня, к дереву которого относится activity_id."""
+
+        parent_id = self.parents.get(activity_id)
+        while parent_id is not None:
+            activity_id, parent_id = parent_id, self.parents.get(parent_id)
+        return activity_id
+
+    def match(
+        self,
+        activity_search_str: str,
+    ) -> set[int]:
+        """Найти виды деятельности по названию (как ILIKE '%...%') без потомков."""
+
+        pattern = ilike_regex(f"%{activity_search_str}%")
+        return {
+            activity_id
+            for activity_id, name in self.names.items()
+            if name is not None and pattern.fullmatch(name)
+        }
+
+    def search(
+        self,
+        activity_search_str: str,
+    ) -> set[int]:
+        """Найти виды деятельности по названию (как ILIKE '%...%') с потомками."""
+
+        return self.expand(self.match(activity_search_str))
+
+
+class ActivityTreeCache:
+    """Кеш дерева деятельностей в памяти процесса."""
+
+    table_name = "activity"
+
+    def __init__(self):
+        self.snapshot: ActivityTreeSnapshot | None = None
+        self._lock = asyncio.Lock()
+
+    async def load(self) -> None:
+        """Загрузить снимок дерева из БД."""
+
+        async with self._lock:
+            async with async_session() as session:
+                # Версию читаем до данных: если дерево изменится между
+                # запросами, придет уведомление с большей версией.
+                version = await TableVersionRepository(session).get_version(
+                    table_name=self.table_name,
+                )
+                activities = await ActivityRepository(session).get_activities()
+
+            self.snapshot = ActivityTreeSnapshot.build(
+                activities=activities,
+                version=version,
+            )
+
+    def current(
+        self,
+        versions: dict[str, int] | None,
+    ) -> ActivityTreeSnapshot | None:
+        """Снимок, если он соответствует версии таблицы activity, иначе None.
+
+        После уведомления дерево перезагружается в фоне; до конца загрузки
+        поиск выполняется в БД, иначе ответ по старому дереву попал бы
+        в кеш под новыми версиями.
+        """
+
+        snapshot = self.snapshot
+        if (
+            snapshot is None
+            or versions is None
+            or snapshot.version != versions.get(self.table_name)
+        ):
+            return None
+        return snapshot
+
+    async def on_change(
+        self,
+        version: int | None,
+    ) -> None:
+        """Обновить снимок после изменения таблицы activity."""
+
+        if (
+            version is not None
+            and self.snapshot is not None
+            and self.snapshot.version >= version
+        ):
+            return
+
+        try:
+            await self.load()
+        except Exception:
+            # Устаревший снимок хуже его отсутствия: без снимка поиск
+            # выполняется рекурсивным запросом в БД.
+            self.snapshot = None
+            logger.exception("Не удалось обновить дерево деятельностей")
+
+
+activity_tree_cache = ActivityTreeCache()
@@ -0,0 +1,725 @@
+import asyncio
+import logging
+import math
+from array import array
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, replace
+from itertools import chain
+from typing import Any, NamedTuple
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache.activity_tree import ActivityTreeSnapshot, ilike_regex
+from app.cache.id_set import IdFilter, IdSet, intersect_filters
+from app.cache.table_versions import DIRECTORY_TABLES
+from app.cache.trigram import (
+    DEFAULT_SIMILARITY_THRESHOLD,
+    similarity,
+    substring_trigrams,
+    word_trigrams,
+)
+from app.cache.vectors import BuildingOrganizations, BuildingVectors, numpy
+from app.database import async_session
+from app.queries.building import (
+    EARTH_RADIUS_KM,
+    MAX_DISTANCE_KM,
+    radius_bounding_boxes,
+)
+from app.repositories.activity import ActivityRepository
+from app.repositories.building import BuildingRepository
+from app.repositories.organization import OrganizationRepository
+from app.repositories.organization_activity import OrganizationActivityRepository
+from app.repositories.phone import PhoneRepository
+from app.repositories.table_version import TableVersionRepository
+
+logger = logging.getLogger(__name__)
+
+# Размер ячейки сетки зданий (градусы)
+GRID_CELL_DEGREES = 0.1
+
+# Как в radians() Postgres: расстояния совпадают с SQL до последнего бита
+RADIANS_PER_DEGREE = 0.0174532925199432957692
+
+
+def haversine_distance(
+    latitude: float,
+    longitude: float,
+    building_latitude: float,
+    building_longitude: float,
+) -> float:
+    """Расстояние (км) по формуле гаверсинуса.
+
+    Операции и их порядок те же, что в app.queries.building.haversine_distance.
+    """
+
+    latitude_radians = latitude * RADIANS_PER_DEGREE
+    building_latitude_radians = building_latitude * RADIANS_PER_DEGREE
+    cosine = math.cos(latitude_radians) * math.cos(building_latitude_radians) * math.cos(
+        building_longitude * RADIANS_PER_DEGREE - longitude * RADIANS_PER_DEGREE
+    ) + math.sin(latitude_radians) * math.sin(building_latitude_radians)
+    return EARTH_RADIUS_KM * math.acos(min(max(cosine, -1.0), 1.0))
+
+
+def _cell(value: float) -> int:
+    return math.floor(value / GRID_CELL_DEGREES)
+
+
+def _in_box(latitude: float, longitude: float, box: tuple[float, float, float, float]) -> bool:
+    min_longitude, min_latitude, max_longitude, max_latitude = box
+    return min_longitude <= longitude <= max_longitude and min_latitude <= latitude <= max_latitude
+
+
+def _union(id_sets: Iterable[IdSet]) -> IdSet:
+    return IdSet.from_iterable(chain.from_iterable(id_sets))
+
+
+class OrganizationRow(NamedTuple):
+    """Строка организации с теми же полями, что у запроса OrganizationQueryPlanner."""
+
+    id: int
+    name: str
+    building_id: int
+    building_address: str
+    building_latitude: float
+    building_longitude: float
+    activities: list[dict[str, Any]] | None
+    phones: tuple[str, ...] | None
+    distance: float | None = None
+
+
+@dataclass(frozen=True)
+class ActivityIndex:
+    """Дерево деятельностей и порядок их названий (как ORDER BY name в БД)."""
+
+    version: int
+    tree: ActivityTreeSnapshot
+    order: dict[int, int]
+
+    @classmethod
+    async def load(cls, session: AsyncSession, version: int) -> "ActivityIndex":
+        repository = ActivityRepository(session)
+        activities = await repository.get_activities()
+        # Порядок берется из БД: сортировка Python не совпадает с правилами сортировки БД
+        order = {
+            activity_id: position
+            for position, activity_id in enumerate(
+                await repository.get_activity_ids_by_name()
+            )
+        }
+        return cls(
+            version=version,
+            tree=ActivityTreeSnapshot.build(activities=activities, version=version),
+            order=order,
+        )
+
+
+@dataclass(frozen=True)
+class BuildingIndex:
+    """Здания: колонки в порядке ID и сетка ячеек по координатам."""
+
+    version: int
+    ids: array
+    addresses: list[str]
+    latitudes: array
+    longitudes: array
+    # Ключи ячеек сетки (building.cell)
+    cells: array
+    positions: dict[int, int]
+    # (ячейка долготы, ячейка широты) -> позиции зданий в колонках
+    grid: dict[tuple[int, int], array]
+    # Колонки numpy для векторного поиска (None, если numpy не установлен)
+    vectors: BuildingVectors | None
+
+    @classmethod
+    async def load(cls, session: AsyncSession, version: int) -> "BuildingIndex":
+        rows = await BuildingRepository(session).get_buildings()
+        return await asyncio.to_thread(cls.build, rows, version)
+
+    @classmethod
+    def build(cls, rows: Iterable, version: int) -> "BuildingIndex":
+        ids = array("i")
+        addresses = []
+        latitudes = array("d")
+        longitudes = array("d")
+        cells = array("q")
+        grid: dict[tuple[int, int], array] = {}
+        for position, row in enumerate(rows):
+            ids.append(row.id)
+            addresses.append(row.address)
+            latitudes.append(row.latitude)
+            longitudes.append(row.longitude)
+            cells.append(row.cell)
+            grid.setdefault((_cell(row.longitude), _cell(row.latitude)), array("i")).append(
+                position
+            )
+
+        return cls(
+            version=version,
+            ids=ids,
+            addresses=addresses,
+            latitudes=latitudes,
+            longitudes=longitudes,
+            cells=cells,
+            positions={building_id: position for position, building_id in enumerate(ids)},
+            grid=grid,
+            vectors=(
+                None if numpy is None else BuildingVectors.build(ids, latitudes, longitudes)
+            ),
+        )
+
+    def in_radius(
+        self,
+        latitude: float,
+        longitude: float,
+        radius: float,
+    ) -> dict[int, float]:
+        """Здания в радиусе (как in_radius_condition): ID -> расстояние (км)."""
+
+        if self.vectors is not None:
+            return {
+                self.ids[position]: haversine_distance(
+                    latitude, longitude, self.latitudes[position], self.longitudes[position]
+                )
+                for position in self.positions_in_radius(latitude, longitude, radius).tolist()
+            }
+
+        boxes = radius_bounding_boxes(latitude=latitude, longitude=longitude, radius=radius)
+        if radius >= MAX_DISTANCE_KM:
+            positions = range(len(self.ids))
+        else:
+            positions = chain.from_iterable(map(self._positions_in_box, boxes))
+
+        result = {}
+        for position in positions:
+            distance = self.distance_within(position, latitude, longitude, radius, boxes)
+            if distance is not None:
+                result[self.ids[position]] = distance
+        return result
+
+    def in_boxes(self, boxes: list[tuple[float, float, float, float]]) -> list[int]:
+        """ID зданий в прямоугольниках (как bounding_boxes_condition)."""
+
+        return [
+            self.ids[position]
+            for box in boxes
+            for position in self._positions_in_box(box)
+            if _in_box(self.latitudes[position], self.longitudes[position], box)
+        ]
+
+    def positions_in_radius(
+        self,
+        latitude: float,
+        longitude: float,
+        radius: float,
+    ):
+        """Позиции зданий в радиусе (массив numpy, только при self.vectors).
+
+        Прямоугольник и расстояние проверяются векторно; здания у самой
+        границы круга перепроверяются distance_within, поэтому результат
+        совпадает с in_radius_condition.
+        """
+
+        boxes = radius_bounding_boxes(latitude=latitude, longitude=longitude, radius=radius)
+        positions = self.vectors.positions_in_boxes(boxes)
+        if radius >= MAX_DISTANCE_KM:
+            return positions
+
+        inside, border = self.vectors.split_by_radius(positions, latitude, longitude, radius)
+        if not len(border):
+            return inside
+        return numpy.concatenate(
+            (
+                inside,
+                numpy.array(
+                    [
+                        position
+                        for position in border.tolist()
+                        if self.distance_within(position, latitude, longitude, radius, boxes)
+                        is not None
+                    ],
+                    dtype=inside.dtype,
+                ),
+            )
+        )
+
+    def distance_within(
+        self,
+        position: int,
+        latitude: float,
+        longitude: float,
+        radius: float,
+        boxes: list[tuple[float, float, float, float]],
+    ) -> float | None:
+        """Расстояние (км) до здания в позиции position, если оно в радиусе, иначе None.
+
+        Как in_radius_condition: здание в одном из прямоугольников boxes
+        (radius_bounding_boxes) и не дальше radius. При radius >= MAX_DISTANCE_KM
+        в SQL условия нет.
+        """
+
+        building_latitude = self.latitudes[position]
+        building_longitude = self.longitudes[position]
+        distance = haversine_distance(latitude, longitude, building_latitude, building_longitude)
+        if radius >= MAX_DISTANCE_KM:
+            return distance
+        if distance <= radius and any(
+            _in_box(building_latitude, building_longitude, box) for box in boxes
+        ):
+            return distance
+        return None
+
+    def _positions_in_box(
+        self,
+        box: tuple[float, float, float, float],
+    ) -> Iterator[int]:
+        """Позиции зданий из ячеек, пересекающих прямоугольник."""
+
+        min_longitude, min_latitude, max_longitude, max_latitude = box
+        longitude_cells = range(_cell(min_longitude), _cell(max_longitude) + 1)
+        latitude_cells = range(_cell(min_latitude), _cell(max_latitude) + 1)
+
+        if len(longitude_cells) * len(latitude_cells) > len(self.grid):
+            # Большой прямоугольник: дешевле перебрать непустые ячейки
+            cells = (
+                positions
+                for (longitude_cell, latitude_cell), positions in self.grid.items()
+                if longitude_cell in longitude_cells and latitude_cell in latitude_cells
+            )
+        else:
+            cells = (
+                self.grid.get((longitude_cell, latitude_cell), ())
+                for longitude_cell in longitude_cells
+                for latitude_cell in latitude_cells
+            )
+        return chain.from_iterable(cells)
+
+
+@dataclass(frozen=True)
+class OrganizationIndex:
+    """Организации и индексы по зданию и триграммам названия."""
+
+    version: int
+    ids: IdSet
+    names: dict[int, str]
+    building_ids: dict[int, int | None]
+    by_building: dict[int, IdSet]
+    # Триграммы названия подряд (кандидаты для ILIKE)
+    substring_index: dict[str, IdSet]
+    # Триграммы слов как в pg_trgm (нечеткий поиск) и их количество у организации
+    word_index: dict[str, IdSet]
+    word_trigram_counts: dict[int, int]
+    # by_building в формате CSR для numpy (None, если numpy не установлен)
+    building_organizations: BuildingOrganizations | None
+
+    @classmethod
+    async def load(cls, session: AsyncSession, version: int) -> "OrganizationIndex":
+        rows = await OrganizationRepository(session).get_organization_rows()
+        return await asyncio.to_thread(cls.build, rows, version)
+
+    @classmethod
+    def build(cls, rows: Iterable, version: int) -> "OrganizationIndex":
+        # Строки идут по возрастанию ID, поэтому списки ID сразу отсортированы
+        ids = array("i")
+        names = {}
+        building_ids = {}
+        by_building: dict[int, array] = {}
+        substring_index: dict[str, array] = {}
+        word_index: dict[str, array] = {}
+        word_trigram_counts = {}
+        for row in rows:
+            ids.append(row.id)
+            names[row.id] = row.name
+            building_ids[row.id] = row.building_id
+            by_building.setdefault(row.building_id, array("i")).append(row.id)
+            for trigram in substring_trigrams(row.name.lower()):
+                substring_index.setdefault(trigram, array("i")).append(row.id)
+            trigrams = word_trigrams(row.name)
+            for trigram in trigrams:
+                word_index.setdefault(trigram, array("i")).append(row.id)
+            word_trigram_counts[row.id] = len(trigrams)
+
+        return cls(
+            version=version,
+            ids=IdSet(ids),
+            names=names,
+            building_ids=building_ids,
+            by_building={key: IdSet(value) for key, value in by_building.items()},
+            building_organizations=(
+                None if numpy is None else BuildingOrganizations.build(by_building)
+            ),
+            substring_index={key: IdSet(value) for key, value in substring_index.items()},
+            word_index={key: IdSet(value) for key, value in word_index.items()},
+            word_trigram_counts=word_trigram_counts,
+        )
+
+    def in_buildings(self, building_ids: Iterable[int]) -> IdSet:
+        """Организации в зданиях."""
+
+        return _union(
+            self.by_building[building_id]
+            for building_id in building_ids
+            if building_id in self.by_building
+        )
+
+    def count_in_buildings(self, building_ids: Iterable[int]) -> int:
+        return sum(
+            len(self.by_building[building_id])
+            for building_id in building_ids
+            if building_id in self.by_building
+        )
+
+    def search_filter(self, search_str: str) -> IdFilter:
+        """Фильтр по названию как ILIKE '%search_str%'.
+
+        Кандидаты - пересечение списков по триграммам литеральных частей
+        шаблона, затем каждое название проверяется регулярным выражением.
+        """
+
+        postings = [
+            self.substring_index.get(trigram, IdSet.empty())
+            for literal in _ilike_literals(search_str)
+            for trigram in substring_trigrams(literal.lower())
+        ]
+        pattern = ilike_regex(f"%{search_str}%")
+
+        def load() -> IdSet:
+            candidates = intersect_filters(
+                [
+                    IdFilter(name="trigram", estimate=len(posting), load=lambda posting=posting: posting)
+                    for posting in postings
+                ]
+            )
+            return IdSet.from_sorted(
+                organization_id
+                for organization_id in (self.ids if candidates is None else candidates)
+                if pattern.fullmatch(self.names[organization_id])
+            )
+
+        return IdFilter(
+            name="search_str",
+            estimate=min(map(len, postings), default=len(self.ids)),
+            load=load,
+        )
+
+    def similar(self, search_str: str, threshold: float) -> dict[int, float]:
+        """Организации с похожим названием (оператор % из pg_trgm): ID -> similarity()."""
+
+        trigrams = word_trigrams(search_str)
+        common: Counter[int] = Counter()
+        for trigram in trigrams:
+            common.update(self.word_index.get(trigram, ()))
+
+        result = {}
+        for organization_id, count in common.items():
+            value = similarity(count, len(trigrams), self.word_trigram_counts[organization_id])
+            if value >= threshold:
+                result[organization_id] = value
+
+        if threshold <= 0:
+            # Без общих триграмм сходство равно нулю, но проходит порог
+            for organization_id in self.ids:
+                result.setdefault(organization_id, 0.0)
+        return result
+
+
+def _ilike_literals(search_str: str) -> list[str]:
+    """Части шаблона ILIKE между символами % и _ (с учетом экранирования)."""
+
+    literals = [""]
+    characters = iter(search_str)
+    for character in characters:
+        if character == "\\":
+            literals[-1] += next(characters, "\\")
+        elif character in "%_":
+            literals.append("")
+        else:
+            literals[-1] += character
+    return [literal for literal in literals if literal]
+
+
+@dataclass(frozen=True)
+class ActivityLinkIndex:
+    """Связи организаций с видами деятельности в обе стороны."""
+
+    version: int
+    by_organization: dict[int, tuple[int, ...]]
+    by_activity: dict[int, IdSet]
+
+    @classmethod
+    async def load(cls, session: AsyncSession, version: int) -> "ActivityLinkIndex":
+        rows = await OrganizationActivityRepository(session).get_links()
+        return await asyncio.to_thread(cls.build, rows, version)
+
+    @classmethod
+    def build(cls, rows: Iterable, version: int) -> "ActivityLinkIndex":
+        # Строки идут по возрастанию organization_id
+        by_organization: dict[int, list[int]] = {}
+        by_activity: dict[int, array] = {}
+        for row in rows:
+            by_organization.setdefault(row.organization_id, []).append(row.activity_id)
+            organization_ids = by_activity.setdefault(row.activity_id, array("i"))
+            if not organization_ids or organization_ids[-1] != row.organization_id:
+                organization_ids.append(row.organization_id)
+
+        return cls(
+            version=version,
+            by_organization={key: tuple(value) for key, value in by_organization.items()},
+            by_activity={key: IdSet(value) for key, value in by_activity.items()},
+        )
+
+    def organizations(self, activity_ids: Iterable[int]) -> IdSet:
+        """Организации хотя бы с одним из видов деятельности."""
+
+        return _union(
+            self.by_activity[activity_id]
+            for activity_id in activity_ids
+            if activity_id in self.by_activity
+        )
+
+    def count(self, activity_ids: Iterable[int]) -> int:
+        return sum(
+            len(self.by_activity[activity_id])
+            for activity_id in activity_ids
+            if activity_id in self.by_activity
+        )
+
+
+@dataclass(frozen=True)
+class PhoneIndex:
+    """Телефоны организаций в порядке ID."""
+
+    version: int
+    by_organization: dict[int, tuple[str, ...]]
+
+    @classmethod
+    async def load(cls, session: AsyncSession, version: int) -> "PhoneIndex":
+        rows = await PhoneRepository(session).get_phones()
+        return await asyncio.to_thread(cls.build, rows, version)
+
+    @classmethod
+    def build(cls, rows: Iterable, version: int) -> "PhoneIndex":
+        by_organization: dict[int, list[str]] = {}
+        for row in rows:
+            by_organization.setdefault(row.organization_id, []).append(row.phone_number)
+        return cls(
+            version=version,
+            by_organization={key: tuple(value) for key, value in by_organization.items()},
+        )
+
+
+# Индекс каждой таблицы строится только по ее строкам
+INDEX_CLASSES = {
+    "activity": ActivityIndex,
+    "building": BuildingIndex,
+    "organization": OrganizationIndex,
+    "organization_activity": ActivityLinkIndex,
+    "phone": PhoneIndex,
+}
+
+
+@dataclass(frozen=True)
+class DirectorySnapshot:
+    """Снимок справочника: индекс каждой таблицы со своей версией."""
+
+    activity: ActivityIndex
+    building: BuildingIndex
+    organization: OrganizationIndex
+    organization_activity: ActivityLinkIndex
+    phone: PhoneIndex
+    similarity_threshold: float
+
+    @property
+    def versions(self) -> dict[str, int]:
+        return {table_name: getattr(self, table_name).version for table_name in DIRECTORY_TABLES}
+
+    def organization_row(
+        self,
+        organization_id: int,
+        distance: float | None = None,
+    ) -> OrganizationRow | None:
+        """Строка организации (None, если организации или ее здания нет)."""
+
+        organization = self.organization
+        building = self.building
+        position = self.building_position(organization_id)
+        if position is None:
+            # В SQL организация присоединяется к зданию через JOIN
+            return None
+
+        tree = self.activity.tree
+        activity_ids = sorted(
+            (
+                activity_id
+                for activity_id in self.organization_activity.by_organization.get(
+                    organization_id, ()
+                )
+                if activity_id in tree.names
+            ),
+            key=self.activity.order.__getitem__,
+        )
+        return OrganizationRow(
+            id=organization_id,
+            name=organization.names[organization_id],
+            building_id=building.ids[position],
+            building_address=building.addresses[position],
+            building_latitude=building.latitudes[position],
+            building_longitude=building.longitudes[position],
+            activities=[
+                {
+                    "id": activity_id,
+                    "name": tree.names[activity_id],
+                    "parent_id": tree.parents[activity_id],
+                }
+                for activity_id in activity_ids
+            ]
+            or None,
+            phones=self.phone.by_organization.get(organization_id),
+            distance=distance,
+        )
+
+    def organizations_in_radius(
+        self,
+        latitude: float,
+        longitude: float,
+        radius: float,
+    ) -> IdSet:
+        """Организации в зданиях в радиусе от точки."""
+
+        building = self.building
+        organization = self.organization
+        if building.vectors is not None and organization.building_organizations is not None:
+            positions = building.positions_in_radius(latitude, longitude, radius)
+            return organization.building_organizations.organizations(
+                building.vectors.ids[positions]
+            )
+        return organization.in_buildings(
+            building.in_radius(latitude=latitude, longitude=longitude, radius=radius)
+        )
+
+    def organizations_in_boxes(
+        self,
+        boxes: list[tuple[float, float, float, float]],
+    ) -> IdSet:
+        """Организации в зданиях внутри прямоугольников."""
+
+        building = self.building
+        organization = self.organization
+        if building.vectors is not None and organization.building_organizations is not None:
+            positions = building.vectors.positions_in_boxes(boxes)
+            return organization.building_organizations.organizations(
+                building.vectors.ids[positions]
+            )
+        return organization.in_buildings(building.in_boxes(boxes))
+
+    def building_position(self, organization_id: int) -> int | None:
+        """Позиция здания организации в колонках BuildingIndex."""
+
+        return self.building.positions.get(self.organization.building_ids.get(organization_id))
+
+
+async def _load_index(session: AsyncSession, table_name: str):
+    """Загрузить индекс таблицы вместе с ее версией."""
+
+    version = await TableVersionRepository(session).get_version(table_name=table_name)
+    return await INDEX_CLASSES[table_name].load(session, version)
+
+
+async def _load_similarity_threshold(session: AsyncSession) -> float:
+    """Порог pg_trgm.similarity_threshold (до загрузки pg_trgm настройки может не быть)."""
+
+    value = (
+        await session.execute(
+            sa.text("SELECT current_setting('pg_trgm.similarity_threshold', true)")
+        )
+    ).scalar_one()
+    return float(value) if value else DEFAULT_SIMILARITY_THRESHOLD
+
+
+class DirectoryReplica:
+    """Реплика справочника в памяти процесса.
+
+    Загружается при старте. По уведомлению об изменении таблицы заново
+    строится только индекс этой таблицы. Снимок используется, только если
+    версии всех его индексов равны текущим версиям таблиц (table_versions);
+    пока индекс перестраивается, запросы идут в БД.
+    """
+
+    def __init__(self):
+        self.snapshot: DirectorySnapshot | None = None
+        self._lock = asyncio.Lock()
+
+    def subscribe(self, listener) -> None:
+        """Подписаться на изменения таблиц справочника."""
+
+        for table_name in DIRECTORY_TABLES:
+            listener.subscribe(table_name, self._make_callback(table_name))
+
+    async def load(self) -> None:
+        """Загрузить все таблицы."""
+
+        async with self._lock:
+            await self._load(DIRECTORY_TABLES)
+
+    def current(self, versions: dict[str, int] | None) -> DirectorySnapshot | None:
+        """Снимок, если он соответствует версиям таблиц, иначе None."""
+
+        if self.snapshot is None or versions is None or self.snapshot.versions != versions:
+            return None
+        return self.snapshot
+
+    def stats(self) -> dict[str, Any]:
+        """Версии и размеры индексов."""
+
+        if self.snapshot is None:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "versions": self.snapshot.versions,
+            "buildings": len(self.snapshot.building.ids),
+            "organizations": len(self.snapshot.organization.ids),
+            "activities": len(self.snapshot.activity.tree.names),
+        }
+
+    async def _load(self, table_names: Iterable[str]) -> None:
+        async with async_session() as session:
+            # Все таблицы читаются из одного снимка БД
+            await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            indexes = {
+                table_name: await _load_index(session, table_name)
+                for table_name in table_names
+            }
+            threshold = await _load_similarity_threshold(session)
+
+        if self.snapshot is None:
+            self.snapshot = DirectorySnapshot(**indexes, similarity_threshold=threshold)
+        else:
+            self.snapshot = replace(self.snapshot, **indexes, similarity_threshold=threshold)
+
+    def _make_callback(self, table_name: str):
+        async def on_change(version: int | None) -> None:
+            async with self._lock:
+                try:
+                    if self.snapshot is None:
+                        await self._load(DIRECTORY_TABLES)
+                        return
+
+                    if version is None:
+                        # Уведомления могли потеряться: версия берется из БД,
+                        # чтобы не перестраивать индекс без изменений
+                        async with async_session() as session:
+                            version = await TableVersionRepository(session).get_version(
+                                table_name=table_name,
+                            )
+
+                    if getattr(self.snapshot, table_name).version < version:
+                        await self._load((table_name,))
+                except Exception:
+                    # Индекс остается устаревшим, и запросы идут в БД
+                    logger.exception("Не удалось обновить реплику справочника")
+
+        return on_change
+
+
+directory_replica = DirectoryReplica()
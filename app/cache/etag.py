@@ -0,0 +1,52 @@
+import hashlib
+from typing import Any
+
+from app.cache.response import key_digest
+from app.cache.table_versions import TableVersions, table_versions
+from app.config import get_settings
+
+settings = get_settings()
+
+
+def make_etag(
+    namespace: str,
+    key_data: dict[str, Any],
+    versions: TableVersions = table_versions,
+) -> str | None:
+    """Получить сильный ETag ответа по версиям таблиц и параметрам запроса.
+
+    Ответ однозначно определяется данными таблиц и параметрами, поэтому
+    ETag можно вычислить без запросов к БД. None, если ETag выключены
+    или версии неизвестны.
+    """
+
+    fingerprint = versions.fingerprint
+    if not settings.etag_enabled or fingerprint is None:
+        return None
+
+    digest = hashlib.blake2b(
+        f"{namespace}:{fingerprint}:{key_digest(key_data)}".encode(),
+        digest_size=16,
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(
+    if_none_match: str | None,
+    etag: str,
+    match_any: bool = True,
+) -> bool:
+    """Проверить заголовок If-None-Match (слабое сравнение, RFC 9110).
+
+    "*" совпадает с любым ETag, только если ресурс существует:
+    при match_any=False он не учитывается.
+    """
+
+    if not if_none_match:
+        return False
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (match_any and candidate == "*") or candidate.removeprefix("W/") == etag:
+            return True
+    return False
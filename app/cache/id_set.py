@@ -0,0 +1,141 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass
+
+try:
+    import numpy
+except ImportError:  # numpy не обязателен, без него работает чистый Python
+    numpy = None
+
+# Пересечение через numpy выгодно только на больших множествах
+NUMPY_MIN_SIZE = 4096
+
+# Во сколько раз одно множество должно быть больше другого,
+# чтобы искать элементы меньшего бинарным поиском
+PROBE_RATIO = 32
+
+
+class IdSet:
+    """Неизменяемое множество ID в виде отсортированного массива int32.
+
+    Занимает 4 байта на ID (set хранит указатели и объекты int),
+    пересечение выполняется без создания объектов для каждого ID.
+    """
+
+    __slots__ = ("_ids",)
+
+    def __init__(self, ids: array):
+        self._ids = ids
+
+    @classmethod
+    def from_iterable(cls, ids: Iterable[int]) -> "IdSet":
+        """Построить множество из произвольных ID (с повторами, в любом порядке)."""
+
+        return cls(array("i", sorted(set(ids))))
+
+    @classmethod
+    def from_sorted(cls, ids: Iterable[int]) -> "IdSet":
+        """Построить множество из уже отсортированных уникальных ID."""
+
+        return cls(array("i", ids))
+
+    @classmethod
+    def empty(cls) -> "IdSet":
+        return cls(array("i"))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __bool__(self) -> bool:
+        return bool(self._ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids)
+
+    def __contains__(self, item_id: int) -> bool:
+        index = bisect_left(self._ids, item_id)
+        return index < len(self._ids) and self._ids[index] == item_id
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, IdSet) and self._ids == other._ids
+
+    def __repr__(self) -> str:
+        return f"IdSet({len(self)} ids)"
+
+    def tolist(self) -> list[int]:
+        return self._ids.tolist()
+
+    def after(self, value: float) -> Iterator[int]:
+        """ID строго больше value по возрастанию."""
+
+        return iter(memoryview(self._ids)[bisect_right(self._ids, value) :])
+
+    def intersection(self, other: "IdSet") -> "IdSet":
+        """Пересечь с другим множеством, сохраняя порядок ID."""
+
+        small, large = sorted((self._ids, other._ids), key=len)
+        if not small:
+            return IdSet.empty()
+
+        if len(large) >= len(small) * PROBE_RATIO:
+            # Бинарный поиск элементов маленького множества в большом
+            return IdSet(_probe(small, large))
+
+        if numpy is not None and len(small) >= NUMPY_MIN_SIZE:
+            result = numpy.intersect1d(
+                numpy.frombuffer(small, dtype=numpy.int32),
+                numpy.frombuffer(large, dtype=numpy.int32),
+                assume_unique=True,
+            )
+            return IdSet(array("i", result.tobytes()))
+
+        # Фильтрация большого массива по хешу маленького: порядок сохраняется
+        return IdSet(array("i", filter(set(small).__contains__, large)))
+
+    __and__ = intersection
+
+
+def _probe(small: array, large: array) -> array:
+    """Найти элементы small в large бинарным поиском со сдвигающейся левой границей."""
+
+    result = array("i")
+    low = 0
+    size = len(large)
+    for value in small:
+        low = bisect_left(large, value, low)
+        if low == size:
+            break
+        if large[low] == value:
+            result.append(value)
+    return result
+
+
+@dataclass(frozen=True)
+class IdFilter:
+    """Фильтр, результат которого - множество ID.
+
+    estimate - оценка размера результата (используется для порядка выполнения),
+    load вычисляет множество только когда до фильтра дошла очередь.
+    """
+
+    name: str
+    estimate: int
+    load: Callable[[], IdSet]
+
+
+def intersect_filters(filters: Sequence[IdFilter]) -> IdSet | None:
+    """Пересечь результаты фильтров, начиная с самого селективного.
+
+    Если промежуточный результат пуст, оставшиеся фильтры не вычисляются.
+    None означает, что фильтров нет и ограничений на ID нет.
+    """
+
+    result = None
+    for id_filter in sorted(filters, key=lambda item: item.estimate):
+        id_set = id_filter.load()
+        result = id_set if result is None else result & id_set
+        if not result:
+            return result
+
+    return result
@@ -0,0 +1,251 @@
+import hashlib
+import importlib
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.api.filters.organization import OrganizationFilterSchema
+from app.cache.table_versions import TableVersions, table_versions
+from app.config import get_settings
+from app.notifications import TableChangeListener
+
+settings = get_settings()
+
+
+class CacheBackend(ABC):
+    """Хранилище кеша ответов.
+
+    Собственный (например, общий для нескольких процессов) backend
+    подключается через настройку response_cache_backend ("module:Class").
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        """Получить значение по ключу."""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes) -> None:
+        """Сохранить значение."""
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """Удалить все значения."""
+
+    def stats(self) -> dict[str, Any]:
+        """Получить статистику хранилища."""
+
+        return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+    """LRU-кеш с TTL в памяти процесса."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        super().__init__(ttl=ttl, max_entries=max_entries)
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def load_backend(path: str) -> CacheBackend:
+    """Создать backend по пути вида "module:Class"."""
+
+    module_name, _, class_name = path.partition(":")
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    return backend_class(
+        ttl=settings.response_cache_ttl,
+        max_entries=settings.response_cache_max_entries,
+    )
+
+
+def canonical_filters(
+    filters: OrganizationFilterSchema,
+) -> OrganizationFilterSchema:
+    """Привести фильтры к каноническому виду.
+
+    Координаты точки округляются; по этим же фильтрам выполняется запрос,
+    поэтому одинаковые ключи кеша всегда означают одинаковый результат.
+    """
+
+    precision = settings.response_cache_coordinate_precision
+    update = {
+        field: round(value, precision)
+        for field in ("latitude", "longitude")
+        if (value := getattr(filters, field)) is not None
+    }
+    if filters.bbox_list:
+        update["bbox"] = ",".join(str(round(value, precision)) for value in filters.bbox_list)
+    return filters.model_copy(update=update)
+
+
+def filters_key_data(
+    filters: OrganizationFilterSchema,
+) -> dict[str, Any]:
+    """Данные ключа кеша по фильтрам: отсортированные ID, строки без учета регистра."""
+
+    return {
+        "organization_ids": (
+            sorted(set(filters.organization_ids_list))
+            if filters.organization_ids
+            else None
+        ),
+        "building_ids": (
+            sorted(set(filters.building_ids_list)) if filters.building_ids else None
+        ),
+        "activity_ids": (
+            sorted(set(filters.activity_ids_list)) if filters.activity_ids else None
+        ),
+        "include_activity_descendants": filters.include_activity_descendants,
+        # ILIKE и pg_trgm не учитывают регистр
+        "search_str": filters.search_str.lower() if filters.search_str else None,
+        "search_mode": filters.search_mode if filters.search_str else None,
+        "activity_search_str": (
+            filters.activity_search_str.lower()
+            if filters.activity_search_str
+            else None
+        ),
+        "latitude": filters.latitude,
+        "longitude": filters.longitude,
+        "radius": filters.radius,
+        "nearest": filters.nearest,
+        "bbox": filters.bbox_list,
+    }
+
+
+def key_digest(
+    key_data: dict[str, Any],
+) -> str:
+    """Получить хеш данных ключа."""
+
+    return hashlib.blake2b(
+        json.dumps(key_data, sort_keys=True, ensure_ascii=False).encode(),
+        digest_size=16,
+    ).hexdigest()
+
+
+class ResponseCache:
+    """Кеш готовых ответов (JSON) поиска организаций.
+
+    Ключ включает версии таблиц справочника, поэтому после изменения данных
+    старые записи перестают использоваться даже в общем хранилище.
+    Локальное хранилище дополнительно очищается по уведомлению.
+    """
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        versions: TableVersions,
+        enabled: bool = True,
+    ):
+        self.backend = backend
+        self.versions = versions
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.invalidations = 0
+
+    def subscribe(self, listener: TableChangeListener) -> None:
+        """Очищать кеш при изменении таблиц справочника."""
+
+        for table_name in self.versions.tables:
+            listener.subscribe(table_name, self._on_change)
+
+    def make_key(
+        self,
+        namespace: str,
+        key_data: dict[str, Any],
+    ) -> str | None:
+        """Построить ключ кеша (None, если кешировать нельзя)."""
+
+        fingerprint = self.versions.fingerprint
+        if not self.enabled or fingerprint is None:
+            return None
+
+        return f"{namespace}:{fingerprint}:{key_digest(key_data)}"
+
+    async def get_or_set(
+        self,
+        namespace: str,
+        key_data: dict[str, Any],
+        factory: Callable[[], Awaitable[bytes]],
+    ) -> bytes:
+        """Получить ответ из кеша или вычислить и сохранить его."""
+
+        key = self.make_key(namespace, key_data)
+        if key is None:
+            self.bypasses += 1
+            return await factory()
+
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = await factory()
+        await self.backend.set(key, value)
+        return value
+
+    def stats(self) -> dict[str, Any]:
+        """Получить счетчики кеша."""
+
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            **self.backend.stats(),
+        }
+
+    async def _on_change(self, version: int | None) -> None:
+        self.invalidations += 1
+        await self.backend.clear()
+
+
+response_cache = ResponseCache(
+    backend=load_backend(settings.response_cache_backend),
+    versions=table_versions,
+    enabled=settings.response_cache_enabled,
+)
@@ -0,0 +1,89 @@
+import logging
+
+from app.database import async_session
+from app.notifications import TableChangeListener
+from app.repositories.table_version import TableVersionRepository
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY_TABLES = (
+    "activity",
+    "building",
+    "organization",
+    "organization_activity",
+    "phone",
+)
+
+
+class TableVersions:
+    """Текущие версии данных таблиц справочника в памяти процесса.
+
+    Загружаются при старте и обновляются по уведомлениям bump_table_version().
+    Пока подписки на уведомления нет, версии неизвестны: изменения таблиц
+    в это время не видны, и кеш и ETag не должны на них опираться.
+    """
+
+    def __init__(self, tables: tuple[str, ...] = DIRECTORY_TABLES):
+        self.tables = tables
+        self.versions: dict[str, int] | None = None
+        self._listener: TableChangeListener | None = None
+
+    def subscribe(self, listener: TableChangeListener) -> None:
+        """Подписаться на изменения всех таблиц и на потерю подписки."""
+
+        self._listener = listener
+        for table_name in self.tables:
+            listener.subscribe(table_name, self._make_callback(table_name))
+        # Версии загружаются заново после переподключения (уведомление с None)
+        listener.subscribe_disconnect(self._forget)
+
+    async def load(self) -> None:
+        """Загрузить версии из БД."""
+
+        async with async_session() as session:
+            versions = await TableVersionRepository(session).get_versions()
+
+        self.versions = {
+            table_name: versions.get(table_name, 0) for table_name in self.tables
+        }
+
+    @property
+    def current_versions(self) -> dict[str, int] | None:
+        """Версии таблиц (None, если неизвестны или подписки на уведомления нет)."""
+
+        if self._listener is not None and not self._listener.listening:
+            return None
+        return self.versions
+
+    @property
+    def fingerprint(self) -> str | None:
+        """Строка с версиями всех таблиц (None, если версии неизвестны)."""
+
+        versions = self.current_versions
+        if versions is None:
+            return None
+        return ".".join(str(versions[table_name]) for table_name in self.tables)
+
+    def _forget(self) -> None:
+        self.versions = None
+
+    def _make_callback(self, table_name: str):
+        async def on_change(version: int | None) -> None:
+            if version is not None and self.versions is not None:
+                self.versions[table_name] = max(self.versions[table_name], version)
+                return
+
+            # Уведомления могли потеряться: до перезагрузки версии неизвестны
+            self.versions = None
+            try:
+                await self.load()
+            except Exception:
+                logger.exception("Не удалось загрузить версии таблиц")
+            if self._listener is not None and not self._listener.listening:
+                # Подписка пропала во время загрузки
+                self.versions = None
+
+        return on_change
+
+
+table_versions = TableVersions()
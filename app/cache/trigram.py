@@ -0,0 +1,44 @@
+import re
+import struct
+
+# Значение pg_trgm.similarity_threshold по умолчанию
+DEFAULT_SIMILARITY_THRESHOLD = 0.3
+
+# Слово для pg_trgm - последовательность букв и цифр
+WORD_REGEX = re.compile(r"[^\W_]+")
+
+
+def word_trigrams(text: str) -> set[str]:
+    """Триграммы строки так же, как в pg_trgm (show_trgm).
+
+    Каждое слово приводится к нижнему регистру и дополняется двумя
+    пробелами в начале и одним в конце.
+    """
+
+    trigrams = set()
+    for word in WORD_REGEX.findall(text):
+        padded = f"  {word.lower()} "
+        trigrams.update(padded[index : index + 3] for index in range(len(padded) - 2))
+    return trigrams
+
+
+def substring_trigrams(text: str) -> set[str]:
+    """Все триграммы строки подряд, без деления на слова.
+
+    Если шаблон - подстрока названия, все его триграммы есть у названия,
+    поэтому по ним отбираются кандидаты для ILIKE '%...%'.
+    """
+
+    return {text[index : index + 3] for index in range(len(text) - 2)}
+
+
+def similarity(common: int, first: int, second: int) -> float:
+    """Сходство как pg_trgm similarity() по числу общих и всех триграмм.
+
+    pg_trgm считает в float4, поэтому результат округляется до float4:
+    так совпадают и сравнение с порогом, и значения в курсоре.
+    """
+
+    if first <= 0 or second <= 0:
+        return 0.0
+    return struct.unpack("f", struct.pack("f", common / (first + second - common)))[0]
@@ -0,0 +1,142 @@
+import math
+from array import array
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from app.cache.id_set import IdSet
+from app.queries.building import EARTH_RADIUS_KM
+
+try:
+    import numpy
+except ImportError:  # numpy не обязателен, без него работает чистый Python
+    numpy = None
+
+# Ширина полосы у границы круга (в косинусах углового расстояния), в которой
+# результат numpy перепроверяется точной формулой: cos и sin в numpy могут
+# отличаться от libm (и от Postgres) на несколько ulp.
+COSINE_TOLERANCE = 1e-9
+
+
+@dataclass(frozen=True)
+class BuildingVectors:
+    """Координаты зданий в колонках numpy для векторного поиска по радиусу.
+
+    Широты и долготы заранее переведены в радианы, косинусы и синусы широт
+    посчитаны при построении. Позиции отсортированы по широте, поэтому
+    прямоугольник по широте - срез, найденный бинарным поиском.
+    """
+
+    ids: Any
+    longitudes: Any
+    radians_longitudes: Any
+    cos_latitudes: Any
+    sin_latitudes: Any
+    # Позиции зданий по возрастанию широты и сами широты в этом порядке
+    latitude_order: Any
+    sorted_latitudes: Any
+
+    @classmethod
+    def build(cls, ids: array, latitudes: array, longitudes: array) -> "BuildingVectors":
+        latitudes = numpy.frombuffer(latitudes, dtype=numpy.float64)
+        longitudes = numpy.frombuffer(longitudes, dtype=numpy.float64)
+        radians_latitudes = numpy.radians(latitudes)
+        latitude_order = numpy.argsort(latitudes, kind="stable").astype(numpy.int32)
+        return cls(
+            ids=numpy.frombuffer(ids, dtype=numpy.int32),
+            longitudes=longitudes,
+            radians_longitudes=numpy.radians(longitudes),
+            cos_latitudes=numpy.cos(radians_latitudes),
+            sin_latitudes=numpy.sin(radians_latitudes),
+            latitude_order=latitude_order,
+            sorted_latitudes=latitudes[latitude_order],
+        )
+
+    def positions_in_boxes(self, boxes: list[tuple[float, float, float, float]]):
+        """Позиции зданий в прямоугольниках (min_lon, min_lat, max_lon, max_lat)."""
+
+        parts = []
+        for min_longitude, min_latitude, max_longitude, max_latitude in boxes:
+            # Границы прямоугольника включаются, как в операторе <@
+            start = numpy.searchsorted(self.sorted_latitudes, min_latitude, side="left")
+            stop = numpy.searchsorted(self.sorted_latitudes, max_latitude, side="right")
+            positions = self.latitude_order[start:stop]
+            longitudes = self.longitudes[positions]
+            parts.append(
+                positions[(longitudes >= min_longitude) & (longitudes <= max_longitude)]
+            )
+        if len(parts) == 1:
+            return parts[0]
+        return numpy.unique(numpy.concatenate(parts))
+
+    def split_by_radius(
+        self,
+        positions,
+        latitude: float,
+        longitude: float,
+        radius: float,
+    ):
+        """Разделить позиции на (точно в радиусе, на границе - проверить точно).
+
+        Условие distance <= radius сравнивается в косинусах: арккосинус
+        не вычисляется, а погрешность косинуса не зависит от расстояния.
+        """
+
+        if radius < 0:
+            empty = positions[:0]
+            return empty, empty
+
+        latitude_radians = math.radians(latitude)
+        cosine = self.cos_latitudes[positions] * math.cos(latitude_radians) * numpy.cos(
+            self.radians_longitudes[positions] - math.radians(longitude)
+        ) + self.sin_latitudes[positions] * math.sin(latitude_radians)
+
+        threshold = math.cos(min(radius / EARTH_RADIUS_KM, math.pi))
+        inside = cosine > threshold + COSINE_TOLERANCE
+        border = ~inside & (cosine >= threshold - COSINE_TOLERANCE)
+        return positions[inside], positions[border]
+
+
+@dataclass(frozen=True)
+class BuildingOrganizations:
+    """Организации по зданиям в формате CSR.
+
+    Организации здания с ID building_id - срез
+    organization_ids[offsets[building_id]:offsets[building_id + 1]].
+    """
+
+    offsets: Any
+    organization_ids: Any
+
+    @classmethod
+    def build(cls, by_building: dict[int, Iterable[int]]) -> "BuildingOrganizations":
+        building_ids = [building_id for building_id in by_building if building_id is not None]
+        size = max(building_ids, default=-1) + 2
+        counts = numpy.zeros(size, dtype=numpy.int64)
+        for building_id in building_ids:
+            counts[building_id + 1] = len(by_building[building_id])
+        organization_ids = array("i")
+        for building_id in sorted(building_ids):
+            organization_ids.extend(by_building[building_id])
+        return cls(
+            offsets=numpy.cumsum(counts),
+            organization_ids=numpy.frombuffer(organization_ids, dtype=numpy.int32),
+        )
+
+    def organizations(self, building_ids) -> IdSet:
+        """Организации в зданиях (массив ID зданий numpy)."""
+
+        building_ids = building_ids[(building_ids >= 0) & (building_ids < len(self.offsets) - 1)]
+        starts = self.offsets[building_ids]
+        lengths = self.offsets[building_ids + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            return IdSet.empty()
+
+        # Индексы всех элементов срезов одним массивом: начало среза
+        # повторяется по его длине, к нему прибавляется номер внутри среза
+        ends = numpy.cumsum(lengths)
+        indexes = numpy.repeat(starts - ends + lengths, lengths) + numpy.arange(total)
+        # Организация находится в одном здании, поэтому повторов нет
+        result = numpy.sort(self.organization_ids[indexes])
+        return IdSet(array("i", result.tobytes()))
@@ -1,5 +1,6 @@
 import pathlib
 from functools import lru_cache
+from typing import Literal
 
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
@@ -19,6 +20,59 @@ class Settings(BaseSettings):
     db_port: int
     db_echo: bool = False
 
+    # Профиль подключения к БД:
+    # pooled - собственный пул соединений и кеш prepared statements;
+    # pgbouncer - без пула и без prepared statements (для работы через PgBouncer).
+    db_pool_profile: Literal["pooled", "pgbouncer"] = "pooled"
+    db_pool_size: int = 10
+    db_pool_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_cache_size: int = 100
+
+    # Статистика запросов к БД по каждому HTTP-запросу
+    # (заголовок Server-Timing и строка в логе app.instrumentation)
+    db_instrumentation_enabled: bool = False
+
+    # Профилирование отдельных запросов (стековый сэмплер, файлы folded stacks
+    # для flamegraph): по подписанному заголовку X-Profile-Signature
+    # и/или случайная доля запросов
+    profiling_secret: str = ""
+    profiling_sample_rate: float = 0.0
+    profiling_interval: float = 0.005
+    profiling_dir: str = "profiles"
+    profiling_max_files: int = 100
+
+    # Кеш дерева деятельностей в памяти (обновляется по LISTEN/NOTIFY)
+    activity_tree_cache_enabled: bool = True
+
+    # Реплика справочника в памяти: поиск организаций без запросов к БД
+    # (обновляется по LISTEN/NOTIFY)
+    directory_replica_enabled: bool = False
+
+    # Кеш ответов поиска организаций
+    response_cache_enabled: bool = True
+    response_cache_backend: str = "app.cache.response:MemoryCacheBackend"
+    response_cache_ttl: float = 60.0
+    response_cache_max_entries: int = 10000
+    response_cache_coordinate_precision: int = 6
+
+    # ETag и условные запросы (If-None-Match) по версиям таблиц
+    etag_enabled: bool = True
+
+    # Начальный радиус (км) поиска ближайших организаций (nearest)
+    nearest_initial_radius_km: float = 1.0
+
+    # Метрики в формате Prometheus (/metrics)
+    metrics_enabled: bool = True
+
+    # Размер пачки строк при потоковой выдаче организаций
+    organizations_stream_batch_size: int = 500
+
+    # Сколько значений каждого фасета (facets) возвращать, по убыванию количества
+    organization_facets_limit: int = 100
+
     api_key: str = ""
 
     class Config:
@@ -1,11 +1,13 @@
 from collections.abc import AsyncGenerator
 from os import environ
+from typing import Any
 from uuid import uuid4
 
 from asyncpg import Connection
-from sqlalchemy import NullPool
+from sqlalchemy import AsyncAdaptedQueuePool, NullPool
 from sqlalchemy.engine.url import URL
 from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
@@ -47,15 +49,40 @@ url = URL.create(
     database=settings.db_name,
 )
 
+
+def get_engine_options() -> dict[str, Any]:
+    """Получить параметры движка для выбранного профиля подключения."""
+
+    if settings.db_pool_profile == "pgbouncer":
+        # Без пула и без prepared statements: безопасно для PgBouncer
+        # в режиме transaction pooling.
+        return {
+            "poolclass": NullPool,
+            "connect_args": {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "connection_class": CustomConnection,
+            },
+        }
+
+    return {
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_pool_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "connect_args": {
+            "statement_cache_size": settings.db_statement_cache_size,
+            "prepared_statement_cache_size": settings.db_statement_cache_size,
+        },
+    }
+
+
 async_engine = create_async_engine(
     url,
-    poolclass=NullPool,
-    connect_args={
-        "statement_cache_size": 0,
-        "prepared_statement_cache_size": 0,
-        "connection_class": CustomConnection,
-    },
     echo=settings.db_echo,
+    **get_engine_options(),
 )
 
 async_session = async_sessionmaker(async_engine, expire_on_commit=False)
@@ -64,8 +91,28 @@ async_session = async_sessionmaker(async_engine, expire_on_commit=False)
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     """Получить сессию."""
 
-    async with (
-        async_engine.begin() as connection,
-        async_session(bind=connection) as session,
-    ):
+    # Соединение берется из пула при первом запросе, поэтому ответы
+    # из кеша и 304 Not Modified не занимают соединение.
+    async with async_session() as session, session.begin():
         yield session
+
+
+def get_pool_metrics(engine: AsyncEngine = async_engine) -> dict[str, Any]:
+    """Получить метрики заполненности пула соединений."""
+
+    pool = engine.pool
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return {"profile": settings.db_pool_profile, "pooled": False}
+
+    capacity = pool.size() + settings.db_pool_max_overflow
+    checked_out = pool.checkedout()
+    return {
+        "profile": settings.db_pool_profile,
+        "pooled": True,
+        "size": pool.size(),
+        "max_overflow": settings.db_pool_max_overflow,
+        "checked_in": pool.checkedin(),
+        "checked_out": checked_out,
+        "overflow": max(pool.overflow(), 0),
+        "saturation": round(checked_out / capacity, 4) if capacity else 0.0,
+    }
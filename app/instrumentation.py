@@ -0,0 +1,146 @@
+import json
+import logging
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Максимальная длина текста самого медленного запроса в логе
+SLOWEST_STATEMENT_LENGTH = 300
+
+
+@dataclass
+class QueryStats:
+    """Статистика запросов к БД в рамках одного HTTP-запроса."""
+
+    statements: int = 0
+    db_time: float = 0.0
+    rows: int = 0
+    slowest_time: float = 0.0
+    slowest_statement: str | None = None
+
+    def add(
+        self,
+        statement: str,
+        elapsed: float,
+        rows: int,
+    ) -> None:
+        """Учесть выполненный запрос."""
+
+        self.statements += 1
+        self.db_time += elapsed
+        self.rows += rows
+        if self.slowest_statement is None or elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing (длительности в миллисекундах)."""
+
+        metrics = [
+            f'db;dur={self.db_time * 1000:.3f};'
+            f'desc="{self.statements} statements, {self.rows} rows"'
+        ]
+        if self.slowest_statement is not None:
+            metrics.append(f"db-slowest;dur={self.slowest_time * 1000:.3f}")
+        return ", ".join(metrics)
+
+    def as_dict(self) -> dict:
+        """Поля статистики для строки лога."""
+
+        return {
+            "db_statements": self.statements,
+            "db_time_ms": round(self.db_time * 1000, 3),
+            "db_rows": self.rows,
+            "db_slowest_ms": round(self.slowest_time * 1000, 3),
+            "db_slowest_statement": (
+                re.sub(r"\s+", " ", self.slowest_statement)[:SLOWEST_STATEMENT_LENGTH]
+                if self.slowest_statement is not None
+                else None
+            ),
+        }
+
+
+# Статистика текущего HTTP-запроса (None вне запроса)
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Подключить сбор статистики запросов к движку.
+
+    Вне HTTP-запроса (загрузка кешей, LISTEN) статистика не собирается.
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _query_stats.get() is not None:
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _query_stats.get()
+        if stats is None or not conn.info.get("query_started"):
+            return
+
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        # rowcount берется из статуса команды (в том числе "SELECT n").
+        # У серверных курсоров (stream) он равен -1: строки читаются позже
+        # и здесь не учитываются.
+        stats.add(statement=statement, elapsed=elapsed, rows=max(cursor.rowcount, 0))
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware: статистика запросов к БД для каждого HTTP-запроса.
+
+    Добавляет заголовок Server-Timing и пишет строку JSON в лог.
+    При потоковой выдаче заголовок учитывает только запросы до начала ответа,
+    а строка лога - все запросы.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        started = time.perf_counter()
+        status_code = None
+
+        async def send_with_server_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append(
+                    "Server-Timing",
+                    stats.server_timing(),
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            _query_stats.reset(token)
+            logger.info(
+                json.dumps(
+                    {
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "query": scope["query_string"].decode("latin-1"),
+                        "status": status_code,
+                        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                        **stats.as_dict(),
+                    },
+                    ensure_ascii=False,
+                )
+            )
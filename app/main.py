@@ -1,9 +1,76 @@
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
+from app.cache.activity_tree import activity_tree_cache
+from app.cache.directory import directory_replica
+from app.cache.response import response_cache
+from app.cache.table_versions import table_versions
+from app.config import get_settings
+from app.database import async_engine, get_pool_metrics
+from app.instrumentation import QueryStatsMiddleware, instrument_engine
+from app.metrics import CONTENT_TYPE, MetricsMiddleware, render_metrics
+from app.notifications import table_change_listener
+from app.profiling import ProfileStore, ProfilingMiddleware
 from app.router import router
 
 SERVICE_URL_PREFIX = "/api"
 
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Жизненный цикл приложения."""
+
+    if settings.activity_tree_cache_enabled:
+        table_change_listener.subscribe(
+            activity_tree_cache.table_name,
+            activity_tree_cache.on_change,
+        )
+        try:
+            await activity_tree_cache.load()
+        except Exception:
+            logger.exception("Не удалось загрузить дерево деятельностей")
+
+    # Реплика и дерево деятельностей используются, только пока их версии
+    # совпадают с версиями таблиц
+    track_table_versions = (
+        settings.response_cache_enabled
+        or settings.etag_enabled
+        or settings.directory_replica_enabled
+        or settings.activity_tree_cache_enabled
+    )
+    if track_table_versions:
+        table_versions.subscribe(table_change_listener)
+        try:
+            await table_versions.load()
+        except Exception:
+            logger.exception("Не удалось загрузить версии таблиц")
+
+    if settings.directory_replica_enabled:
+        directory_replica.subscribe(table_change_listener)
+        try:
+            await directory_replica.load()
+        except Exception:
+            logger.exception("Не удалось загрузить реплику справочника")
+
+    if settings.response_cache_enabled:
+        response_cache.subscribe(table_change_listener)
+
+    if track_table_versions:
+        await table_change_listener.start()
+
+    yield
+
+    await table_change_listener.stop()
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title="Справочник организаций",
@@ -13,6 +80,7 @@ app = FastAPI(
         "name": "Малодушев Михаил",
         "url": "https://t.me/scaliann",
     },
+    lifespan=lifespan,
 )
 
 app.include_router(
@@ -20,7 +88,46 @@ app.include_router(
     prefix=SERVICE_URL_PREFIX,
 )
 
+if settings.db_instrumentation_enabled:
+    instrument_engine(async_engine)
+    app.add_middleware(QueryStatsMiddleware)
+
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+if settings.profiling_secret or settings.profiling_sample_rate > 0:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=ProfileStore(settings.profiling_dir, settings.profiling_max_files),
+        sample_rate=settings.profiling_sample_rate,
+        secret=settings.profiling_secret,
+        interval=settings.profiling_interval,
+    )
+
 
 @app.get("/health")
 async def health():
     return {"result": "success"}
+
+
+@app.get("/health/pool")
+async def health_pool():
+    return get_pool_metrics()
+
+
+@app.get("/health/cache")
+async def health_cache():
+    return response_cache.stats()
+
+
+@app.get("/health/replica")
+async def health_replica():
+    return directory_replica.stats()
+
+
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+
+if settings.metrics_enabled:
+    app.add_api_route("/metrics", metrics, include_in_schema=False)
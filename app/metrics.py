@@ -0,0 +1,215 @@
+import time
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api.filters.organization import OrganizationFilterSchema
+from app.cache.response import response_cache
+from app.database import get_pool_metrics
+
+# Формат текстовой выдачи Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Метрики изменяются только из потока event loop, поэтому блокировки не нужны:
+# наблюдение - это поиск корзины и увеличение счетчика в списке.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+RESULT_SIZE_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# Имена параметров фильтрации (метка filters): набор ограничен схемой,
+# поэтому количество комбинаций конечно.
+FILTER_PARAMS = frozenset(OrganizationFilterSchema.model_fields)
+
+
+def _labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    )
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Gauge:
+    """Значение, которое может расти и уменьшаться."""
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        # Значение без меток выводится сразу, даже если еще не менялось
+        self._values: dict[tuple[str, ...], float] = {} if label_names else {(): 0}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.label_names, labels)} {value}"
+
+
+class Histogram:
+    """Распределение значений по фиксированным корзинам."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: tuple[float, ...],
+        label_names: tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.label_names = label_names
+        # метки -> [счетчики корзин (последняя - +Inf), сумма]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        bucket_names = (*self.label_names, "le")
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket"
+                    f"{_labels(bucket_names, (*labels, str(bound)))} {cumulative}"
+                )
+            series_labels = _labels(self.label_names, labels)
+            yield f"{self.name}_sum{series_labels} {total}"
+            yield f"{self.name}_count{series_labels} {cumulative}"
+
+
+requests_in_flight = Gauge(
+    "http_requests_in_flight",
+    "HTTP-запросы, которые обрабатываются в данный момент.",
+)
+
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Длительность обработки HTTP-запросов.",
+    buckets=LATENCY_BUCKETS,
+    label_names=("method", "route", "filters", "status"),
+)
+
+organizations_result_size = Histogram(
+    "organizations_result_size",
+    "Количество организаций в ответе на поиск (при выполнении запроса к БД).",
+    buckets=RESULT_SIZE_BUCKETS,
+    label_names=("mode",),
+)
+
+
+def request_filters(query_string: bytes) -> str:
+    """Комбинация фильтров запроса: отсортированные имена через запятую."""
+
+    names = {
+        parameter.split(b"=", 1)[0].decode("latin-1")
+        for parameter in query_string.split(b"&")
+        if parameter
+    }
+    return ",".join(sorted(names & FILTER_PARAMS))
+
+
+def _scrape_gauges() -> Iterator[str]:
+    """Метрики, которые считываются в момент запроса /metrics."""
+
+    pool = get_pool_metrics()
+    cache = response_cache.stats()
+    gauges = [
+        # Без пула (профиль pgbouncer) метрик пула нет
+        ("db_pool_size", "Размер пула соединений.", pool.get("size")),
+        ("db_pool_checked_out", "Соединения, выданные из пула.", pool.get("checked_out")),
+        ("db_pool_checked_in", "Свободные соединения в пуле.", pool.get("checked_in")),
+        ("db_pool_overflow", "Соединения сверх размера пула.", pool.get("overflow")),
+        ("db_pool_saturation", "Доля занятых соединений пула.", pool.get("saturation")),
+        ("response_cache_entries", "Записей в кеше ответов.", cache.get("entries")),
+        ("response_cache_hit_rate", "Доля попаданий в кеш ответов.", cache["hit_rate"]),
+    ]
+    for name, documentation, value in gauges:
+        if value is None:
+            continue
+        yield f"# HELP {name} {documentation}"
+        yield f"# TYPE {name} gauge"
+        yield f"{name} {float(value)}"
+
+    counters = [
+        ("response_cache_hits_total", "Попадания в кеш ответов.", cache["hits"]),
+        ("response_cache_misses_total", "Промахи кеша ответов.", cache["misses"]),
+        ("response_cache_bypasses_total", "Запросы в обход кеша ответов.", cache["bypasses"]),
+        (
+            "response_cache_invalidations_total",
+            "Сбросы кеша ответов после изменения данных.",
+            cache["invalidations"],
+        ),
+    ]
+    for name, documentation, value in counters:
+        yield f"# HELP {name} {documentation}"
+        yield f"# TYPE {name} counter"
+        yield f"{name} {value}"
+
+
+def render_metrics() -> str:
+    """Все метрики в текстовом формате Prometheus."""
+
+    lines = [
+        *requests_in_flight.render(),
+        *request_duration.render(),
+        *organizations_result_size.render(),
+        *_scrape_gauges(),
+    ]
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: длительность и количество одновременных HTTP-запросов."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_flight.dec()
+            # Шаблон пути вместо самого пути: количество меток ограничено
+            route = scope.get("route")
+            request_duration.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                request_filters(scope["query_string"]),
+                str(status_code),
+            )
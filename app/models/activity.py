@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, String
+from sqlalchemy import Column, Index, Integer, ForeignKey, String
 
 from app.models.base import Base
 
@@ -10,3 +10,13 @@ class Activity(Base):
 
     name = Column(String, nullable=False, unique=True)
     parent_id = Column(Integer, ForeignKey("activity.id"))
+
+    __table_args__ = (
+        Index("ix_activity_parent_id", parent_id),
+        Index(
+            "ix_activity_name_trgm",
+            name,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
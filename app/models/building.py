@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import BigInteger, Column, Computed, Index, Integer, String, Float, func
 
 from app.models.base import Base
 
@@ -12,3 +12,18 @@ class Building(Base):
     address = Column(String, unique=True, nullable=False)
     latitude = Column(Float, unique=True, nullable=False)
     longitude = Column(Float, unique=True, nullable=False)
+    # Ключ ячейки сетки (app.queries.cell), вычисляется в БД
+    cell = Column(
+        BigInteger,
+        Computed("building_cell(latitude, longitude)", persisted=True),
+        nullable=False,
+    )
+
+    __table_args__ = (
+        Index(
+            "ix_building_location",
+            func.point(longitude, latitude),
+            postgresql_using="gist",
+        ),
+        Index("ix_building_cell", cell),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, String
+from sqlalchemy import Column, Index, Integer, ForeignKey, String
 
 from app.models.base import Base
 
@@ -10,3 +10,13 @@ class Organization(Base):
 
     name = Column(String, nullable=False, unique=True)
     building_id = Column(Integer, ForeignKey("building.id"))
+
+    __table_args__ = (
+        Index("ix_organization_building_id", building_id),
+        Index(
+            "ix_organization_name_trgm",
+            name,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Index, Integer, ForeignKey
 
 from app.models.base import Base
 
@@ -10,3 +10,17 @@ class OrganizationActivity(Base):
 
     organization_id = Column(Integer, ForeignKey("organization.id"))
     activity_id = Column(Integer, ForeignKey("activity.id"))
+
+    __table_args__ = (
+        # Оба направления связи, второй столбец делает индексы покрывающими
+        Index(
+            "ix_organization_activity_organization_id",
+            organization_id,
+            activity_id,
+        ),
+        Index(
+            "ix_organization_activity_activity_id",
+            activity_id,
+            organization_id,
+        ),
+    )
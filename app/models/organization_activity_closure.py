@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Index, Integer, PrimaryKeyConstraint
+
+from app.models.base import Base
+
+
+class OrganizationActivityClosure(Base):
+    """Связь организаций со всеми предками их видов деятельности (включая сами виды).
+
+    Заполняется триггерами на organization_activity и activity.
+    """
+
+    __tablename__ = "organization_activity_closure"
+
+    id = None
+    activity_id = Column(Integer, nullable=False)
+    organization_id = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # Покрывающий индекс: фильтр по деятельности - один проход по индексу
+        PrimaryKeyConstraint("activity_id", "organization_id"),
+        Index("ix_organization_activity_closure_organization_id", organization_id),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, String
+from sqlalchemy import Column, Index, Integer, ForeignKey, String
 
 from app.models.base import Base
 
@@ -11,3 +11,13 @@ class Phone(Base):
     id = Column(Integer, primary_key=True)
     organization_id = Column(Integer, ForeignKey("organization.id"))
     phone_number = Column(String, nullable=False)
+
+    __table_args__ = (
+        # Телефоны организации в порядке id, номер читается из индекса
+        Index(
+            "ix_phone_organization_id",
+            organization_id,
+            id,
+            postgresql_include=["phone_number"],
+        ),
+    )
@@ -0,0 +1,12 @@
+from sqlalchemy import BigInteger, Column, String
+
+from app.models.base import Base
+
+
+class TableVersion(Base):
+    """Модель для версий данных таблиц (увеличиваются триггерами)."""
+
+    __tablename__ = "table_version"
+
+    table_name = Column(String, nullable=False, unique=True)
+    version = Column(BigInteger, nullable=False, default=1)
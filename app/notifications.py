@@ -0,0 +1,146 @@
+import asyncio
+import logging
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+
+import asyncpg
+
+from app.config import get_settings
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+TABLE_VERSION_CHANNEL = "table_version_changed"
+
+# Обработчик получает новую версию таблицы или None, если уведомления
+# могли быть потеряны (например, после переподключения).
+TableChangeCallback = Callable[[int | None], Awaitable[None]]
+
+# Обработчик потери подписки: до переподключения изменения таблиц не видны
+DisconnectCallback = Callable[[], None]
+
+
+class TableChangeListener:
+    """Слушатель уведомлений об изменении таблиц (Postgres LISTEN/NOTIFY).
+
+    Уведомления отправляет триггерная функция bump_table_version().
+    listening - есть ли сейчас подписка; пока ее нет, изменения таблиц
+    не отслеживаются.
+    """
+
+    def __init__(self, reconnect_delay: float = 5.0):
+        self.reconnect_delay = reconnect_delay
+        self.listening = False
+        self._callbacks: dict[str, list[TableChangeCallback]] = defaultdict(list)
+        self._disconnect_callbacks: list[DisconnectCallback] = []
+        self._task: asyncio.Task | None = None
+        self._pending: set[asyncio.Task] = set()
+
+    def subscribe(
+        self,
+        table_name: str,
+        callback: TableChangeCallback,
+    ) -> None:
+        """Подписаться на изменения таблицы."""
+
+        self._callbacks[table_name].append(callback)
+
+    def subscribe_disconnect(
+        self,
+        callback: DisconnectCallback,
+    ) -> None:
+        """Подписаться на потерю подписки (обрыв или неудачное подключение)."""
+
+        self._disconnect_callbacks.append(callback)
+
+    async def start(self) -> None:
+        """Запустить прослушивание в фоне."""
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановить прослушивание."""
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._disconnected()
+
+    async def _run(self) -> None:
+        """Держать соединение с подпиской и переподключаться при обрыве."""
+
+        while True:
+            try:
+                connection = await asyncpg.connect(
+                    host=settings.db_host,
+                    port=settings.db_port,
+                    user=settings.db_username,
+                    password=settings.db_password,
+                    database=settings.db_name,
+                )
+            except (OSError, asyncpg.PostgresError):
+                logger.exception("Не удалось подключиться для LISTEN")
+                self._disconnected()
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+
+            terminated = asyncio.Event()
+            connection.add_termination_listener(lambda _: terminated.set())
+            try:
+                await connection.add_listener(TABLE_VERSION_CHANNEL, self._on_notify)
+                self.listening = True
+                # Пока подписки не было, уведомления могли потеряться
+                self._dispatch_all(version=None)
+                await terminated.wait()
+                logger.warning("Соединение LISTEN закрыто, переподключение")
+            except (OSError, asyncpg.PostgresError):
+                logger.exception("Не удалось подписаться на уведомления")
+            finally:
+                self._disconnected()
+                if not connection.is_closed():
+                    await connection.close()
+
+            await asyncio.sleep(self.reconnect_delay)
+
+    def _on_notify(
+        self,
+        connection: asyncpg.Connection,
+        pid: int,
+        channel: str,
+        payload: str,
+    ) -> None:
+        """Обработать уведомление вида "<таблица>:<версия>"."""
+
+        table_name, _, version = payload.rpartition(":")
+        for callback in self._callbacks.get(table_name, []):
+            self._schedule(callback(int(version) if version.isdigit() else None))
+
+    def _disconnected(self) -> None:
+        """Отметить потерю подписки и сообщить подписчикам."""
+
+        self.listening = False
+        for callback in self._disconnect_callbacks:
+            callback()
+
+    def _dispatch_all(self, version: int | None) -> None:
+        """Вызвать обработчики всех таблиц."""
+
+        for callbacks in self._callbacks.values():
+            for callback in callbacks:
+                self._schedule(callback(version))
+
+    def _schedule(self, coroutine: Awaitable[None]) -> None:
+        """Запустить обработчик в фоне, сохранив ссылку на задачу."""
+
+        task = asyncio.ensure_future(coroutine)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+
+table_change_listener = TableChangeListener()
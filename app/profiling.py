@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from types import CodeType, FrameType
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Заголовок запроса с подписью, включающей профилирование
+SIGNATURE_HEADER = b"x-profile-signature"
+
+# Заголовок запроса со сроком действия подписи (Unix-время, секунды)
+EXPIRES_HEADER = b"x-profile-expires"
+
+# Заголовок ответа с именем файла профиля
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+PROFILE_SUFFIX = ".folded"
+
+
+def profile_signature(
+    secret: str,
+    method: str,
+    path: str,
+    query_string: str,
+    expires: int,
+) -> str:
+    """Подпись запроса: HMAC-SHA256 от строки "METHOD path?query expires".
+
+    expires - время окончания действия подписи, чтобы перехваченный
+    подписанный запрос нельзя было повторять бесконечно.
+    """
+
+    target = f"{path}?{query_string}" if query_string else path
+    message = f"{method} {target} {expires}"
+    return hmac.new(secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+
+class StackSampler:
+    """Сэмплер стека одного потока.
+
+    Отдельный поток с заданным интервалом снимает стек целевого потока
+    (sys._current_frames) и считает одинаковые стеки. В отличие от cProfile
+    не замедляет каждый вызов функции, поэтому подходит для продакшена.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._labels: dict[CodeType, str] = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter[str]:
+        self._stopped.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._fold(frame)] += 1
+
+    def _fold(self, frame: FrameType | None) -> str:
+        """Стек в формате folded stacks: кадры от корня через ";"."""
+
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = (
+                    f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+                ).replace(";", ":")
+            labels.append(label)
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+
+class ProfileStore:
+    """Профили на диске: хранится не больше max_files последних файлов."""
+
+    def __init__(self, directory: str | Path, max_files: int):
+        self.directory = Path(directory)
+        self.max_files = max_files
+
+    def save(self, profile_id: str, root: str, stacks: Counter[str]) -> Path:
+        """Записать профиль и удалить самые старые файлы сверх лимита.
+
+        root - корневой кадр всех стеков (строка запроса), чтобы по
+        flamegraph было видно, какой запрос профилировался.
+        """
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{profile_id}{PROFILE_SUFFIX}"
+        root = root.replace(";", "%3B")
+        path.write_text(
+            "".join(f"{root};{stack} {count}\n" for stack, count in stacks.items()),
+            encoding="utf-8",
+        )
+
+        # Имена начинаются со времени, поэтому сортировка по имени - по возрасту
+        profiles = sorted(self.directory.glob(f"*{PROFILE_SUFFIX}"))
+        for old in profiles[: max(len(profiles) - self.max_files, 0)]:
+            old.unlink(missing_ok=True)
+        return path
+
+
+class ProfilingMiddleware:
+    """ASGI middleware: профилирование отдельных HTTP-запросов.
+
+    Запрос профилируется, если в заголовке X-Profile-Signature передана
+    подпись profile_signature(secret, ...), а срок из X-Profile-Expires
+    еще не прошел, или случайно с вероятностью
+    sample_rate. Случайно выбранный запрос пропускается, пока профилируется
+    другой. Сэмплер снимает стек потока event loop, поэтому в профиль
+    попадают и запросы, обрабатываемые одновременно с профилируемым,
+    а ожидание ответа БД видно как время в селекторе event loop.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: ProfileStore,
+        sample_rate: float = 0.0,
+        secret: str = "",
+        interval: float = 0.005,
+    ):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.secret = secret
+        self.interval = interval
+        self._active = 0
+
+    def _is_signed(self, scope: Scope) -> bool:
+        if not self.secret:
+            return False
+        headers = dict(scope["headers"])
+        signature = headers.get(SIGNATURE_HEADER)
+        expires = headers.get(EXPIRES_HEADER, b"")
+        if signature is None or not expires.isdigit() or int(expires) < time.time():
+            return False
+        expected = profile_signature(
+            self.secret,
+            scope["method"],
+            scope["path"],
+            scope["query_string"].decode("latin-1"),
+            int(expires),
+        )
+        # Байты, а не строки: compare_digest не принимает строки не из ASCII
+        return hmac.compare_digest(signature, expected.encode())
+
+    def _should_profile(self, scope: Scope) -> bool:
+        if self._is_signed(scope):
+            return True
+        return (
+            self.sample_rate > 0
+            and not self._active
+            and random.random() < self.sample_rate
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(PROFILE_ID_HEADER, profile_id)
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        self._active += 1
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            stacks = sampler.stop()
+            self._active -= 1
+            query_string = scope["query_string"].decode("latin-1")
+            root = f"{scope['method']} {scope['path']}"
+            if query_string:
+                root = f"{root}?{query_string}"
+            try:
+                path = await asyncio.to_thread(self.store.save, profile_id, root, stacks)
+            except OSError:
+                logger.exception("Не удалось сохранить профиль %s", profile_id)
+            else:
+                logger.info("Профиль сохранен: %s (%d сэмплов)", path, stacks.total())
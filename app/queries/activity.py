@@ -0,0 +1,88 @@
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
+
+from app.models.activity import Activity
+from app.models.organization import Organization
+from app.models.organization_activity import OrganizationActivity
+from app.models.organization_activity_closure import OrganizationActivityClosure
+
+
+def organization_ids_by_activity_query(
+    activity_ids: list[int],
+) -> sa.Select:
+    """Запрос ID организаций по конкретным видам деятельности."""
+
+    return sa.select(
+        OrganizationActivity.organization_id,
+    ).where(
+        OrganizationActivity.activity_id.in_(activity_ids),
+    )
+
+
+def organization_ids_by_activity_closure_query(
+    activity_ids: list[int] | sa.Select,
+) -> sa.Select:
+    """Запрос ID организаций по видам деятельности и всем их потомкам.
+
+    Иерархия уже развернута в organization_activity_closure,
+    поэтому это один проход по первичному ключу (activity_id, organization_id).
+    """
+
+    return (
+        sa.select(OrganizationActivityClosure.organization_id)
+        .where(
+            OrganizationActivityClosure.activity_id.in_(activity_ids),
+        )
+        .distinct()
+    )
+
+
+def organization_ids_by_activity_search_query(
+    activity_search_str: str,
+) -> sa.Select:
+    """Запрос ID организаций по названию деятельности (с учетом иерархии)."""
+
+    return organization_ids_by_activity_closure_query(
+        sa.select(Activity.id).where(
+            Activity.name.ilike(f"%{activity_search_str}%"),
+        )
+    )
+
+
+def organization_ids_by_activity_descendants_query(
+    activity_ids: list[int],
+) -> sa.Select:
+    """Запрос ID организаций по видам деятельности и всем их потомкам."""
+
+    return organization_ids_by_activity_closure_query(activity_ids)
+
+
+def organization_activities_json_query() -> sa.ScalarSelect:
+    """Подзапрос активностей организации в виде JSON-массива."""
+
+    return (
+        sa.select(
+            sa.func.json_agg(
+                aggregate_order_by(
+                    sa.func.json_build_object(
+                        "id",
+                        Activity.id,
+                        "name",
+                        Activity.name,
+                        "parent_id",
+                        Activity.parent_id,
+                    ),
+                    Activity.name,
+                ),
+                type_=JSON,
+            ),
+        )
+        .join(
+            OrganizationActivity,
+            OrganizationActivity.activity_id == Activity.id,
+        )
+        .where(
+            OrganizationActivity.organization_id == Organization.id,
+        )
+        .scalar_subquery()
+    )
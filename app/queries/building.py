@@ -0,0 +1,191 @@
+import math
+from typing import Literal
+
+import sqlalchemy as sa
+
+from app.models.building import Building
+from app.queries.cell import covering_cells_condition
+
+EARTH_RADIUS_KM = 6371
+
+# Максимально возможное расстояние между точками (половина окружности)
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+# Запас для ограничивающего прямоугольника, чтобы погрешность вычислений
+# не отсекала здания на самой границе радиуса.
+BOUNDING_BOX_MARGIN_DEGREES = 1e-6
+
+
+def haversine_distance(
+    latitude: float,
+    longitude: float,
+) -> sa.ColumnElement[float]:
+    """Расстояние (км) от точки до здания по формуле гаверсинуса."""
+
+    cosine = (
+        sa.func.cos(sa.func.radians(latitude))
+        * sa.func.cos(sa.func.radians(Building.latitude))
+        * sa.func.cos(sa.func.radians(Building.longitude) - sa.func.radians(longitude))
+        + sa.func.sin(sa.func.radians(latitude))
+        * sa.func.sin(sa.func.radians(Building.latitude))
+    )
+
+    # Из-за погрешности косинус может чуть выйти за [-1, 1], и acos упадет
+    return EARTH_RADIUS_KM * sa.func.acos(
+        sa.func.least(sa.func.greatest(cosine, -1.0), 1.0)
+    )
+
+
+def radius_bounding_boxes(
+    latitude: float,
+    longitude: float,
+    radius: float,
+) -> list[tuple[float, float, float, float]]:
+    """Ограничивающие прямоугольники (min_lon, min_lat, max_lon, max_lat) для радиуса.
+
+    Прямоугольник, пересекающий 180-й меридиан, разбивается на два.
+    """
+
+    if radius >= MAX_DISTANCE_KM:
+        return [(-180.0, -90.0, 180.0, 90.0)]
+
+    angular_radius = radius / EARTH_RADIUS_KM
+    delta_latitude = math.degrees(angular_radius) + BOUNDING_BOX_MARGIN_DEGREES
+    min_latitude = latitude - delta_latitude
+    max_latitude = latitude + delta_latitude
+
+    # Если в круг попадает полюс, подходят все долготы
+    if min_latitude <= -90 or max_latitude >= 90:
+        return [(-180.0, max(min_latitude, -90.0), 180.0, min(max_latitude, 90.0))]
+
+    delta_longitude = (
+        math.degrees(
+            math.asin(
+                min(math.sin(angular_radius) / math.cos(math.radians(latitude)), 1.0)
+            )
+        )
+        + BOUNDING_BOX_MARGIN_DEGREES
+    )
+    min_longitude = longitude - delta_longitude
+    max_longitude = longitude + delta_longitude
+
+    if min_longitude < -180:
+        return [
+            (-180.0, min_latitude, max_longitude, max_latitude),
+            (min_longitude + 360, min_latitude, 180.0, max_latitude),
+        ]
+    if max_longitude > 180:
+        return [
+            (min_longitude, min_latitude, 180.0, max_latitude),
+            (-180.0, min_latitude, max_longitude - 360, max_latitude),
+        ]
+    return [(min_longitude, min_latitude, max_longitude, max_latitude)]
+
+
+def viewport_boxes(
+    min_longitude: float,
+    min_latitude: float,
+    max_longitude: float,
+    max_latitude: float,
+) -> list[tuple[float, float, float, float]]:
+    """Прямоугольники (min_lon, min_lat, max_lon, max_lat) области карты.
+
+    Если min_longitude больше max_longitude, область пересекает 180-й
+    меридиан и разбивается на два прямоугольника.
+    """
+
+    if min_longitude > max_longitude:
+        return [
+            (min_longitude, min_latitude, 180.0, max_latitude),
+            (-180.0, min_latitude, max_longitude, max_latitude),
+        ]
+    return [(min_longitude, min_latitude, max_longitude, max_latitude)]
+
+
+def building_location() -> sa.ColumnElement:
+    """Выражение координат здания, по которому построен GiST-индекс."""
+
+    return sa.func.point(Building.longitude, Building.latitude)
+
+
+def bounding_boxes_condition(
+    boxes: list[tuple[float, float, float, float]],
+) -> sa.ColumnElement[bool]:
+    """Условие попадания здания в один из прямоугольников (использует GiST-индекс)."""
+
+    return sa.or_(
+        *(
+            building_location().op("<@")(
+                sa.func.box(
+                    sa.func.point(min_longitude, min_latitude),
+                    sa.func.point(max_longitude, max_latitude),
+                )
+            )
+            for min_longitude, min_latitude, max_longitude, max_latitude in boxes
+        )
+    )
+
+
+def in_radius_condition(
+    latitude: float,
+    longitude: float,
+    radius: float,
+) -> sa.ColumnElement[bool]:
+    """Условие попадания здания в радиус: прямоугольник по индексу и точное расстояние."""
+
+    return sa.and_(
+        bounding_boxes_condition(
+            radius_bounding_boxes(
+                latitude=latitude,
+                longitude=longitude,
+                radius=radius,
+            )
+        ),
+        haversine_distance(latitude=latitude, longitude=longitude) <= radius,
+    )
+
+
+def buildings_in_radius_query(
+    latitude: float,
+    longitude: float,
+    radius: float,
+    prefilter: Literal["box", "cell"] | None = "box",
+) -> sa.Select:
+    """Запрос зданий в радиусе от точки.
+
+    Сначала отбираются здания в ограничивающем прямоугольнике по индексу,
+    затем проверяется точное расстояние по формуле гаверсинуса.
+    При prefilter="cell" кандидаты отбираются по диапазонам ключей ячеек,
+    покрывающих прямоугольник (B-tree индекс по building.cell).
+    При prefilter=None выполняется полный перебор таблицы.
+    """
+
+    if prefilter == "box":
+        return sa.select(Building).where(
+            in_radius_condition(
+                latitude=latitude,
+                longitude=longitude,
+                radius=radius,
+            )
+        )
+
+    if prefilter == "cell":
+        boxes = radius_bounding_boxes(latitude=latitude, longitude=longitude, radius=radius)
+        return sa.select(Building).where(
+            covering_cells_condition(boxes),
+            # Тот же прямоугольник, что и в in_radius_condition, но без GiST-индекса
+            sa.or_(
+                *(
+                    sa.and_(
+                        Building.longitude.between(min_longitude, max_longitude),
+                        Building.latitude.between(min_latitude, max_latitude),
+                    )
+                    for min_longitude, min_latitude, max_longitude, max_latitude in boxes
+                )
+            ),
+            haversine_distance(latitude=latitude, longitude=longitude) <= radius,
+        )
+
+    return sa.select(Building).where(
+        haversine_distance(latitude=latitude, longitude=longitude) <= radius,
+    )
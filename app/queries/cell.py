@@ -0,0 +1,144 @@
+import math
+
+import sqlalchemy as sa
+
+from app.models.building import Building
+
+# Число уровней сетки. На уровне level мир делится на 2**level ячеек
+# по долготе и по широте; ячейка последнего уровня - около 0.6 м.
+CELL_LEVELS = 26
+
+CELL_SCALE = 1 << CELL_LEVELS
+
+# Сколько ячеек максимум покрывает один прямоугольник при поиске
+MAX_COVERING_CELLS = 16
+
+# Маски для чередования битов (как в SQL-функции building_cell)
+SPREAD_STEPS = (
+    (16, 0x0000FFFF0000FFFF),
+    (8, 0x00FF00FF00FF00FF),
+    (4, 0x0F0F0F0F0F0F0F0F),
+    (2, 0x3333333333333333),
+    (1, 0x5555555555555555),
+)
+
+
+def _grid_x(longitude: float) -> int:
+    return min(max(math.floor((longitude + 180.0) / 360.0 * CELL_SCALE), 0), CELL_SCALE - 1)
+
+
+def _grid_y(latitude: float) -> int:
+    return min(max(math.floor((latitude + 90.0) / 180.0 * CELL_SCALE), 0), CELL_SCALE - 1)
+
+
+def _spread(value: int) -> int:
+    """Раздвинуть биты: бит i переходит в позицию 2 * i."""
+
+    for shift, mask in SPREAD_STEPS:
+        value = (value | (value << shift)) & mask
+    return value
+
+
+def _interleave(x: int, y: int) -> int:
+    return (_spread(x) << 1) | _spread(y)
+
+
+def _compact(value: int) -> int:
+    """Обратное к _spread: собрать четные биты."""
+
+    value &= SPREAD_STEPS[-1][1]
+    masks = [mask for _, mask in reversed(SPREAD_STEPS[:-1])] + [0xFFFFFFFF]
+    for (shift, _), mask in zip(reversed(SPREAD_STEPS), masks):
+        value = (value | (value >> shift)) & mask
+    return value
+
+
+def cell_key(latitude: float, longitude: float) -> int:
+    """Ключ ячейки последнего уровня (как столбец building.cell).
+
+    Quadkey в виде числа: биты номера ячейки по долготе и по широте
+    чередуются, начиная со старшего. Ключ ячейки уровня level - старшие
+    2 * level бит, поэтому все здания ячейки лежат в одном диапазоне ключей.
+    """
+
+    return _interleave(_grid_x(longitude), _grid_y(latitude))
+
+
+def cell_at_level(cell: int, level: int) -> int:
+    """Ключ ячейки уровня level, содержащей ячейку последнего уровня."""
+
+    return cell >> (2 * (CELL_LEVELS - level))
+
+
+def cell_bounds(cell: int, level: int) -> tuple[float, float, float, float]:
+    """Границы (min_lon, min_lat, max_lon, max_lat) ячейки уровня level."""
+
+    x = _compact(cell >> 1)
+    y = _compact(cell)
+    longitude_step = 360.0 / (1 << level)
+    latitude_step = 180.0 / (1 << level)
+    return (
+        x * longitude_step - 180.0,
+        y * latitude_step - 90.0,
+        (x + 1) * longitude_step - 180.0,
+        (y + 1) * latitude_step - 90.0,
+    )
+
+
+def covering_cell_ranges(
+    boxes: list[tuple[float, float, float, float]],
+    max_cells: int = MAX_COVERING_CELLS,
+) -> list[tuple[int, int]]:
+    """Диапазоны ключей [first, last] ячеек, покрывающих прямоугольники.
+
+    Для каждого прямоугольника (min_lon, min_lat, max_lon, max_lat) берется
+    самый мелкий уровень, на котором его покрывают не больше max_cells ячеек.
+    Соседние диапазоны объединяются.
+    """
+
+    ranges = []
+    for min_longitude, min_latitude, max_longitude, max_latitude in boxes:
+        min_x, max_x = _grid_x(min_longitude), _grid_x(max_longitude)
+        min_y, max_y = _grid_y(min_latitude), _grid_y(max_latitude)
+
+        shift = 0
+        while ((max_x >> shift) - (min_x >> shift) + 1) * (
+            (max_y >> shift) - (min_y >> shift) + 1
+        ) > max_cells:
+            shift += 1
+
+        size = 1 << (2 * shift)
+        for x in range(min_x >> shift, (max_x >> shift) + 1):
+            for y in range(min_y >> shift, (max_y >> shift) + 1):
+                first = _interleave(x, y) * size
+                ranges.append((first, first + size - 1))
+
+    merged: list[tuple[int, int]] = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def building_cell_at_level(level: int) -> sa.ColumnElement[int]:
+    """Выражение ключа ячейки уровня level для здания."""
+
+    # Сдвиг для bigint задается значением integer
+    return Building.cell.op(">>", return_type=sa.BigInteger)(
+        sa.literal(2 * (CELL_LEVELS - level), sa.Integer)
+    )
+
+
+def covering_cells_condition(
+    boxes: list[tuple[float, float, float, float]],
+) -> sa.ColumnElement[bool]:
+    """Условие попадания здания в ячейки, покрывающие прямоугольники (B-tree индекс)."""
+
+    return sa.or_(
+        *(
+            Building.cell.between(first, last)
+            for first, last in covering_cell_ranges(boxes)
+        )
+    )
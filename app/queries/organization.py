@@ -0,0 +1,350 @@
+import sqlalchemy as sa
+
+from app.api.filters.organization import OrganizationFilterSchema
+from app.cache.activity_tree import ActivityTreeSnapshot
+from app.models.activity import Activity
+from app.models.building import Building
+from app.models.organization import Organization
+from app.models.organization_activity_closure import OrganizationActivityClosure
+from app.queries.activity import (
+    organization_activities_json_query,
+    organization_ids_by_activity_descendants_query,
+    organization_ids_by_activity_query,
+    organization_ids_by_activity_search_query,
+)
+from app.queries.building import (
+    MAX_DISTANCE_KM,
+    bounding_boxes_condition,
+    buildings_in_radius_query,
+    haversine_distance,
+    in_radius_condition,
+    viewport_boxes,
+)
+from app.queries.cell import building_cell_at_level
+from app.queries.pagination import (
+    SortKey,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+)
+from app.queries.phone import organization_phones_json_query
+
+
+class OrganizationQueryPlanner:
+    """Планировщик запроса поиска организаций.
+
+    Собирает все фильтры в один запрос: фильтры превращаются в подзапросы,
+    а активности и телефоны агрегируются в JSON в том же запросе.
+    Иерархия деятельностей берется из organization_activity_closure,
+    а если передан снимок дерева, названия деятельностей ищутся в памяти.
+    Пагинация keyset: курсор хранит значения ключей сортировки последней строки.
+    В режиме nearest организации сортируются по расстоянию до точки,
+    а nearest_radius ограничивает поиск кругом (см. get_nearest_organizations).
+    """
+
+    def __init__(
+        self,
+        filters: OrganizationFilterSchema,
+        organization_ids: list[int] | None = None,
+        activity_tree: ActivityTreeSnapshot | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+        nearest_radius: float | None = None,
+    ):
+        self.filters = filters
+        self.organization_ids = organization_ids
+        self.activity_tree = activity_tree
+        self.limit = limit
+        self.cursor = cursor
+        self.nearest_radius = nearest_radius
+        self.sort_keys = self._sort_keys()
+
+    def build(self) -> sa.Select:
+        """Собрать итоговый запрос."""
+
+        query = (
+            sa.select(
+                Organization.id,
+                Organization.name,
+                Building.id.label("building_id"),
+                Building.address.label("building_address"),
+                Building.latitude.label("building_latitude"),
+                Building.longitude.label("building_longitude"),
+                organization_activities_json_query().label("activities"),
+                organization_phones_json_query().label("phones"),
+                *(
+                    sort_key.expression.label(sort_key.label)
+                    for sort_key in self.sort_keys
+                ),
+            )
+            .join(
+                Building,
+                Organization.building_id == Building.id,
+            )
+            .order_by(
+                *(sort_key.order_by() for sort_key in self.sort_keys),
+            )
+        )
+
+        for clause in self._where_clauses():
+            query = query.where(clause)
+
+        if self.cursor:
+            query = query.where(
+                keyset_condition(
+                    self.sort_keys,
+                    decode_cursor(
+                        self.cursor,
+                        [sort_key.name for sort_key in self.sort_keys],
+                    ),
+                )
+            )
+
+        if self.limit is not None:
+            # Лишняя строка показывает, есть ли следующая страница
+            query = query.limit(self.limit + 1)
+
+        return query
+
+    def build_clusters(self, zoom: int) -> sa.Select:
+        """Собрать запрос количества организаций по ячейкам сетки уровня zoom.
+
+        Для каждой ячейки возвращаются ключ, количество организаций
+        и средние координаты их зданий.
+        """
+
+        cell = building_cell_at_level(zoom)
+        query = (
+            sa.select(
+                cell.label("cell"),
+                sa.func.count().label("count"),
+                sa.func.avg(Building.latitude).label("latitude"),
+                sa.func.avg(Building.longitude).label("longitude"),
+            )
+            .select_from(Organization)
+            .join(
+                Building,
+                Organization.building_id == Building.id,
+            )
+            .group_by(cell)
+            .order_by(cell)
+        )
+
+        for clause in self._where_clauses():
+            query = query.where(clause)
+
+        return query
+
+    def build_facet(self, facet: str, limit: int) -> sa.Select:
+        """Собрать запрос количества организаций по значениям фасета.
+
+        activity - виды деятельности верхнего уровня (организация учитывается
+        один раз, даже если у нее несколько видов из одного дерева),
+        building - здания. Возвращаются limit значений (id, name, count)
+        по убыванию количества.
+        """
+
+        count = sa.func.count().label("count")
+
+        if facet == "activity":
+            # Предки уже развернуты в organization_activity_closure
+            organization_ids = sa.select(Organization.id).join(
+                Building,
+                Organization.building_id == Building.id,
+            )
+            for clause in self._where_clauses():
+                organization_ids = organization_ids.where(clause)
+
+            key = Activity.id
+            query = (
+                sa.select(key, Activity.name, count)
+                .select_from(OrganizationActivityClosure)
+                .join(
+                    Activity,
+                    OrganizationActivityClosure.activity_id == Activity.id,
+                )
+                .where(
+                    Activity.parent_id.is_(None),
+                    OrganizationActivityClosure.organization_id.in_(organization_ids),
+                )
+            )
+        else:
+            key = Building.id
+            query = (
+                sa.select(key, Building.address.label("name"), count)
+                .select_from(Organization)
+                .join(
+                    Building,
+                    Organization.building_id == Building.id,
+                )
+            )
+            for clause in self._where_clauses():
+                query = query.where(clause)
+
+        return query.group_by(key).order_by(count.desc(), key).limit(limit)
+
+    def paginate(
+        self,
+        rows: list[sa.Row],
+    ) -> tuple[list[sa.Row], str | None]:
+        """Обрезать результат до страницы и получить курсор следующей."""
+
+        if self.limit is None or len(rows) <= self.limit:
+            return rows, None
+
+        rows = rows[: self.limit]
+        last_row = rows[-1]
+        return rows, encode_cursor(
+            {
+                sort_key.name: getattr(last_row, sort_key.label)
+                for sort_key in self.sort_keys
+            }
+        )
+
+    def _where_clauses(self) -> list[sa.ColumnElement[bool]]:
+        """Получить условия запроса по фильтрам."""
+
+        filters = self.filters
+        clauses = []
+
+        if self.organization_ids is not None:
+            clauses.append(Organization.id.in_(self.organization_ids))
+
+        if filters.organization_ids:
+            clauses.append(Organization.id.in_(filters.organization_ids_list))
+
+        if filters.building_ids:
+            clauses.append(Organization.building_id.in_(filters.building_ids_list))
+
+        if filters.search_str:
+            clauses.append(self._search_clause())
+
+        if filters.activity_ids:
+            clauses.append(
+                Organization.id.in_(self._activity_ids_subquery()),
+            )
+
+        if filters.nearest:
+            # radius=0 не означает "без ограничения", поэтому проверка на None
+            radius = min(
+                MAX_DISTANCE_KM if limit is None else limit
+                for limit in (self.nearest_radius, filters.radius)
+            )
+            if radius < MAX_DISTANCE_KM:
+                # Условие на присоединенное здание: прямоугольник по GiST-индексу
+                clauses.append(
+                    in_radius_condition(
+                        latitude=filters.latitude,
+                        longitude=filters.longitude,
+                        radius=radius,
+                    )
+                )
+        elif (
+            filters.radius is not None
+            and filters.latitude is not None
+            and filters.longitude is not None
+        ):
+            clauses.append(
+                Organization.building_id.in_(
+                    buildings_in_radius_query(
+                        latitude=filters.latitude,
+                        longitude=filters.longitude,
+                        radius=filters.radius,
+                    ).with_only_columns(Building.id)
+                )
+            )
+
+        if filters.bbox_list:
+            # Условие на присоединенное здание: прямоугольник по GiST-индексу
+            clauses.append(
+                bounding_boxes_condition(viewport_boxes(*filters.bbox_list)),
+            )
+
+        if filters.activity_search_str:
+            clauses.append(
+                Organization.id.in_(self._activity_search_subquery()),
+            )
+
+        return clauses
+
+    def _search_clause(self) -> sa.ColumnElement[bool]:
+        """Условие поиска по названию организации.
+
+        Оба варианта используют триграммный GIN-индекс по organization.name.
+        """
+
+        if self._is_fuzzy_search:
+            # Оператор % из pg_trgm: similarity выше pg_trgm.similarity_threshold
+            return Organization.name.op("%")(self.filters.search_str)
+
+        return Organization.name.ilike(f"%{self.filters.search_str}%")
+
+    def _distance(self) -> sa.ColumnElement[float]:
+        """Расстояние (км) от точки фильтра до здания организации."""
+
+        return haversine_distance(
+            latitude=self.filters.latitude,
+            longitude=self.filters.longitude,
+        )
+
+    def _sort_keys(self) -> list[SortKey]:
+        """Получить ключи сортировки результатов."""
+
+        if self.filters.nearest:
+            return [
+                # Значение попадает в ответ как расстояние до организации
+                SortKey(
+                    name="distance",
+                    expression=self._distance(),
+                    column="distance",
+                ),
+                SortKey(name="id", expression=Organization.id),
+            ]
+
+        if self._is_fuzzy_search:
+            return [
+                SortKey(
+                    name="similarity",
+                    expression=sa.func.similarity(
+                        Organization.name,
+                        self.filters.search_str,
+                    ),
+                    descending=True,
+                ),
+                SortKey(name="id", expression=Organization.id),
+            ]
+
+        return [SortKey(name="id", expression=Organization.id)]
+
+    @property
+    def _is_fuzzy_search(self) -> bool:
+        """Включен ли нечеткий поиск по названию."""
+
+        return bool(self.filters.search_str) and self.filters.search_mode == "fuzzy"
+
+    def _activity_ids_subquery(self) -> sa.Select:
+        """Подзапрос ID организаций по фильтру activity_ids."""
+
+        activity_ids = self.filters.activity_ids_list
+
+        if not self.filters.include_activity_descendants:
+            return organization_ids_by_activity_query(activity_ids=activity_ids)
+
+        return organization_ids_by_activity_descendants_query(
+            activity_ids=activity_ids,
+        )
+
+    def _activity_search_subquery(self) -> sa.Select:
+        """Подзапрос ID организаций по фильтру activity_search_str."""
+
+        activity_search_str = self.filters.activity_search_str
+
+        if self.activity_tree is None:
+            return organization_ids_by_activity_search_query(
+                activity_search_str=activity_search_str,
+            )
+
+        # Потомки уже учтены в organization_activity_closure
+        return organization_ids_by_activity_descendants_query(
+            activity_ids=sorted(self.activity_tree.match(activity_search_str)),
+        )
@@ -0,0 +1,104 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Any
+
+import sqlalchemy as sa
+
+# Допустимые значения ключа id (колонка INTEGER)
+INT32_MIN = -(2**31)
+INT32_MAX = 2**31 - 1
+
+
+class InvalidCursorError(ValueError):
+    """Некорректный курсор пагинации."""
+
+
+@dataclass(frozen=True)
+class SortKey:
+    """Ключ сортировки, по которому строится keyset-пагинация."""
+
+    name: str
+    expression: sa.ColumnElement
+    descending: bool = False
+    column: str | None = None
+
+    @property
+    def label(self) -> str:
+        """Имя колонки со значением ключа в результате запроса."""
+
+        return self.column or f"cursor_{self.name}"
+
+    def order_by(self) -> sa.ColumnElement:
+        """Выражение для ORDER BY."""
+
+        return self.expression.desc() if self.descending else self.expression
+
+    def after(self, value: Any) -> sa.ColumnElement[bool]:
+        """Условие "строго после значения" в порядке сортировки."""
+
+        if self.descending:
+            return self.expression < value
+        return self.expression > value
+
+
+def keyset_condition(
+    sort_keys: list[SortKey],
+    values: dict[str, Any],
+) -> sa.ColumnElement[bool]:
+    """Условие для строк, идущих после курсора.
+
+    (k1 после v1) OR (k1 = v1 AND k2 после v2) OR ...
+    """
+
+    conditions = []
+    for index, sort_key in enumerate(sort_keys):
+        conditions.append(
+            sa.and_(
+                *(
+                    previous.expression == values[previous.name]
+                    for previous in sort_keys[:index]
+                ),
+                sort_key.after(values[sort_key.name]),
+            )
+        )
+    return sa.or_(*conditions)
+
+
+def encode_cursor(values: dict[str, Any]) -> str:
+    """Закодировать значения ключей сортировки в непрозрачный курсор."""
+
+    payload = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(
+    cursor: str,
+    names: list[str],
+) -> dict[str, Any]:
+    """Раскодировать курсор и проверить, что он подходит к сортировке (имена ключей)."""
+
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(payload)
+    except (binascii.Error, ValueError) as error:
+        raise InvalidCursorError("Invalid cursor") from error
+
+    if not isinstance(values, dict) or set(values) != set(names):
+        raise InvalidCursorError("Cursor does not match the requested sorting")
+
+    if not all(
+        isinstance(value, (int, float)) and not isinstance(value, bool)
+        for value in values.values()
+    ):
+        raise InvalidCursorError("Invalid cursor")
+
+    # id подставляется в параметр INTEGER: дробное или слишком большое
+    # значение привело бы к ошибке драйвера, а не к 400
+    if "id" in values and not (
+        type(values["id"]) is int and INT32_MIN <= values["id"] <= INT32_MAX
+    ):
+        raise InvalidCursorError("Invalid cursor")
+
+    return values
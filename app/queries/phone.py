@@ -0,0 +1,22 @@
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
+
+from app.models.organization import Organization
+from app.models.phone import Phone
+
+
+def organization_phones_json_query() -> sa.ScalarSelect:
+    """Подзапрос телефонов организации в виде JSON-массива."""
+
+    return (
+        sa.select(
+            sa.func.json_agg(
+                aggregate_order_by(Phone.phone_number, Phone.id),
+                type_=JSON,
+            ),
+        )
+        .where(
+            Phone.organization_id == Organization.id,
+        )
+        .scalar_subquery()
+    )
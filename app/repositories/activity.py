@@ -57,3 +57,34 @@ class ActivityRepository(Repository):
             )
 
         return activities_map
+
+    async def get_activities(
+        self,
+    ) -> list[sa.Row]:
+        """Получить все виды деятельности (id, name, parent_id)."""
+
+        query = sa.select(
+            Activity.id,
+            Activity.name,
+            Activity.parent_id,
+        ).order_by(
+            Activity.id,
+        )
+
+        result = await self.session.execute(query)
+        return list(result.all())
+
+    async def get_activity_ids_by_name(
+        self,
+    ) -> list[int]:
+        """Получить ID видов деятельности в порядке названий (по правилам сортировки БД)."""
+
+        query = sa.select(
+            Activity.id,
+        ).order_by(
+            Activity.name,
+            Activity.id,
+        )
+
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
@@ -1,7 +1,9 @@
-import sqlalchemy as sa
 from typing import List
+
 from app.models.building import Building
+from app.queries.building import buildings_in_radius_query
 from app.repositories.base import Repository
+import sqlalchemy as sa
 
 
 class BuildingRepository(Repository):
@@ -17,35 +19,30 @@ class BuildingRepository(Repository):
         Найти здания в радиусе от точки (используя формулу гаверсинуса).
         """
 
-        query = sa.text(
-            """
-                SELECT * FROM building 
-                WHERE 6371 * acos(
-                    cos(radians(:lat)) * cos(radians(latitude)) * 
-                    cos(radians(longitude) - radians(:lon)) + 
-                    sin(radians(:lat)) * sin(radians(latitude))
-                ) <= :radius
-            """
+        query = buildings_in_radius_query(
+            latitude=latitude,
+            longitude=longitude,
+            radius=radius,
         )
 
-        result = await self.session.execute(
-            query,
-            {
-                "lat": latitude,
-                "lon": longitude,
-                "radius": radius,
-            },
+        result = await self.session.execute(query)
+
+        return list(result.scalars().all())
+
+    async def get_buildings(
+        self,
+    ) -> list[sa.Row]:
+        """Получить все здания (id, address, latitude, longitude, cell)."""
+
+        query = sa.select(
+            Building.id,
+            Building.address,
+            Building.latitude,
+            Building.longitude,
+            Building.cell,
+        ).order_by(
+            Building.id,
         )
 
-        rows = result.fetchall()
-        buildings = []
-        for row in rows:
-            building = Building(
-                id=row.id,
-                address=row.address,
-                latitude=row.latitude,
-                longitude=row.longitude,
-            )
-            buildings.append(building)
-
-        return buildings
+        result = await self.session.execute(query)
+        return list(result.all())
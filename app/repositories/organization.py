@@ -1,9 +1,19 @@
+from collections.abc import AsyncIterator
+
 from app.api.filters.organization import OrganizationFilterSchema
-from app.models.building import Building
+from app.cache.activity_tree import ActivityTreeSnapshot
+from app.config import get_settings
 from app.models.organization import Organization
+from app.queries.building import MAX_DISTANCE_KM
+from app.queries.organization import OrganizationQueryPlanner
 from app.repositories.base import Repository
 import sqlalchemy as sa
 
+settings = get_settings()
+
+# Во сколько раз увеличивается радиус, если ближайших организаций не хватило
+NEAREST_RADIUS_GROWTH = 4
+
 
 class OrganizationRepository(Repository):
     model = Organization
@@ -12,37 +22,133 @@ class OrganizationRepository(Repository):
         self,
         filters: OrganizationFilterSchema,
         organization_ids: list[int] | None = None,
-    ) -> list[tuple[Organization, Building]]:
-        """Получить организации по фильтрам."""
+        activity_tree: ActivityTreeSnapshot | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> tuple[list[sa.Row], str | None]:
+        """Получить страницу организаций по фильтрам вместе со зданием, активностями и телефонами.
 
-        query = sa.select(
-            Organization,
-            Building,
-        ).join(
-            Building,
-            self.model.building_id == Building.id,
+        Возвращает строки и курсор следующей страницы.
+        """
+
+        planner = OrganizationQueryPlanner(
+            filters=filters,
+            organization_ids=organization_ids,
+            activity_tree=activity_tree,
+            limit=limit,
+            cursor=cursor,
+        )
+
+        result = await self.session.execute(planner.build())
+
+        return planner.paginate(list(result.all()))
+
+    async def get_nearest_organizations(
+        self,
+        filters: OrganizationFilterSchema,
+        activity_tree: ActivityTreeSnapshot | None = None,
+    ) -> list[sa.Row]:
+        """Получить filters.nearest ближайших к точке организаций.
+
+        Поиск идет в круге, который расширяется, пока не найдется нужное
+        количество организаций. Внутри круга здания отбираются по GiST-индексу,
+        поэтому расстояние не считается для всех зданий.
+        """
+
+        max_radius = (
+            MAX_DISTANCE_KM
+            if filters.radius is None
+            else min(filters.radius, MAX_DISTANCE_KM)
         )
+        radius = min(settings.nearest_initial_radius_km, max_radius)
+
+        while True:
+            query = OrganizationQueryPlanner(
+                filters=filters,
+                activity_tree=activity_tree,
+                limit=filters.nearest,
+                nearest_radius=radius,
+            ).build()
+
+            rows = list((await self.session.execute(query)).all())
+            if len(rows) >= filters.nearest or radius >= max_radius:
+                return rows[: filters.nearest]
+
+            radius = min(radius * NEAREST_RADIUS_GROWTH, max_radius)
+
+    async def stream_organizations(
+        self,
+        filters: OrganizationFilterSchema,
+        batch_size: int,
+        activity_tree: ActivityTreeSnapshot | None = None,
+    ) -> AsyncIterator[list[sa.Row]]:
+        """Получить все организации по фильтрам пачками через серверный курсор.
 
-        if filters.building_ids:
-            query = query.where(
-                self.model.building_id.in_(
-                    filters.building_ids_list,
-                ),
+        Ближайшие организации (их не больше filters.nearest) ищутся тем же
+        расширяющимся кругом, что и в get_nearest_organizations, а не
+        сортировкой всех зданий по расстоянию.
+        """
+
+        if filters.nearest:
+            rows = await self.get_nearest_organizations(
+                filters=filters,
+                activity_tree=activity_tree,
             )
+            for start in range(0, len(rows), batch_size):
+                yield rows[start : start + batch_size]
+            return
 
-        if organization_ids:
-            query = query.where(
-                self.model.id.in_(
-                    organization_ids,
-                )
+        query = (
+            OrganizationQueryPlanner(
+                filters=filters,
+                activity_tree=activity_tree,
             )
+            .build()
+            .execution_options(yield_per=batch_size)
+        )
+
+        result = await self.session.stream(query)
+        async for rows in result.partitions():
+            yield rows
+
+    async def get_organization_clusters(
+        self,
+        filters: OrganizationFilterSchema,
+        zoom: int,
+        activity_tree: ActivityTreeSnapshot | None = None,
+    ) -> list[sa.Row]:
+        """Получить количество организаций по ячейкам сетки уровня zoom (по фильтрам)."""
 
-        if filters.search_str:
-            query = query.where(self.model.name.ilike(f"%{filters.search_str}%"))
+        query = OrganizationQueryPlanner(
+            filters=filters,
+            activity_tree=activity_tree,
+        ).build_clusters(zoom)
 
         result = await self.session.execute(query)
+        return list(result.all())
 
-        return result.all()
+    async def get_organization_facets(
+        self,
+        filters: OrganizationFilterSchema,
+        facets: list[str],
+        limit: int,
+        activity_tree: ActivityTreeSnapshot | None = None,
+    ) -> dict[str, list[sa.Row]]:
+        """Получить количество организаций по значениям фасетов (по фильтрам).
+
+        Для каждого фасета - один запрос с группировкой.
+        """
+
+        planner = OrganizationQueryPlanner(
+            filters=filters,
+            activity_tree=activity_tree,
+        )
+
+        result = {}
+        for facet in facets:
+            rows = await self.session.execute(planner.build_facet(facet, limit))
+            result[facet] = list(rows.all())
+        return result
 
     async def get_organization_by_building_ids(
         self,
@@ -60,3 +166,19 @@ class OrganizationRepository(Repository):
 
         result = await self.session.execute(query)
         return list(result.scalars().all())
+
+    async def get_organization_rows(
+        self,
+    ) -> list[sa.Row]:
+        """Получить все организации (id, name, building_id) в порядке ID."""
+
+        query = sa.select(
+            Organization.id,
+            Organization.name,
+            Organization.building_id,
+        ).order_by(
+            Organization.id,
+        )
+
+        result = await self.session.execute(query)
+        return list(result.all())
@@ -1,5 +1,9 @@
 from app.models.activity import Activity
 from app.models.organization_activity import OrganizationActivity
+from app.queries.activity import (
+    organization_ids_by_activity_query,
+    organization_ids_by_activity_search_query,
+)
 from app.repositories.base import Repository
 import sqlalchemy as sa
 
@@ -13,10 +17,8 @@ class OrganizationActivityRepository(Repository):
     ) -> list[int]:
         """Получить ID организаций по конкретной деятельности"""
 
-        query = sa.select(
-            OrganizationActivity.organization_id,
-        ).where(
-            OrganizationActivity.activity_id.in_(activity_ids),
+        query = organization_ids_by_activity_query(
+            activity_ids=activity_ids,
         )
 
         result = await self.session.execute(query)
@@ -54,40 +56,27 @@ class OrganizationActivityRepository(Repository):
     ) -> list[int]:
         """Получить ID организаций по деятельности (с учетом иерархии) - один запрос"""
 
-        # Рекурсивный CTE для поиска деятельностей
-        activity_cte = (
-            sa.select(
-                Activity.id.label("activity_id"),
-            )
-            .where(
-                Activity.name.ilike(f"%{activity_search_str}%"),
-            )
-            .cte(
-                name="matching_activities",
-                recursive=True,
-            )
+        query = organization_ids_by_activity_search_query(
+            activity_search_str=activity_search_str,
         )
 
-        # Рекурсивная часть
-        recursive_part = sa.select(Activity.id).join(
-            activity_cte,
-            Activity.parent_id == activity_cte.c.activity_id,
-        )
+        result = await self.session.execute(query)
+        organization_ids = result.scalars().all()
 
-        activity_tree = activity_cte.union_all(
-            recursive_part,
-        )
+        return list(organization_ids)
 
-        query = (
-            sa.select(OrganizationActivity.organization_id)
-            .join(
-                activity_tree,
-                OrganizationActivity.activity_id == activity_tree.c.activity_id,
-            )
-            .distinct()
+    async def get_links(
+        self,
+    ) -> list[sa.Row]:
+        """Получить все связи организаций с видами деятельности (organization_id, activity_id)."""
+
+        query = sa.select(
+            OrganizationActivity.organization_id,
+            OrganizationActivity.activity_id,
+        ).order_by(
+            OrganizationActivity.organization_id,
+            OrganizationActivity.id,
         )
 
         result = await self.session.execute(query)
-        organization_ids = result.scalars().all()
-
-        return list(organization_ids)
+        return list(result.all())
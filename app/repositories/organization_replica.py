@@ -0,0 +1,457 @@
+from collections.abc import AsyncIterator, Iterable, Iterator
+from itertools import islice
+from typing import NamedTuple
+
+from app.api.filters.organization import OrganizationFilterSchema
+from app.cache.activity_tree import ActivityTreeSnapshot
+from app.cache.directory import DirectorySnapshot, OrganizationRow
+from app.cache.id_set import IdFilter, IdSet, intersect_filters
+from app.config import get_settings
+from app.queries.building import MAX_DISTANCE_KM, radius_bounding_boxes, viewport_boxes
+from app.queries.cell import CELL_LEVELS
+from app.queries.pagination import decode_cursor, encode_cursor
+from app.repositories.organization import NEAREST_RADIUS_GROWTH
+
+settings = get_settings()
+
+
+class ClusterRow(NamedTuple):
+    """Строка с теми же полями, что у OrganizationQueryPlanner.build_clusters."""
+
+    cell: int
+    count: int
+    latitude: float
+    longitude: float
+
+
+class FacetRow(NamedTuple):
+    """Строка с теми же полями, что у OrganizationQueryPlanner.build_facet."""
+
+    id: int
+    name: str
+    count: int
+
+
+class OrganizationReplicaRepository:
+    """Поиск организаций по реплике справочника в памяти, без запросов к БД.
+
+    Повторяет OrganizationQueryPlanner: те же фильтры, сортировка и курсоры,
+    поэтому ответы совпадают с ответами OrganizationRepository
+    (проверяется python -m benchmarks.replica_diff). Снимок дерева
+    деятельностей берется из реплики, параметр activity_tree оставлен
+    для совместимости с OrganizationRepository.
+    """
+
+    def __init__(self, snapshot: DirectorySnapshot):
+        self.snapshot = snapshot
+
+    async def get_organizations(
+        self,
+        filters: OrganizationFilterSchema,
+        organization_ids: list[int] | None = None,
+        activity_tree: ActivityTreeSnapshot | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> tuple[list[OrganizationRow], str | None]:
+        """Получить страницу организаций по фильтрам и курсор следующей страницы."""
+
+        similarities = self._similarities(filters)
+        sort_values = self._sort_values(similarities)
+        ordered_ids = self._ordered_ids(
+            ids=self._organization_ids(filters, organization_ids, similarities),
+            similarities=similarities,
+            cursor=cursor,
+        )
+
+        # Лишняя строка показывает, есть ли следующая страница
+        rows = list(
+            islice(
+                self._rows(ordered_ids),
+                None if limit is None else limit + 1,
+            )
+        )
+        if limit is None or len(rows) <= limit:
+            return rows, None
+
+        rows = rows[:limit]
+        return rows, encode_cursor(sort_values(rows[-1].id))
+
+    async def get_nearest_organizations(
+        self,
+        filters: OrganizationFilterSchema,
+        activity_tree: ActivityTreeSnapshot | None = None,
+    ) -> list[OrganizationRow]:
+        """Получить filters.nearest ближайших к точке организаций."""
+
+        return list(self._nearest_rows(filters))
+
+    async def stream_organizations(
+        self,
+        filters: OrganizationFilterSchema,
+        batch_size: int,
+        activity_tree: ActivityTreeSnapshot | None = None,
+    ) -> AsyncIterator[list[OrganizationRow]]:
+        """Получить все организации по фильтрам пачками."""
+
+        if filters.nearest:
+            rows = self._nearest_rows(filters)
+        else:
+            similarities = self._similarities(filters)
+            rows = self._rows(
+                self._ordered_ids(
+                    ids=self._organization_ids(filters, None, similarities),
+                    similarities=similarities,
+                )
+            )
+
+        while batch := list(islice(rows, batch_size)):
+            yield batch
+
+    async def get_organization_clusters(
+        self,
+        filters: OrganizationFilterSchema,
+        zoom: int,
+        activity_tree: ActivityTreeSnapshot | None = None,
+    ) -> list[ClusterRow]:
+        """Получить количество организаций по ячейкам сетки уровня zoom (по фильтрам)."""
+
+        snapshot = self.snapshot
+        building = snapshot.building
+        shift = 2 * (CELL_LEVELS - zoom)
+        # Ячейка -> [количество, сумма широт, сумма долгот]
+        clusters: dict[int, list] = {}
+        for organization_id in self._organization_ids(filters, None, self._similarities(filters)):
+            position = snapshot.building_position(organization_id)
+            if position is None:
+                continue
+            cell = building.cells[position] >> shift
+            cluster = clusters.get(cell)
+            if cluster is None:
+                cluster = clusters[cell] = [0, 0.0, 0.0]
+            cluster[0] += 1
+            cluster[1] += building.latitudes[position]
+            cluster[2] += building.longitudes[position]
+
+        return [
+            ClusterRow(
+                cell=cell,
+                count=count,
+                latitude=latitude_sum / count,
+                longitude=longitude_sum / count,
+            )
+            for cell, (count, latitude_sum, longitude_sum) in sorted(clusters.items())
+        ]
+
+    async def get_organization_facets(
+        self,
+        filters: OrganizationFilterSchema,
+        facets: list[str],
+        limit: int,
+        activity_tree: ActivityTreeSnapshot | None = None,
+    ) -> dict[str, list[FacetRow]]:
+        """Получить количество организаций по значениям фасетов (по фильтрам).
+
+        Все фасеты считаются за один проход по отобранным ID.
+        """
+
+        snapshot = self.snapshot
+        building = snapshot.building
+        links = snapshot.organization_activity
+        tree = snapshot.activity.tree
+        # Фасет -> значение (ID деятельности или позиция здания) -> количество
+        counts: dict[str, dict[int, int]] = {facet: {} for facet in facets}
+        activity_counts = counts.get("activity")
+        building_counts = counts.get("building")
+
+        for organization_id in self._organization_ids(filters, None, self._similarities(filters)):
+            position = snapshot.building_position(organization_id)
+            if position is None:
+                # В SQL организация присоединяется к зданию через JOIN
+                continue
+            if building_counts is not None:
+                building_counts[position] = building_counts.get(position, 0) + 1
+            if activity_counts is not None:
+                roots = {
+                    tree.root(activity_id)
+                    for activity_id in links.by_organization.get(organization_id, ())
+                    if activity_id in tree.names
+                }
+                for root_id in roots:
+                    if root_id in tree.names:
+                        activity_counts[root_id] = activity_counts.get(root_id, 0) + 1
+
+        result = {}
+        for facet in facets:
+            if facet == "activity":
+                rows = [
+                    FacetRow(id=activity_id, name=tree.names[activity_id], count=count)
+                    for activity_id, count in activity_counts.items()
+                ]
+            else:
+                rows = [
+                    FacetRow(
+                        id=building.ids[position],
+                        name=building.addresses[position],
+                        count=count,
+                    )
+                    for position, count in building_counts.items()
+                ]
+            rows.sort(key=lambda row: (-row.count, row.id))
+            result[facet] = rows[:limit]
+        return result
+
+    def _similarities(
+        self,
+        filters: OrganizationFilterSchema,
+    ) -> dict[int, float] | None:
+        """Сходство названий в режиме fuzzy (None в остальных режимах)."""
+
+        if not (filters.search_str and filters.search_mode == "fuzzy"):
+            return None
+        return self.snapshot.organization.similar(
+            filters.search_str,
+            threshold=self.snapshot.similarity_threshold,
+        )
+
+    def _organization_ids(
+        self,
+        filters: OrganizationFilterSchema,
+        organization_ids: list[int] | None,
+        similarities: dict[int, float] | None,
+    ) -> IdSet:
+        """ID организаций, подходящих под все фильтры (кроме расстояния в режиме nearest)."""
+
+        result = intersect_filters(
+            self._id_filters(filters, organization_ids, similarities)
+        )
+        return self.snapshot.organization.ids if result is None else result
+
+    def _id_filters(
+        self,
+        filters: OrganizationFilterSchema,
+        organization_ids: list[int] | None,
+        similarities: dict[int, float] | None,
+    ) -> list[IdFilter]:
+        """Фильтры в том же составе, что OrganizationQueryPlanner._where_clauses."""
+
+        snapshot = self.snapshot
+        organizations = snapshot.organization
+        links = snapshot.organization_activity
+        tree = snapshot.activity.tree
+        id_filters = []
+
+        if organization_ids is not None:
+            id_filters.append(_fixed_filter("organization_ids", organization_ids))
+
+        if filters.organization_ids:
+            id_filters.append(
+                _fixed_filter("filter_organization_ids", filters.organization_ids_list)
+            )
+
+        if filters.building_ids:
+            building_ids = filters.building_ids_list
+            id_filters.append(
+                IdFilter(
+                    name="building_ids",
+                    estimate=organizations.count_in_buildings(building_ids),
+                    load=lambda: organizations.in_buildings(building_ids),
+                )
+            )
+
+        if filters.search_str:
+            if similarities is not None:
+                id_filters.append(
+                    IdFilter(
+                        name="search_str",
+                        estimate=len(similarities),
+                        load=lambda: IdSet.from_iterable(similarities),
+                    )
+                )
+            else:
+                id_filters.append(organizations.search_filter(filters.search_str))
+
+        if filters.activity_ids:
+            activity_ids = filters.activity_ids_list
+            if filters.include_activity_descendants:
+                activity_ids = tree.expand(activity_ids)
+            id_filters.append(_activity_filter("activity_ids", links, activity_ids))
+
+        if (
+            not filters.nearest
+            and filters.radius is not None
+            and filters.latitude is not None
+            and filters.longitude is not None
+        ):
+            id_filters.append(
+                IdFilter(
+                    name="radius",
+                    # Размер заранее неизвестен: фильтр выполняется последним
+                    estimate=len(organizations.ids),
+                    load=lambda: snapshot.organizations_in_radius(
+                        latitude=filters.latitude,
+                        longitude=filters.longitude,
+                        radius=filters.radius,
+                    ),
+                )
+            )
+
+        if filters.bbox_list:
+            id_filters.append(
+                IdFilter(
+                    name="bbox",
+                    # Размер заранее неизвестен: фильтр выполняется последним
+                    estimate=len(organizations.ids),
+                    load=lambda: snapshot.organizations_in_boxes(
+                        viewport_boxes(*filters.bbox_list)
+                    ),
+                )
+            )
+
+        if filters.activity_search_str:
+            id_filters.append(
+                _activity_filter(
+                    "activity_search_str",
+                    links,
+                    tree.search(filters.activity_search_str),
+                )
+            )
+
+        return id_filters
+
+    def _ordered_ids(
+        self,
+        ids: IdSet,
+        similarities: dict[int, float] | None,
+        cursor: str | None = None,
+    ) -> Iterable[int]:
+        """ID в порядке сортировки, начиная после курсора."""
+
+        if similarities is None:
+            if not cursor:
+                return ids
+            return ids.after(decode_cursor(cursor, ["id"])["id"])
+
+        ordered = sorted(
+            ids,
+            key=lambda organization_id: (-similarities[organization_id], organization_id),
+        )
+        if not cursor:
+            return ordered
+
+        values = decode_cursor(cursor, ["similarity", "id"])
+        return (
+            organization_id
+            for organization_id in ordered
+            if similarities[organization_id] < values["similarity"]
+            or (
+                similarities[organization_id] == values["similarity"]
+                and organization_id > values["id"]
+            )
+        )
+
+    def _sort_values(
+        self,
+        similarities: dict[int, float] | None,
+    ):
+        """Функция: ID последней строки -> значения ключей сортировки для курсора."""
+
+        if similarities is None:
+            return lambda organization_id: {"id": organization_id}
+        return lambda organization_id: {
+            "similarity": similarities[organization_id],
+            "id": organization_id,
+        }
+
+    def _rows(self, organization_ids: Iterable[int]) -> Iterator[OrganizationRow]:
+        """Строки организаций (организации без здания пропускаются, как при JOIN)."""
+
+        for organization_id in organization_ids:
+            row = self.snapshot.organization_row(organization_id)
+            if row is not None:
+                yield row
+
+    def _nearest_rows(
+        self,
+        filters: OrganizationFilterSchema,
+    ) -> Iterator[OrganizationRow]:
+        """Строки filters.nearest ближайших организаций с расстоянием."""
+
+        for distance, organization_id in self._nearest(filters):
+            yield self.snapshot.organization_row(organization_id, distance=distance)
+
+    def _nearest(
+        self,
+        filters: OrganizationFilterSchema,
+    ) -> list[tuple[float, int]]:
+        """(расстояние, ID) ближайших организаций в порядке (distance, id).
+
+        Без других фильтров здания ищутся по сетке в расширяющемся круге,
+        как в OrganizationRepository.get_nearest_organizations. Если
+        другие фильтры уже сузили выборку, расстояние считается только
+        для отобранных организаций.
+        """
+
+        snapshot = self.snapshot
+        max_radius = (
+            MAX_DISTANCE_KM
+            if filters.radius is None
+            else min(filters.radius, MAX_DISTANCE_KM)
+        )
+        candidates = intersect_filters(
+            self._id_filters(filters, None, self._similarities(filters))
+        )
+
+        if candidates is not None:
+            boxes = radius_bounding_boxes(
+                latitude=filters.latitude,
+                longitude=filters.longitude,
+                radius=max_radius,
+            )
+            found = []
+            for organization_id in candidates:
+                position = snapshot.building_position(organization_id)
+                if position is None:
+                    continue
+                distance = snapshot.building.distance_within(
+                    position,
+                    latitude=filters.latitude,
+                    longitude=filters.longitude,
+                    radius=max_radius,
+                    boxes=boxes,
+                )
+                if distance is not None:
+                    found.append((distance, organization_id))
+            return sorted(found)[: filters.nearest]
+
+        radius = min(settings.nearest_initial_radius_km, max_radius)
+        while True:
+            found = [
+                (distance, organization_id)
+                for building_id, distance in snapshot.building.in_radius(
+                    latitude=filters.latitude,
+                    longitude=filters.longitude,
+                    radius=radius,
+                ).items()
+                for organization_id in snapshot.organization.by_building.get(building_id, ())
+            ]
+            if len(found) >= filters.nearest or radius >= max_radius:
+                return sorted(found)[: filters.nearest]
+
+            radius = min(radius * NEAREST_RADIUS_GROWTH, max_radius)
+
+
+def _fixed_filter(name: str, ids: list[int]) -> IdFilter:
+    return IdFilter(
+        name=name,
+        estimate=len(ids),
+        load=lambda: IdSet.from_iterable(ids),
+    )
+
+
+def _activity_filter(name: str, links, activity_ids: Iterable[int]) -> IdFilter:
+    activity_ids = list(activity_ids)
+    return IdFilter(
+        name=name,
+        estimate=links.count(activity_ids),
+        load=lambda: links.organizations(activity_ids),
+    )
@@ -37,3 +37,19 @@ class PhoneRepository(Repository):
             phone_map[organization_id].append(row.phone_number)
 
         return phone_map
+
+    async def get_phones(
+        self,
+    ) -> list[sa.Row]:
+        """Получить все телефоны (organization_id, phone_number) в порядке ID."""
+
+        query = sa.select(
+            Phone.organization_id,
+            Phone.phone_number,
+        ).order_by(
+            Phone.organization_id,
+            Phone.id,
+        )
+
+        result = await self.session.execute(query)
+        return list(result.all())
@@ -0,0 +1,35 @@
+from app.models.table_version import TableVersion
+from app.repositories.base import Repository
+import sqlalchemy as sa
+
+
+class TableVersionRepository(Repository):
+    model = TableVersion
+
+    async def get_version(
+        self,
+        table_name: str,
+    ) -> int:
+        """Получить текущую версию данных таблицы."""
+
+        query = sa.select(
+            TableVersion.version,
+        ).where(
+            TableVersion.table_name == table_name,
+        )
+
+        result = await self.session.execute(query)
+        return result.scalar_one_or_none() or 0
+
+    async def get_versions(
+        self,
+    ) -> dict[str, int]:
+        """Получить версии данных всех отслеживаемых таблиц."""
+
+        query = sa.select(
+            TableVersion.table_name,
+            TableVersion.version,
+        )
+
+        result = await self.session.execute(query)
+        return {row.table_name: row.version for row in result}
@@ -1,27 +1,37 @@
-import asyncio
+from collections.abc import AsyncIterator
 from dataclasses import dataclass
 from typing import ClassVar
 
+import sqlalchemy as sa
 from fastapi import Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
+from app.api.filters.facets import FACETS, FacetsSchema
 from app.api.filters.organization import OrganizationFilterSchema
-from app.api.responses.building import BuildingResponse
-from app.api.responses.organization import (
-    OrganizationsListResponse,
-    OrganizationResponse,
-    ActivityResponse,
+from app.api.filters.pagination import PaginationSchema
+from app.api.serializers.organization import (
+    dump_organization,
+    dump_organization_clusters,
+    dump_organizations_batch,
+    dump_organizations_list,
+    dump_organizations_ndjson,
 )
+from app.cache.activity_tree import ActivityTreeSnapshot, activity_tree_cache
+from app.cache.directory import directory_replica
+from app.cache.etag import make_etag
+from app.cache.response import canonical_filters, filters_key_data, response_cache
+from app.cache.table_versions import table_versions
+from app.config import get_settings
 from app.database import get_session
-from app.repositories.activity import ActivityRepository
-from app.repositories.building import BuildingRepository
-
+from app.metrics import organizations_result_size
+from app.queries.pagination import InvalidCursorError
 from app.repositories.organization import OrganizationRepository
-from app.repositories.organization_activity import OrganizationActivityRepository
-from app.repositories.phone import PhoneRepository
+from app.repositories.organization_replica import OrganizationReplicaRepository
 from app.services.base import get_repository
 
+settings = get_settings()
+
 
 @dataclass
 class OrganizationService:
@@ -29,238 +39,363 @@ class OrganizationService:
     organization_repository: ClassVar[OrganizationRepository] = get_repository(
         OrganizationRepository
     )
-    activity_repository: ClassVar[ActivityRepository] = get_repository(
-        ActivityRepository
-    )
-    organization_activity_repository: ClassVar[OrganizationActivityRepository] = (
-        get_repository(OrganizationActivityRepository)
-    )
-    phone_repository: ClassVar[PhoneRepository] = get_repository(PhoneRepository)
-    building_repository: ClassVar[BuildingRepository] = get_repository(
-        BuildingRepository
-    )
 
-    async def get_organizations(
+    def _organization_repository(
         self,
-        filters: OrganizationFilterSchema,
-    ) -> OrganizationsListResponse:
-        """Главный метод для получения организаций по фильтрам"""
+    ) -> OrganizationRepository | OrganizationReplicaRepository:
+        """Репозиторий для поиска организаций.
 
-        organization_ids = await self._intersection_organization_ids(
-            filters=filters,
-        )
-        if organization_ids == self._empty_organization_response:
-            return self._empty_organization_response
+        Реплика в памяти, если она соответствует текущим версиям таблиц, иначе БД.
+        """
 
-        return await self._get_organizations(
-            filters=filters,
-            organization_ids=organization_ids,
-        )
+        snapshot = directory_replica.current(table_versions.current_versions)
+        if snapshot is None:
+            return self.organization_repository
+        return OrganizationReplicaRepository(snapshot)
 
-    def _validate_radius_filters(
+    def _activity_tree(self) -> ActivityTreeSnapshot | None:
+        """Снимок дерева деятельностей, если он соответствует текущей версии таблицы."""
+
+        return activity_tree_cache.current(table_versions.current_versions)
+
+    async def get_organizations(
         self,
         filters: OrganizationFilterSchema,
-    ) -> None:
-        """Проверить наличие всех полей для поиска по радиусу."""
+        pagination: PaginationSchema,
+        facets: FacetsSchema | None = None,
+    ) -> bytes:
+        """Главный метод для получения организаций по фильтрам.
+
+        Возвращает готовый JSON OrganizationsListResponse (с кешированием).
+        В режиме nearest пагинация не используется. Если запрошены фасеты,
+        в ответ добавляется количество организаций по их значениям.
+        """
+
+        filters = self._prepare_filters(filters)
+        facet_names = self._prepare_facets(filters, facets)
+
+        async def get_organizations_json() -> bytes:
+            if filters.nearest:
+                rows = await self._organization_repository().get_nearest_organizations(
+                    filters=filters,
+                    activity_tree=self._activity_tree(),
+                )
+                organizations_result_size.observe(len(rows), "nearest")
+                return dump_organizations_list(rows, None)
 
-        if not (filters.radius and filters.latitude and filters.longitude):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Для поиска по радиусу необходимо указать latitude, longitude и radius",
+            rows, next_cursor = await self._get_organizations(
+                filters=filters,
+                pagination=pagination,
             )
+            organizations_result_size.observe(len(rows), "page")
+            if not facet_names:
+                return dump_organizations_list(rows, next_cursor)
+
+            facet_rows = await self._organization_repository().get_organization_facets(
+                filters=filters,
+                facets=facet_names,
+                limit=settings.organization_facets_limit,
+                activity_tree=self._activity_tree(),
+            )
+            return dump_organizations_list(rows, next_cursor, facets=facet_rows)
 
-    async def _get_organizations(
+        return await response_cache.get_or_set(
+            namespace="organizations",
+            key_data=self._organizations_key_data(filters, pagination, facet_names),
+            factory=get_organizations_json,
+        )
+
+    def get_organizations_etag(
         self,
         filters: OrganizationFilterSchema,
-        organization_ids: list[int] | None = None,
-    ) -> OrganizationsListResponse:
-        """Общий метод для получения организаций с формированием ответа."""
-        organizations = await self.organization_repository.get_organizations(
-            filters=filters,
-            organization_ids=organization_ids,
+        pagination: PaginationSchema,
+        facets: FacetsSchema | None = None,
+    ) -> str | None:
+        """Получить ETag списка организаций без запросов к БД."""
+
+        filters = self._prepare_filters(filters)
+        return make_etag(
+            namespace="organizations",
+            key_data=self._organizations_key_data(
+                filters,
+                pagination,
+                self._prepare_facets(filters, facets),
+            ),
         )
 
-        if not organizations:
-            return self._empty_organization_response
+    async def get_organization_clusters(
+        self,
+        filters: OrganizationFilterSchema,
+        zoom: int,
+    ) -> bytes:
+        """Получить количество организаций по ячейкам сетки уровня zoom.
 
-        organization_ids = [organization.id for organization, _ in organizations]
+        Возвращает готовый JSON OrganizationClustersResponse (с кешированием).
+        """
 
-        organization_activities_map, organization_phone_map = (
-            await self._get_organizations_activities_and_phones_map(
-                organization_ids,
-            )
-        )
+        filters = self._prepare_cluster_filters(filters)
 
-        results = []
-
-        for organization, building in organizations:
-            results.append(
-                OrganizationResponse(
-                    id=organization.id,
-                    name=organization.name,
-                    building=BuildingResponse(
-                        id=building.id,
-                        address=building.address,
-                        latitude=building.latitude,
-                        longitude=building.longitude,
-                    ),
-                    activities=(
-                        [
-                            ActivityResponse(
-                                id=activity.id,
-                                name=activity.name,
-                                parent_id=activity.parent_id,
-                            )
-                            for activity in organization_activities_map[organization.id]
-                        ]
-                        if organization_activities_map.get(organization.id, None)
-                        else None
-                    ),
-                    phones=(
-                        [
-                            phone_number
-                            for phone_number in organization_phone_map[organization.id]
-                        ]
-                        if organization_phone_map.get(organization.id, None)
-                        else None
-                    ),
-                )
+        async def get_clusters_json() -> bytes:
+            rows = await self._organization_repository().get_organization_clusters(
+                filters=filters,
+                zoom=zoom,
+                activity_tree=self._activity_tree(),
             )
+            return dump_organization_clusters(zoom, rows)
 
-        return OrganizationsListResponse(
-            results=results,
+        return await response_cache.get_or_set(
+            namespace="organization_clusters",
+            key_data={**filters_key_data(filters), "zoom": zoom},
+            factory=get_clusters_json,
         )
 
-    async def get_organization(
+    def get_organization_clusters_etag(
+        self,
+        filters: OrganizationFilterSchema,
+        zoom: int,
+    ) -> str | None:
+        """Получить ETag кластеров организаций без запросов к БД."""
+
+        return make_etag(
+            namespace="organization_clusters",
+            key_data={
+                **filters_key_data(self._prepare_cluster_filters(filters)),
+                "zoom": zoom,
+            },
+        )
+
+    def get_organization_etag(
         self,
         organization_id: int,
-    ) -> OrganizationResponse:
-        """Получить организацию по идентификатору."""
+    ) -> str | None:
+        """Получить ETag организации без запросов к БД."""
 
-        organizations = await self._get_organizations(
-            filters=OrganizationFilterSchema(),
-            organization_ids=[organization_id],
+        return make_etag(
+            namespace="organization",
+            key_data={"id": organization_id},
         )
 
-        if not organizations.results:
+    def _prepare_filters(
+        self,
+        filters: OrganizationFilterSchema,
+    ) -> OrganizationFilterSchema:
+        """Проверить фильтры и привести их к каноническому виду."""
+
+        if filters.nearest:
+            self._validate_nearest_filters(filters=filters)
+        elif filters.radius or filters.latitude or filters.longitude:
+            self._validate_radius_filters(filters=filters)
+
+        if filters.bbox:
+            self._validate_bbox_filters(filters=filters)
+
+        return canonical_filters(filters)
+
+    def _prepare_cluster_filters(
+        self,
+        filters: OrganizationFilterSchema,
+    ) -> OrganizationFilterSchema:
+        """Проверить фильтры кластеров: ближайшие организации не группируются."""
+
+        if filters.nearest:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Organization not found",
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Параметр nearest не поддерживается при группировке по ячейкам",
             )
-        return organizations.results[0]
+        return self._prepare_filters(filters)
 
-    async def _get_organization_ids_by_building_radius(
+    def _prepare_facets(
         self,
-        latitude: float,
-        longitude: float,
-        radius: float,
-    ) -> list[int]:
-        """Получить ID зданий в радиусе от точки."""
-
-        buildings = await self.building_repository.get_buildings_in_radius(
-            latitude=latitude,
-            longitude=longitude,
-            radius=radius,
-        )
+        filters: OrganizationFilterSchema,
+        facets: FacetsSchema | None,
+    ) -> list[str] | None:
+        """Проверить запрошенные фасеты и привести их к порядку FACETS."""
 
-        building_ids = [building.id for building in buildings]
+        names = facets.facets_list if facets else None
+        if not names:
+            return None
 
-        organizations = (
-            await self.organization_repository.get_organization_by_building_ids(
-                building_ids=building_ids,
+        unknown = [name for name in names if name not in FACETS]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Неизвестные фасеты: {', '.join(unknown)}. "
+                f"Допустимые значения: {', '.join(FACETS)}",
+            )
+        if filters.nearest:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Параметр facets не поддерживается в режиме nearest",
             )
-        )
 
-        return [organization.id for organization in organizations]
+        return [facet for facet in FACETS if facet in names]
 
-    async def _get_organizations_activities_and_phones_map(
+    def _organizations_key_data(
         self,
-        organization_ids: list[int],
-    ) -> tuple[dict, dict]:
-        """Получить мапу активностей и мапу телефонов одновременно"""
+        filters: OrganizationFilterSchema,
+        pagination: PaginationSchema,
+        facet_names: list[str] | None = None,
+    ) -> dict:
+        """Данные ключа кеша и ETag для списка организаций."""
+
+        if filters.nearest:
+            # Пагинация в режиме nearest не влияет на ответ
+            return filters_key_data(filters)
+
+        key_data = {
+            **filters_key_data(filters),
+            "limit": pagination.limit,
+            "cursor": pagination.cursor,
+        }
+        if facet_names:
+            # Без фасетов ключ не меняется
+            key_data["facets"] = facet_names
+        return key_data
+
+    def stream_organizations(
+        self,
+        filters: OrganizationFilterSchema,
+    ) -> AsyncIterator[bytes]:
+        """Получить все организации по фильтрам в виде потока NDJSON.
 
-        return await asyncio.gather(
-            self.activity_repository.get_organizations_activities_map(organization_ids),
-            self.phone_repository.get_organizations_phones_map(organization_ids),
-        )
+        Фильтры проверяются сразу, до начала отправки ответа.
+        """
+
+        return self._stream_organizations(filters=self._prepare_filters(filters))
 
-    @property
-    def _empty_organization_response(
+    async def _stream_organizations(
         self,
-    ) -> OrganizationsListResponse:
-        """Получить пустой ответ списка организаций."""
+        filters: OrganizationFilterSchema,
+    ) -> AsyncIterator[bytes]:
+        """Сериализовать организации по мере чтения пачек из БД."""
 
-        return OrganizationsListResponse(results=[])
+        async for rows in self._organization_repository().stream_organizations(
+            filters=filters,
+            batch_size=settings.organizations_stream_batch_size,
+            activity_tree=self._activity_tree(),
+        ):
+            yield dump_organizations_ndjson(rows)
 
-    async def _intersection_organization_ids(
+    def _validate_radius_filters(
         self,
         filters: OrganizationFilterSchema,
-    ) -> list[int] | OrganizationsListResponse:
-        """Ищем пересечения всех org_id из фильтров."""
+    ) -> None:
+        """Проверить наличие всех полей для поиска по радиусу."""
+
+        self._validate_radius(filters=filters)
+        if not (filters.radius and filters.latitude and filters.longitude):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Для поиска по радиусу необходимо указать latitude, longitude и radius",
+            )
 
-        # Начинаем с None - значит пока нет фильтров
-        organization_ids = None
+    def _validate_bbox_filters(
+        self,
+        filters: OrganizationFilterSchema,
+    ) -> None:
+        """Проверить область карты: четыре числа в допустимых пределах."""
+
+        bbox = filters.bbox_list
+        if bbox is None or not (
+            -180 <= bbox[0] <= 180
+            and -180 <= bbox[2] <= 180
+            and -90 <= bbox[1] <= bbox[3] <= 90
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="bbox должен иметь вид minLon,minLat,maxLon,maxLat "
+                "(долгота от -180 до 180, широта от -90 до 90, minLat <= maxLat)",
+            )
 
-        # 1. Если есть явные organization_ids
-        if filters.organization_ids:
-            organization_ids = set(filters.organization_ids_list)
+    def _validate_nearest_filters(
+        self,
+        filters: OrganizationFilterSchema,
+    ) -> None:
+        """Проверить наличие точки для поиска ближайших организаций."""
 
-        # 2. Если есть фильтр по активности
-        if filters.activity_ids:
-            organizations_by_activity = await self.organization_activity_repository.get_organization_ids_by_activity(
-                activity_ids=filters.activity_ids_list,
+        if filters.latitude is None or filters.longitude is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Для поиска ближайших организаций необходимо указать latitude и longitude",
             )
+        self._validate_radius(filters=filters)
 
-            activity_set = set(organizations_by_activity)
-            if not activity_set:
-                return self._empty_organization_response
-            if organization_ids is not None:
-                # Пересекаем с существующим
-                organization_ids = organization_ids.intersection(activity_set)
-            else:
-                # Первый фильтр
-                organization_ids = activity_set
-
-        # 3. Если есть фильтр по радиусу
-        if filters.radius or filters.latitude or filters.longitude:
-            self._validate_radius_filters(filters=filters)
-            organizations_by_radius = (
-                await self._get_organization_ids_by_building_radius(
-                    radius=filters.radius,
-                    latitude=filters.latitude,
-                    longitude=filters.longitude,
-                )
+    def _validate_radius(
+        self,
+        filters: OrganizationFilterSchema,
+    ) -> None:
+        """Проверить, что радиус, если указан, больше нуля."""
+
+        if filters.radius is not None and filters.radius <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Радиус поиска должен быть больше нуля",
             )
 
-            radius_set = set(organizations_by_radius)
-            if not radius_set:
-                return self._empty_organization_response
+    async def batch_get_organizations(
+        self,
+        organization_ids: list[int],
+    ) -> bytes:
+        """Получить организации по списку ID одним запросом.
 
-            if organization_ids is not None:
-                # Пересекаем с существующим
-                organization_ids = organization_ids.intersection(radius_set)
-            else:
-                # Первый фильтр
-                organization_ids = radius_set
+        Возвращает готовый JSON OrganizationsBatchGetResponse: результаты
+        в порядке запроса, для ненайденных ID found=false.
+        """
+
+        rows, _ = await self._get_organizations(
+            filters=OrganizationFilterSchema(),
+            organization_ids=sorted(set(organization_ids)),
+        )
+        return dump_organizations_batch(organization_ids, rows)
 
-        if filters.activity_search_str:
-            organizations_by_activity_search = await self.organization_activity_repository.get_organization_ids_by_activity_search(
-                activity_search_str=filters.activity_search_str,
+    async def _get_organizations(
+        self,
+        filters: OrganizationFilterSchema,
+        organization_ids: list[int] | None = None,
+        pagination: PaginationSchema | None = None,
+    ) -> tuple[list[sa.Row], str | None]:
+        """Общий метод для получения строк организаций и курсора следующей страницы.
+
+        Все фильтры, активности и телефоны получаются одним запросом.
+        """
+
+        try:
+            rows, next_cursor = await self._organization_repository().get_organizations(
+                filters=filters,
+                organization_ids=organization_ids,
+                activity_tree=self._activity_tree(),
+                limit=pagination.limit if pagination else None,
+                cursor=pagination.cursor if pagination else None,
+            )
+        except InvalidCursorError as error:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(error),
             )
 
-            activity_search_set = set(organizations_by_activity_search)
-            if not activity_search_set:
-                return self._empty_organization_response
+        return rows, next_cursor
 
-            if organization_ids is not None:
-                # Пересекаем с существующим
-                organization_ids = organization_ids.intersection(activity_search_set)
-            else:
-                # Первый фильтр
-                organization_ids = activity_search_set
+    async def get_organization(
+        self,
+        organization_id: int,
+    ) -> bytes:
+        """Получить организацию по идентификатору (готовый JSON OrganizationResponse, с кешированием)."""
 
-        if organization_ids is not None and len(organization_ids) == 0:
-            # Фильтры были, но пересечение пустое
-            return self._empty_organization_response
+        async def get_organization_json() -> bytes:
+            rows, _ = await self._get_organizations(
+                filters=OrganizationFilterSchema(),
+                organization_ids=[organization_id],
+            )
 
-        return list(organization_ids) if organization_ids is not None else None
+            if not rows:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Organization not found",
+                )
+            return dump_organization(rows[0])
+
+        return await response_cache.get_or_set(
+            namespace="organization",
+            key_data={"id": organization_id},
+            factory=get_organization_json,
+        )
@@ -0,0 +1,322 @@
+"""Генератор большого синтетического справочника для нагрузочных тестов.
+
+Заполняет схему зданиями (сгруппированными вокруг городов), деревом
+деятельностей в три уровня (ограничение check_activity_depth), организациями,
+их видами деятельности и телефонами. Данные загружаются через COPY
+(asyncpg) пачками в одной транзакции. При одинаковом --seed и пустой БД
+результат одинаковый.
+
+Запуск:
+    python -m benchmarks.generate_dataset --buildings 1000000 --organizations 3000000
+    python -m benchmarks.generate_dataset --truncate --organizations 100000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections.abc import Iterator
+
+from asyncpg import Connection
+from sqlalchemy import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import url
+
+# (город, широта, долгота, разброс в градусах, вес)
+CITIES = [
+    ("Москва", 55.7558, 37.6173, 0.25, 12.6),
+    ("Санкт-Петербург", 59.9343, 30.3351, 0.2, 5.6),
+    ("Новосибирск", 55.0084, 82.9357, 0.15, 1.6),
+    ("Екатеринбург", 56.8389, 60.6057, 0.15, 1.5),
+    ("Казань", 55.7961, 49.1064, 0.12, 1.3),
+    ("Нижний Новгород", 56.2965, 43.9361, 0.12, 1.2),
+    ("Самара", 53.1959, 50.1002, 0.12, 1.1),
+    ("Ростов-на-Дону", 47.2357, 39.7015, 0.12, 1.1),
+    ("Краснодар", 45.0355, 38.9753, 0.1, 1.0),
+    ("Владивосток", 43.1155, 131.8855, 0.08, 0.6),
+]
+
+STREETS = [
+    "Ленина",
+    "Мира",
+    "Советская",
+    "Садовая",
+    "Центральная",
+    "Школьная",
+    "Лесная",
+    "Набережная",
+    "Молодежная",
+    "Победы",
+]
+
+ORGANIZATION_FORMS = ["ООО", "ОАО", "АО", "ИП", "ЗАО"]
+
+ACTIVITY_PREFIX = "Синтетическая деятельность"
+
+# Таблицы справочника в порядке очистки
+DIRECTORY_TABLES = ("organization_activity", "phone", "organization", "building", "activity")
+
+
+def generate_buildings(
+    rng: random.Random,
+    first_id: int,
+    count: int,
+) -> Iterator[tuple]:
+    """Здания: нормальное распределение вокруг городов с учетом их веса."""
+
+    weights = [city[4] for city in CITIES]
+    for building_id in range(first_id, first_id + count):
+        name, latitude, longitude, spread, _ = rng.choices(CITIES, weights)[0]
+        yield (
+            building_id,
+            f"г. {name}, ул. {rng.choice(STREETS)} {rng.randint(1, 200)}, "
+            f"стр. {building_id}",
+            round(rng.gauss(latitude, spread), 6),
+            round(rng.gauss(longitude, spread), 6),
+        )
+
+
+def generate_activities(
+    first_id: int,
+    roots: int,
+    children: int,
+    grandchildren: int,
+) -> list[tuple]:
+    """Дерево деятельностей в три уровня (в порядке родитель перед потомком)."""
+
+    activities = []
+    next_id = first_id
+
+    def add(name: str, parent_id: int | None) -> int:
+        nonlocal next_id
+        activities.append((next_id, name, parent_id))
+        next_id += 1
+        return next_id - 1
+
+    for root in range(1, roots + 1):
+        root_id = add(f"{ACTIVITY_PREFIX} {root}", None)
+        for child in range(1, children + 1):
+            child_id = add(f"{ACTIVITY_PREFIX} {root}.{child}", root_id)
+            for grandchild in range(1, grandchildren + 1):
+                add(
+                    f"{ACTIVITY_PREFIX} {root}.{child}.{grandchild}",
+                    child_id,
+                )
+
+    return activities
+
+
+def generate_organizations(
+    rng: random.Random,
+    first_id: int,
+    count: int,
+    building_ids: range,
+    activity_ids: list[int],
+    first_link_id: int,
+    first_phone_id: int,
+) -> tuple[list[tuple], list[tuple], list[tuple]]:
+    """Организации с видами деятельности (1-3) и телефонами (1-3)."""
+
+    organizations = []
+    links = []
+    phones = []
+
+    for organization_id in range(first_id, first_id + count):
+        organizations.append(
+            (
+                organization_id,
+                f'{rng.choice(ORGANIZATION_FORMS)} "Синтетика {organization_id}"',
+                rng.choice(building_ids),
+            )
+        )
+        for activity_id in rng.sample(activity_ids, rng.randint(1, 3)):
+            links.append((first_link_id + len(links), organization_id, activity_id))
+        for _ in range(rng.randint(1, 3)):
+            phones.append(
+                (
+                    first_phone_id + len(phones),
+                    organization_id,
+                    f"8-9{rng.randint(0, 99):02d}-{rng.randint(0, 999):03d}-"
+                    f"{rng.randint(0, 99):02d}-{rng.randint(0, 99):02d}",
+                )
+            )
+
+    return organizations, links, phones
+
+
+async def next_id(connection: Connection, table_name: str) -> int:
+    """Первый свободный ID таблицы."""
+
+    return await connection.fetchval(f"SELECT coalesce(max(id), 0) + 1 FROM {table_name}")
+
+
+async def copy(
+    connection: Connection,
+    table_name: str,
+    columns: list[str],
+    records,
+) -> None:
+    """Загрузить строки в таблицу через COPY."""
+
+    await connection.copy_records_to_table(
+        table_name,
+        records=records,
+        columns=columns,
+    )
+
+
+async def generate(
+    connection: Connection,
+    buildings: int,
+    organizations: int,
+    tree: tuple[int, int, int],
+    batch_size: int,
+    seed: int,
+    truncate: bool,
+) -> dict[str, int]:
+    """Сгенерировать справочник и вернуть количество загруженных строк по таблицам."""
+
+    rng = random.Random(seed)
+    loaded = dict.fromkeys(DIRECTORY_TABLES, 0)
+
+    if truncate:
+        await connection.execute(
+            f"TRUNCATE {', '.join(DIRECTORY_TABLES)} RESTART IDENTITY CASCADE"
+        )
+
+    # 1. Здания
+    first_building_id = await next_id(connection, "building")
+    for offset in range(0, buildings, batch_size):
+        count = min(batch_size, buildings - offset)
+        await copy(
+            connection,
+            "building",
+            ["id", "address", "latitude", "longitude"],
+            generate_buildings(rng, first_building_id + offset, count),
+        )
+        loaded["building"] += count
+    building_ids = range(first_building_id, first_building_id + buildings)
+
+    # 2. Дерево деятельностей (проверка глубины выполняется триггером на каждую строку).
+    # Названия уникальны, поэтому при повторном запуске используется уже созданное дерево.
+    activity_ids = [
+        record["id"]
+        for record in await connection.fetch(
+            f"SELECT id FROM activity WHERE name LIKE '{ACTIVITY_PREFIX} %' ORDER BY id"
+        )
+    ]
+    if not activity_ids:
+        activities = generate_activities(await next_id(connection, "activity"), *tree)
+        await copy(connection, "activity", ["id", "name", "parent_id"], activities)
+        loaded["activity"] = len(activities)
+        activity_ids = [activity[0] for activity in activities]
+
+    # 3. Организации пачками: триггеры на organization_activity
+    # пересчитывают замыкание деятельностей только для новой пачки
+    first_organization_id = await next_id(connection, "organization")
+    next_link_id = await next_id(connection, "organization_activity")
+    next_phone_id = await next_id(connection, "phone")
+    for offset in range(0, organizations, batch_size):
+        batch, links, phones = generate_organizations(
+            rng=rng,
+            first_id=first_organization_id + offset,
+            count=min(batch_size, organizations - offset),
+            building_ids=building_ids,
+            activity_ids=activity_ids,
+            first_link_id=next_link_id,
+            first_phone_id=next_phone_id,
+        )
+        await copy(connection, "organization", ["id", "name", "building_id"], batch)
+        await copy(
+            connection,
+            "organization_activity",
+            ["id", "organization_id", "activity_id"],
+            links,
+        )
+        await copy(connection, "phone", ["id", "organization_id", "phone_number"], phones)
+
+        next_link_id += len(links)
+        next_phone_id += len(phones)
+        loaded["organization"] += len(batch)
+        loaded["organization_activity"] += len(links)
+        loaded["phone"] += len(phones)
+        print(json.dumps({"organizations": loaded["organization"]}), flush=True)
+
+    # 4. Последовательности продолжают нумерацию после загруженных ID
+    for table_name in DIRECTORY_TABLES:
+        await connection.execute(
+            f"""
+            SELECT setval(
+                pg_get_serial_sequence('{table_name}', 'id'),
+                coalesce(max(id), 0) + 1,
+                false
+            )
+            FROM {table_name}
+            """
+        )
+
+    await connection.execute("ANALYZE")
+    return loaded
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """Подключиться к БД и сгенерировать справочник в одной транзакции."""
+
+    engine = create_async_engine(url, poolclass=NullPool)
+    started = time.perf_counter()
+
+    async with engine.connect() as connection:
+        raw_connection = await connection.get_raw_connection()
+        driver_connection: Connection = raw_connection.driver_connection
+
+        async with driver_connection.transaction():
+            loaded = await generate(
+                connection=driver_connection,
+                buildings=args.buildings,
+                organizations=args.organizations,
+                tree=tuple(args.activity_tree),
+                batch_size=args.batch_size,
+                seed=args.seed,
+                truncate=args.truncate,
+            )
+
+    await engine.dispose()
+
+    elapsed = time.perf_counter() - started
+    rows = sum(loaded.values())
+    return {
+        "rows": loaded,
+        "total_rows": rows,
+        "seconds": round(elapsed, 1),
+        "rows_per_second": round(rows / elapsed),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--buildings", type=int, default=100_000)
+    parser.add_argument("--organizations", type=int, default=300_000)
+    parser.add_argument(
+        "--activity-tree",
+        type=int,
+        nargs=3,
+        default=[20, 8, 6],
+        metavar=("ROOTS", "CHILDREN", "GRANDCHILDREN"),
+        help="Количество корней, детей у корня и детей у каждого ребенка",
+    )
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--truncate",
+        action="store_true",
+        help="Очистить таблицы справочника перед загрузкой",
+    )
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args))), flush=True)
+
+
+if __name__ == "__main__":
+    main()
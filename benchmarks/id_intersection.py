@@ -0,0 +1,138 @@
+"""Бенчмарк пересечения ID организаций: set против IdSet.
+
+Старый вариант (_intersection_organization_ids) собирал результат каждого
+фильтра в set и пересекал их по очереди в фиксированном порядке. Здесь он
+сравнивается с IdSet и планировщиком intersect_filters, который начинает
+с самого селективного фильтра. Для каждого способа считается время
+пересечения и память, которую занимают результаты фильтров.
+
+Запуск:
+    python -m benchmarks.id_intersection --sizes 100000 1000000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from app.cache.id_set import IdFilter, IdSet, intersect_filters
+
+# Доля организаций, попадающих в фильтр, в порядке старого кода
+SCENARIOS = {
+    "broad": {"activity": 0.3, "radius": 0.4},
+    "broad_with_search": {"activity": 0.3, "radius": 0.4, "search": 0.05},
+    "selective_last": {"activity": 0.5, "radius": 0.6, "building": 0.0005},
+    "empty": {"activity": 0.3, "radius": 0.4, "building": 0.0},
+}
+
+
+def generate(size: int, fractions: dict[str, float]) -> dict[str, list[int]]:
+    """Сгенерировать результаты фильтров (ID организаций) для сценария."""
+
+    organization_ids = range(1, size + 1)
+    return {
+        name: random.sample(organization_ids, int(size * fraction))
+        for name, fraction in fractions.items()
+    }
+
+
+def allocated(factory: Callable[[], object]) -> tuple[object, int]:
+    """Построить объект и вернуть занятую им память (байты)."""
+
+    tracemalloc.start()
+    result = factory()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def intersect_sets(filter_sets: list[set[int]]) -> set[int]:
+    """Пересечение как в старом коде: по очереди, в порядке фильтров."""
+
+    organization_ids = None
+    for filter_ids in filter_sets:
+        if organization_ids is None:
+            organization_ids = filter_ids
+        else:
+            organization_ids = organization_ids & filter_ids
+    return organization_ids
+
+
+def timed(function: Callable[[], object], repeat: int) -> tuple[list[float], object]:
+    """Выполнить функцию несколько раз и вернуть время (мс) и результат."""
+
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, result
+
+
+def run(sizes: list[int], repeat: int) -> list[dict]:
+    """Запустить бенчмарк для всех размеров и сценариев."""
+
+    random.seed(42)
+    report = []
+
+    for size in sizes:
+        for scenario, fractions in SCENARIOS.items():
+            filters = generate(size, fractions)
+
+            filter_sets, sets_bytes = allocated(
+                lambda: [set(ids) for ids in filters.values()]
+            )
+            id_sets, id_sets_bytes = allocated(
+                lambda: {name: IdSet.from_iterable(ids) for name, ids in filters.items()}
+            )
+            id_filters = [
+                IdFilter(name=name, estimate=len(id_set), load=lambda id_set=id_set: id_set)
+                for name, id_set in id_sets.items()
+            ]
+
+            sets_timings, sets_result = timed(lambda: intersect_sets(filter_sets), repeat)
+            id_set_timings, id_set_result = timed(
+                lambda: intersect_filters(id_filters), repeat
+            )
+
+            row = {
+                "organizations": size,
+                "scenario": scenario,
+                "set_median_ms": round(statistics.median(sets_timings), 3),
+                "id_set_median_ms": round(statistics.median(id_set_timings), 3),
+                "set_memory_kb": round(sets_bytes / 1024),
+                "id_set_memory_kb": round(id_sets_bytes / 1024),
+                "found": len(id_set_result),
+                "results_match": sorted(sets_result) == id_set_result.tolist(),
+            }
+            report.append(row)
+            print(json.dumps(row), flush=True)
+
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[100_000, 1_000_000],
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Файл для сохранения результатов (JSON)")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.repeat)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""Бенчмарк поиска организаций через API.
+
+Прогоняет набор сценариев (название, дерево деятельностей, радиус, здания,
+комбинации фильтров) против app.main:app в двух режимах: внутри процесса
+через ASGI-транспорт и через настоящий uvicorn. Для каждого сценария
+сохраняются пропускная способность, задержки p50/p95/p99, количество
+запросов к БД на один HTTP-запрос и пиковый RSS процесса.
+
+Значения фильтров берутся из текущей БД, поэтому бенчмарк работает и на
+исходных данных, и на синтетических (benchmarks.generate_dataset).
+По умолчанию кеш ответов выключен, чтобы измерять путь до БД.
+
+Запуск:
+    python -m benchmarks.organizations_api --output results.json
+    python -m benchmarks.organizations_api --mode uvicorn --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+import httpx
+import sqlalchemy as sa
+import uvicorn
+from sqlalchemy import event
+
+from app.cache.response import response_cache
+from app.config import get_settings
+from app.database import async_engine
+from app.main import app
+
+settings = get_settings()
+
+ORGANIZATIONS_URL = "/api/v1/organizations"
+
+# Интервал опроса RSS (секунды)
+RSS_SAMPLE_INTERVAL = 0.01
+
+
+async def resolve_samples() -> dict:
+    """Выбрать из БД значения фильтров для сценариев."""
+
+    async with async_engine.connect() as connection:
+        organization_id, organization_name, building_id, latitude, longitude = (
+            await connection.execute(
+                sa.text(
+                    """
+                    SELECT o.id, o.name, b.id, b.latitude, b.longitude
+                    FROM organization o
+                    JOIN building b ON b.id = o.building_id
+                    ORDER BY o.id
+                    OFFSET (SELECT count(*) / 2 FROM organization)
+                    LIMIT 1
+                    """
+                )
+            )
+        ).one()
+        building_ids = list(
+            (
+                await connection.execute(
+                    sa.text(
+                        "SELECT id FROM building WHERE id >= :id ORDER BY id LIMIT 3"
+                    ),
+                    {"id": building_id},
+                )
+            ).scalars()
+        )
+        activity_id, activity_name = (
+            await connection.execute(
+                sa.text(
+                    """
+                    SELECT a.id, a.name
+                    FROM activity a
+                    WHERE a.parent_id IS NULL
+                        AND EXISTS (SELECT 1 FROM activity c WHERE c.parent_id = a.id)
+                    ORDER BY a.id
+                    LIMIT 1
+                    """
+                )
+            )
+        ).one()
+
+    middle = len(organization_name) // 2
+    return {
+        "organization_id": organization_id,
+        "search_str": organization_name[max(middle - 3, 0) : middle + 3].strip(),
+        "building_ids": ",".join(map(str, building_ids)),
+        "latitude": latitude,
+        "longitude": longitude,
+        "activity_id": activity_id,
+        "activity_name": activity_name,
+    }
+
+
+def scenarios(samples: dict) -> dict[str, str]:
+    """Сценарии: имя -> путь запроса."""
+
+    point = {
+        "latitude": samples["latitude"],
+        "longitude": samples["longitude"],
+    }
+    activity_tree = {
+        "activity_ids": samples["activity_id"],
+        "include_activity_descendants": "true",
+    }
+
+    def organizations(**params) -> str:
+        return f"{ORGANIZATIONS_URL}?{urlencode(params)}" if params else ORGANIZATIONS_URL
+
+    return {
+        "first_page": organizations(),
+        "name": organizations(search_str=samples["search_str"]),
+        "activity_tree": organizations(**activity_tree),
+        "activity_search": organizations(activity_search_str=samples["activity_name"]),
+        "radius": organizations(**point, radius=2),
+        "nearest": organizations(**point, nearest=20),
+        "building_ids": organizations(building_ids=samples["building_ids"]),
+        "combined": organizations(
+            **activity_tree,
+            **point,
+            radius=5,
+            search_str=samples["search_str"][:2],
+        ),
+        "by_id": f"{ORGANIZATIONS_URL}/{samples['organization_id']}",
+    }
+
+
+class QueryCounter:
+    """Счетчик запросов приложения к БД."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(async_engine.sync_engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *args) -> None:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args) -> None:
+        self.count += 1
+
+
+def current_rss() -> int:
+    """Текущий RSS процесса (байты); без /proc - пиковый за все время."""
+
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def sample_rss(peak: list[int]) -> None:
+    """Обновлять пиковый RSS, пока задача не будет отменена."""
+
+    while True:
+        peak[0] = max(peak[0], current_rss())
+        await asyncio.sleep(RSS_SAMPLE_INTERVAL)
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    """Перцентиль по отсортированным значениям (ближайший ранг)."""
+
+    index = max(round(percent / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    path: str,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    counter: QueryCounter,
+) -> dict:
+    """Выполнить запросы сценария и собрать метрики."""
+
+    for _ in range(warmup):
+        (await client.get(path)).raise_for_status()
+
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    peak_rss = [current_rss()]
+    sampler = asyncio.create_task(sample_rss(peak_rss))
+    queries_before = counter.count
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "queries_per_request": round((counter.count - queries_before) / requests, 2),
+        "peak_rss_mb": round(peak_rss[0] / 2**20, 1),
+    }
+
+
+async def run_mode(
+    client: httpx.AsyncClient,
+    mode: str,
+    paths: dict[str, str],
+    args: argparse.Namespace,
+    counter: QueryCounter,
+) -> list[dict]:
+    """Прогнать все сценарии одним клиентом."""
+
+    report = []
+    for name, path in paths.items():
+        if args.scenarios and name not in args.scenarios:
+            continue
+        row = {
+            "mode": mode,
+            "scenario": name,
+            "path": path,
+            **await run_scenario(
+                client=client,
+                path=path,
+                requests=args.requests,
+                concurrency=args.concurrency,
+                warmup=args.warmup,
+                counter=counter,
+            ),
+        }
+        report.append(row)
+        print(json.dumps(row, ensure_ascii=False), flush=True)
+    return report
+
+
+def free_port() -> int:
+    """Свободный TCP-порт на localhost."""
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def with_uvicorn(run: Callable[[httpx.AsyncClient], object]) -> list[dict]:
+    """Запустить uvicorn в этом же процессе и выполнить run с HTTP-клиентом."""
+
+    port = free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(
+            app,
+            host="127.0.0.1",
+            port=port,
+            # Жизненный цикл приложения уже запущен бенчмарком
+            lifespan="off",
+            access_log=False,
+            log_level="warning",
+        )
+    )
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}",
+            headers=auth_headers(),
+            limits=httpx.Limits(max_connections=None),
+            timeout=None,
+        ) as client:
+            return await run(client)
+    finally:
+        server.should_exit = True
+        await task
+
+
+def auth_headers() -> dict[str, str]:
+    return {"Authorization": settings.api_key} if settings.api_key else {}
+
+
+def git_commit() -> str | None:
+    """Текущий коммит, чтобы сравнивать результаты между коммитами."""
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """Запустить бенчмарк в выбранных режимах."""
+
+    response_cache.enabled = args.cache
+    results = []
+
+    async with app.router.lifespan_context(app):
+        samples = await resolve_samples()
+        paths = scenarios(samples)
+
+        with QueryCounter() as counter:
+            if args.mode in ("asgi", "both"):
+                async with httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=app),
+                    base_url="http://benchmark",
+                    headers=auth_headers(),
+                    timeout=None,
+                ) as client:
+                    results += await run_mode(client, "asgi", paths, args, counter)
+
+            if args.mode in ("uvicorn", "both"):
+                results += await with_uvicorn(
+                    lambda client: run_mode(client, "uvicorn", paths, args, counter)
+                )
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pool_profile": settings.db_pool_profile,
+            "response_cache": args.cache,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "samples": samples,
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["asgi", "uvicorn", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        help="Запустить только указанные сценарии",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Не выключать кеш ответов",
+    )
+    parser.add_argument("--output", help="Файл для сохранения результатов (JSON)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+"""Проверка планов запросов: горячие запросы не должны читать таблицы целиком.
+
+В транзакции основная БД дополняется синтетическими данными, затем
+вызываются методы репозиториев. Каждый выполненный ими запрос повторяется
+через EXPLAIN, и в плане ищутся Seq Scan по крупным таблицам справочника.
+В конце транзакция откатывается, данные в БД не меняются.
+
+Поиск по названию организации дополнительно обязан использовать
+триграммный индекс (иначе он читает таблицу в порядке первичного ключа
+с фильтром). Без pg_trgm эти сценарии пропускаются.
+
+Завершается с кодом 1, если хотя бы один запрос использует Seq Scan
+или не использует обязательный индекс.
+
+Запуск:
+    python -m benchmarks.query_plans --organizations 100000
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+import sqlalchemy as sa
+from sqlalchemy import NullPool, event
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine
+
+from app.api.filters.facets import FACETS
+from app.api.filters.organization import OrganizationFilterSchema
+from app.database import url
+from app.repositories.activity import ActivityRepository
+from app.repositories.building import BuildingRepository
+from app.repositories.organization import OrganizationRepository
+from app.repositories.organization_activity import OrganizationActivityRepository
+from app.repositories.phone import PhoneRepository
+
+# Таблицы, которые растут вместе со справочником: Seq Scan по ним запрещен.
+# activity (сотни-тысячи строк) целиком хранится в памяти приложения.
+HOT_TABLES = {
+    "building",
+    "organization",
+    "organization_activity",
+    "organization_activity_closure",
+    "phone",
+}
+
+# Центр синтетических зданий и разброс в градусах
+CENTER = (55.7558, 37.6173, 0.5)
+
+# Сценарии поиска по названию (нужен pg_trgm) и индекс, который они используют
+TRIGRAM_SCENARIOS = {"organizations_by_search", "organizations_by_fuzzy_search"}
+TRIGRAM_INDEX = "ix_organization_name_trgm"
+
+
+@dataclass(frozen=True)
+class SyntheticData:
+    """ID синтетических записей, используемые в проверяемых запросах."""
+
+    organization_ids: list[int]
+    building_ids: list[int]
+    root_activity_id: int
+    leaf_activity_id: int
+    leaf_activity_name: str
+    # Уникальная часть названия одной из организаций
+    organization_name_suffix: str
+
+
+async def enlarge(connection: AsyncConnection, organizations: int) -> SyntheticData:
+    """Добавить синтетические здания, виды деятельности, организации и телефоны."""
+
+    buildings = max(organizations // 5, 1)
+    latitude, longitude, spread = CENTER
+
+    await connection.execute(sa.text("SELECT setseed(0.42)"))
+
+    # Здания вокруг центра
+    await connection.execute(
+        sa.text(
+            """
+            INSERT INTO building (id, address, latitude, longitude)
+            SELECT
+                m.max_id + s.n,
+                'synthetic building ' || s.n,
+                :latitude + (random() + random() - 1) * :spread,
+                :longitude + (random() + random() - 1) * :spread
+            FROM generate_series(1, :buildings) AS s(n),
+                (SELECT coalesce(max(id), 0) AS max_id FROM building) AS m
+            """
+        ),
+        {
+            "latitude": latitude,
+            "longitude": longitude,
+            "spread": spread,
+            "buildings": buildings,
+        },
+    )
+
+    # Дерево деятельностей в три уровня: 20 корней, по 5 детей и по 5 внуков
+    parents = "SELECT NULL::integer AS id"
+    for level, per_parent in enumerate((20, 5, 5), start=1):
+        await connection.execute(
+            sa.text(
+                f"""
+                INSERT INTO activity (id, name, parent_id)
+                SELECT
+                    m.max_id + row_number() OVER (),
+                    'synthetic activity {level}.' || row_number() OVER (),
+                    parents.id
+                FROM ({parents}) AS parents,
+                    generate_series(1, {per_parent}) AS s(n),
+                    (SELECT coalesce(max(id), 0) AS max_id FROM activity) AS m
+                """
+            )
+        )
+        parents = f"SELECT id FROM activity WHERE name LIKE 'synthetic activity {level}.%'"
+
+    # Организации, по два вида деятельности и по два телефона на каждую.
+    # Хеш в названии делает поиск по его части селективным
+    await connection.execute(
+        sa.text(
+            """
+            INSERT INTO organization (id, name, building_id)
+            SELECT
+                m.max_id + s.n,
+                'synthetic organization ' || s.n || ' ' || md5(s.n::text),
+                b.min_id + floor(random() * :buildings)::integer
+            FROM generate_series(1, :organizations) AS s(n),
+                (SELECT coalesce(max(id), 0) AS max_id FROM organization) AS m,
+                (SELECT min(id) AS min_id FROM building
+                 WHERE address LIKE 'synthetic building %') AS b
+            """
+        ),
+        {"organizations": organizations, "buildings": buildings},
+    )
+    await connection.execute(
+        sa.text(
+            """
+            INSERT INTO organization_activity (id, organization_id, activity_id)
+            SELECT
+                m.max_id + row_number() OVER (),
+                o.id,
+                a.ids[1 + floor(random() * cardinality(a.ids))::integer]
+            FROM organization o,
+                generate_series(1, 2) AS s(n),
+                (SELECT coalesce(max(id), 0) AS max_id FROM organization_activity) AS m,
+                (SELECT array_agg(id) AS ids FROM activity
+                 WHERE name LIKE 'synthetic activity 3.%') AS a
+            WHERE o.name LIKE 'synthetic organization %'
+            """
+        )
+    )
+    await connection.execute(
+        sa.text(
+            """
+            INSERT INTO phone (id, organization_id, phone_number)
+            SELECT
+                m.max_id + row_number() OVER (),
+                o.id,
+                '8-900-' || lpad((o.id * 2 + s.n)::text, 7, '0')
+            FROM organization o,
+                generate_series(1, 2) AS s(n),
+                (SELECT coalesce(max(id), 0) AS max_id FROM phone) AS m
+            WHERE o.name LIKE 'synthetic organization %'
+            """
+        )
+    )
+    await connection.execute(sa.text("ANALYZE"))
+
+    organization_ids = list(
+        (
+            await connection.execute(
+                sa.text(
+                    "SELECT id FROM organization "
+                    "WHERE name LIKE 'synthetic organization %' "
+                    "ORDER BY id DESC LIMIT 20"
+                )
+            )
+        ).scalars()
+    )
+    building_ids = list(
+        (
+            await connection.execute(
+                sa.text(
+                    "SELECT building_id FROM organization WHERE id = ANY(:ids) LIMIT 3"
+                ),
+                {"ids": organization_ids},
+            )
+        ).scalars()
+    )
+    root_activity_id = (
+        await connection.execute(
+            sa.text(
+                "SELECT id FROM activity WHERE name = 'synthetic activity 1.1'"
+            )
+        )
+    ).scalar_one()
+    leaf_activity_id, leaf_activity_name = (
+        await connection.execute(
+            sa.text(
+                "SELECT id, name FROM activity "
+                "WHERE name LIKE 'synthetic activity 3.%' ORDER BY id DESC LIMIT 1"
+            )
+        )
+    ).one()
+
+    organization_name = (
+        await connection.execute(
+            sa.text("SELECT name FROM organization WHERE id = :id"),
+            {"id": organization_ids[0]},
+        )
+    ).scalar_one()
+
+    return SyntheticData(
+        organization_ids=organization_ids,
+        building_ids=building_ids,
+        root_activity_id=root_activity_id,
+        leaf_activity_id=leaf_activity_id,
+        leaf_activity_name=leaf_activity_name,
+        organization_name_suffix=organization_name.rsplit(" ", 1)[-1],
+    )
+
+
+def scenarios(
+    data: SyntheticData,
+) -> dict[str, Callable[[AsyncSession], Awaitable[object]]]:
+    """Проверяемые вызовы репозиториев."""
+
+    latitude, longitude, _ = CENTER
+    organization_ids = ",".join(map(str, data.organization_ids))
+
+    def organizations(**filters) -> Callable[[AsyncSession], Awaitable[object]]:
+        return lambda session: OrganizationRepository(session).get_organizations(
+            filters=OrganizationFilterSchema(**filters),
+            limit=100,
+        )
+
+    return {
+        "organizations_first_page": organizations(),
+        "organizations_by_ids": organizations(organization_ids=organization_ids),
+        "organizations_by_buildings": organizations(
+            building_ids=",".join(map(str, data.building_ids)),
+        ),
+        "organizations_by_search": organizations(
+            search_str=data.organization_name_suffix[:12].upper(),
+        ),
+        "organizations_by_fuzzy_search": organizations(
+            search_str=data.organization_name_suffix,
+            search_mode="fuzzy",
+        ),
+        "organizations_by_activity": organizations(
+            activity_ids=str(data.leaf_activity_id),
+        ),
+        "organizations_by_activity_tree": organizations(
+            activity_ids=str(data.root_activity_id),
+            include_activity_descendants=True,
+        ),
+        "organizations_by_activity_search": organizations(
+            activity_search_str=data.leaf_activity_name,
+        ),
+        "organizations_in_radius": organizations(
+            latitude=latitude,
+            longitude=longitude,
+            radius=0.5,
+        ),
+        "organizations_in_bbox": organizations(
+            bbox=f"{longitude - 0.01},{latitude - 0.01},{longitude + 0.01},{latitude + 0.01}",
+        ),
+        "organization_clusters_in_bbox": lambda session: OrganizationRepository(
+            session
+        ).get_organization_clusters(
+            filters=OrganizationFilterSchema(
+                bbox=f"{longitude - 0.1},{latitude - 0.1},{longitude + 0.1},{latitude + 0.1}",
+                activity_ids=str(data.root_activity_id),
+                include_activity_descendants=True,
+            ),
+            zoom=12,
+        ),
+        "organization_facets_in_bbox": lambda session: OrganizationRepository(
+            session
+        ).get_organization_facets(
+            filters=OrganizationFilterSchema(
+                bbox=f"{longitude - 0.1},{latitude - 0.1},{longitude + 0.1},{latitude + 0.1}",
+                activity_ids=str(data.root_activity_id),
+                include_activity_descendants=True,
+            ),
+            facets=list(FACETS),
+            limit=100,
+        ),
+        "organizations_nearest": lambda session: OrganizationRepository(
+            session
+        ).get_nearest_organizations(
+            filters=OrganizationFilterSchema(
+                latitude=latitude,
+                longitude=longitude,
+                nearest=10,
+            ),
+        ),
+        "organizations_by_building_ids": lambda session: OrganizationRepository(
+            session
+        ).get_organization_by_building_ids(building_ids=data.building_ids),
+        "organization_ids_by_activity": lambda session: OrganizationActivityRepository(
+            session
+        ).get_organization_ids_by_activity(activity_ids=[data.leaf_activity_id]),
+        "organization_ids_by_activity_search": lambda session: OrganizationActivityRepository(
+            session
+        ).get_organization_ids_by_activity_search(
+            activity_search_str=data.leaf_activity_name,
+        ),
+        "organizations_activities_map": lambda session: ActivityRepository(
+            session
+        ).get_organizations_activities_map(organization_ids=data.organization_ids),
+        "organizations_phones_map": lambda session: PhoneRepository(
+            session
+        ).get_organizations_phones_map(organization_ids=data.organization_ids),
+        "buildings_in_radius": lambda session: BuildingRepository(
+            session
+        ).get_buildings_in_radius(latitude=latitude, longitude=longitude, radius=0.5),
+    }
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Таблицы из HOT_TABLES, которые план читает через Seq Scan."""
+
+    tables = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in HOT_TABLES:
+        tables.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        tables.extend(seq_scans(child))
+    return tables
+
+
+def index_names(plan: dict) -> set[str]:
+    """Индексы, которые использует план."""
+
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= index_names(child)
+    return names
+
+
+async def explain_scenario(
+    connection: AsyncConnection,
+    call: Callable[[AsyncSession], Awaitable[object]],
+) -> list[dict]:
+    """Вызвать метод репозитория и получить планы всех его запросов."""
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    sync_engine = connection.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        session = AsyncSession(bind=connection)
+        await call(session)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+
+    plans = []
+    for statement, parameters in statements:
+        result = await connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {statement}",
+            parameters,
+        )
+        plan = result.scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        plans.append(plan[0]["Plan"])
+    return plans
+
+
+async def run(organizations: int) -> list[dict]:
+    """Заполнить БД синтетическими данными и проверить планы всех сценариев."""
+
+    engine = create_async_engine(url, poolclass=NullPool)
+    report = []
+
+    async with engine.connect() as connection:
+        await connection.begin()
+        data = await enlarge(connection, organizations)
+        trigram = bool(
+            (
+                await connection.execute(
+                    sa.text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                )
+            ).scalar()
+        )
+
+        for name, call in scenarios(data).items():
+            if name in TRIGRAM_SCENARIOS and not trigram:
+                row = {"scenario": name, "skipped": "pg_trgm не установлен", "ok": True}
+                report.append(row)
+                print(json.dumps(row, ensure_ascii=False), flush=True)
+                continue
+
+            plans = await explain_scenario(connection, call)
+            tables = sorted({table for plan in plans for table in seq_scans(plan)})
+            indexes = sorted(set().union(*map(index_names, plans)))
+            missing = (
+                [TRIGRAM_INDEX]
+                if name in TRIGRAM_SCENARIOS and TRIGRAM_INDEX not in indexes
+                else []
+            )
+            row = {
+                "scenario": name,
+                "statements": len(plans),
+                "seq_scans": tables,
+                "indexes": indexes,
+                "missing_indexes": missing,
+                "ok": not tables and not missing,
+            }
+            report.append(row)
+            print(json.dumps(row), flush=True)
+
+        await connection.rollback()
+
+    await engine.dispose()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--organizations", type=int, default=100_000)
+    parser.add_argument("--output", help="Файл для сохранения результатов (JSON)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.organizations))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if not all(row["ok"] for row in report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Бенчмарк поиска зданий в радиусе: полный перебор против индекса.
+
+Для каждого размера создается временная таблица building (она перекрывает
+основную в рамках соединения), заполняется синтетическими зданиями вокруг
+нескольких городов, индексируется и упорядочивается по ячейкам сетки
+так же, как в миграциях. Сравниваются полный перебор, GiST-индекс по
+прямоугольнику и B-tree индекс по ключам ячеек. Те же здания
+загружаются в индекс реплики справочника (app.cache.directory): замеряются
+поиск по сетке на чистом Python и векторный поиск numpy (если установлен).
+
+Запуск:
+    python -m benchmarks.radius_search --sizes 10000 100000 1000000
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from dataclasses import replace
+
+import sqlalchemy as sa
+from sqlalchemy import NullPool
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from app.cache.directory import BuildingIndex
+from app.database import url
+from app.queries.building import buildings_in_radius_query
+
+# (широта, долгота, разброс в градусах)
+CITIES = [
+    (55.7558, 37.6173, 0.5),
+    (59.9343, 30.3351, 0.4),
+    (56.8389, 60.6057, 0.3),
+    (55.7961, 49.1064, 0.3),
+    (43.1155, 131.8855, 0.2),
+]
+
+SCENARIOS = [
+    {"latitude": 55.7600, "longitude": 37.6175, "radius": 1},
+    {"latitude": 55.7600, "longitude": 37.6175, "radius": 5},
+    {"latitude": 59.9358, "longitude": 30.3259, "radius": 50},
+]
+
+
+async def create_buildings(connection: AsyncConnection, size: int) -> None:
+    """Создать временную таблицу building с синтетическими зданиями."""
+
+    await connection.execute(
+        sa.text(
+            """
+            CREATE TEMP TABLE building (
+                id integer PRIMARY KEY,
+                address varchar NOT NULL,
+                latitude float NOT NULL,
+                longitude float NOT NULL,
+                cell bigint NOT NULL
+                    GENERATED ALWAYS AS (building_cell(latitude, longitude)) STORED
+            )
+            """
+        )
+    )
+    await connection.execute(sa.text("SELECT setseed(0.42)"))
+    cities = ", ".join(
+        f"({index}, {latitude}, {longitude}, {spread})"
+        for index, (latitude, longitude, spread) in enumerate(CITIES)
+    )
+    await connection.execute(
+        sa.text(
+            f"""
+            INSERT INTO building (id, address, latitude, longitude)
+            SELECT
+                s.id,
+                'building ' || s.id,
+                c.latitude + (random() + random() + random() - 1.5) * c.spread,
+                c.longitude + (random() + random() + random() - 1.5) * c.spread
+            FROM generate_series(1, :size) AS s(id)
+            JOIN (VALUES {cities}) AS c(idx, latitude, longitude, spread)
+                ON c.idx = s.id % {len(CITIES)}
+            """
+        ),
+        {"size": size},
+    )
+    await connection.execute(
+        sa.text(
+            "CREATE INDEX ON building USING gist (point(longitude, latitude))"
+        )
+    )
+    await connection.execute(sa.text("CREATE INDEX ix_temp_building_cell ON building (cell)"))
+    await connection.execute(sa.text("CLUSTER building USING ix_temp_building_cell"))
+    await connection.execute(sa.text("ANALYZE building"))
+
+
+async def measure(
+    connection: AsyncConnection,
+    query: sa.Select,
+    repeat: int,
+) -> tuple[list[float], set[int]]:
+    """Выполнить запрос несколько раз и вернуть время (мс) и найденные ID."""
+
+    timings = []
+    building_ids = set()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await connection.execute(query)
+        building_ids = {row.id for row in result}
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, building_ids
+
+
+def measure_replica(
+    index: BuildingIndex,
+    scenario: dict,
+    repeat: int,
+) -> tuple[list[float], set[int]]:
+    """Поиск по индексу реплики: время (мс) и найденные ID."""
+
+    timings = []
+    building_ids = set()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        if index.vectors is not None:
+            building_ids = set(index.vectors.ids[index.positions_in_radius(**scenario)].tolist())
+        else:
+            building_ids = set(index.in_radius(**scenario))
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, building_ids
+
+
+async def run(sizes: list[int], repeat: int) -> list[dict]:
+    """Запустить бенчмарк для всех размеров и сценариев."""
+
+    engine = create_async_engine(url, poolclass=NullPool)
+    report = []
+
+    for size in sizes:
+        async with engine.connect() as connection:
+            await create_buildings(connection, size)
+            rows = await connection.execute(
+                sa.text("SELECT id, address, latitude, longitude, cell FROM building ORDER BY id")
+            )
+            vectorized = BuildingIndex.build(rows, version=0)
+            replicas = {"grid": replace(vectorized, vectors=None)}
+            if vectorized.vectors is not None:
+                replicas["vectorized"] = vectorized
+
+            for scenario in SCENARIOS:
+                row = {"buildings": size, **scenario}
+                found = {}
+                for name, prefilter in (("scan", None), ("indexed", "box"), ("cells", "cell")):
+                    timings, building_ids = await measure(
+                        connection,
+                        buildings_in_radius_query(**scenario, prefilter=prefilter),
+                        repeat,
+                    )
+                    found[name] = building_ids
+                    row[f"{name}_median_ms"] = round(statistics.median(timings), 3)
+                    row[f"{name}_min_ms"] = round(min(timings), 3)
+
+                for name, index in replicas.items():
+                    timings, building_ids = measure_replica(index, scenario, repeat)
+                    found[name] = building_ids
+                    row[f"{name}_median_ms"] = round(statistics.median(timings), 3)
+                    row[f"{name}_min_ms"] = round(min(timings), 3)
+
+                row["found"] = len(found["indexed"])
+                row["results_match"] = all(
+                    building_ids == found["indexed"] for building_ids in found.values()
+                )
+                report.append(row)
+                print(json.dumps(row), flush=True)
+
+            await connection.rollback()
+
+    await engine.dispose()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10_000, 100_000, 1_000_000],
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Файл для сохранения результатов (JSON)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.sizes, args.repeat))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""Дифференциальная проверка реплики справочника против SQL.
+
+Загружает реплику (app.cache.directory) из текущей БД, генерирует
+случайные комбинации фильтров по данным БД и сравнивает ответы
+OrganizationReplicaRepository и OrganizationRepository побайтно:
+страницы с курсорами, ближайшие организации, потоковую выдачу, выборку
+по ID, фасеты и кластеры по ячейкам сетки (средние координаты - с точностью
+CLUSTER_TOLERANCE). Нечеткий поиск проверяется, только если установлен pg_trgm.
+
+Завершается с кодом 1, если хотя бы один ответ отличается.
+
+Запуск:
+    python -m benchmarks.replica_diff --cases 500 --seed 1
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+
+import sqlalchemy as sa
+
+from app.api.filters.facets import FACETS
+from app.api.filters.organization import OrganizationFilterSchema
+from app.api.serializers.organization import (
+    dump_organization_clusters,
+    dump_organizations_list,
+    dump_organizations_ndjson,
+)
+from app.cache.activity_tree import activity_tree_cache
+from app.cache.directory import DirectoryReplica
+from app.cache.response import canonical_filters
+from app.database import async_engine, async_session
+from app.queries.cell import CELL_LEVELS
+from app.repositories.organization import OrganizationRepository
+from app.repositories.organization_replica import OrganizationReplicaRepository
+
+# Сколько страниц проходить по курсорам в одном случае
+MAX_PAGES = 3
+
+# Допустимое расхождение средних координат кластера (градусы): в БД сумма
+# накапливается в порядке агрегации, в реплике - в порядке ID
+CLUSTER_TOLERANCE = 2e-6
+
+
+async def load_samples() -> dict:
+    """Значения из БД, из которых собираются фильтры."""
+
+    async with async_engine.connect() as connection:
+
+        async def column(statement: str) -> list:
+            return list((await connection.execute(sa.text(statement))).scalars())
+
+        buildings = (
+            await connection.execute(
+                sa.text("SELECT latitude, longitude FROM building ORDER BY random() LIMIT 200")
+            )
+        ).all()
+        return {
+            "organization_ids": await column(
+                "SELECT id FROM organization ORDER BY random() LIMIT 1000"
+            ),
+            "organization_names": await column(
+                "SELECT name FROM organization ORDER BY random() LIMIT 200"
+            ),
+            "building_ids": await column("SELECT id FROM building ORDER BY random() LIMIT 1000"),
+            "points": [(row.latitude, row.longitude) for row in buildings],
+            "activity_ids": await column("SELECT id FROM activity"),
+            "activity_names": await column("SELECT name FROM activity"),
+            "fuzzy": bool(
+                await column("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ),
+        }
+
+
+def fragment(rng: random.Random, text: str) -> str:
+    """Случайная подстрока в случайном регистре, иногда с символами шаблона."""
+
+    start = rng.randrange(len(text))
+    value = text[start : start + rng.randint(1, 8)]
+    value = rng.choice([value, value.lower(), value.upper()])
+    if len(value) > 2 and rng.random() < 0.2:
+        position = rng.randrange(1, len(value) - 1)
+        value = value[:position] + rng.choice("%_") + value[position + 1 :]
+    return value
+
+
+def random_filters(rng: random.Random, samples: dict) -> dict:
+    """Случайная комбинация из одного-трех фильтров."""
+
+    def ids(values: list[int], missing: int) -> str:
+        chosen = rng.sample(values, min(len(values), rng.randint(1, 5)))
+        # Иногда добавляется несуществующий ID
+        if rng.random() < 0.2:
+            chosen.append(missing)
+        return ",".join(map(str, chosen))
+
+    def point() -> dict:
+        latitude, longitude = rng.choice(samples["points"])
+        return {
+            "latitude": latitude + rng.uniform(-0.05, 0.05),
+            "longitude": longitude + rng.uniform(-0.05, 0.05),
+        }
+
+    def bbox() -> str:
+        latitude, longitude = rng.choice(samples["points"])
+        width = rng.choice([0.01, 0.1, 1, 10])
+        height = rng.choice([0.01, 0.1, 1, 10])
+        return ",".join(
+            str(value)
+            for value in (
+                max(longitude - rng.uniform(0, width), -180),
+                max(latitude - rng.uniform(0, height), -90),
+                min(longitude + rng.uniform(0, width), 180),
+                min(latitude + rng.uniform(0, height), 90),
+            )
+        )
+
+    kinds = {
+        "organization_ids": lambda: {
+            "organization_ids": ids(samples["organization_ids"], 10**9),
+        },
+        "building_ids": lambda: {
+            "building_ids": ids(samples["building_ids"], 10**9),
+        },
+        "activity_ids": lambda: {
+            "activity_ids": ids(samples["activity_ids"], 10**9),
+            "include_activity_descendants": rng.random() < 0.5,
+        },
+        "search_str": lambda: {
+            "search_str": fragment(rng, rng.choice(samples["organization_names"])),
+        },
+        "activity_search_str": lambda: {
+            "activity_search_str": fragment(rng, rng.choice(samples["activity_names"])),
+        },
+        "radius": lambda: {**point(), "radius": rng.choice([0.5, 2, 10, 50, 500])},
+        "bbox": lambda: {"bbox": bbox()},
+        "nearest": lambda: {
+            **point(),
+            "nearest": rng.randint(1, 50),
+            **({"radius": rng.choice([1, 10, 100])} if rng.random() < 0.3 else {}),
+        },
+    }
+    if samples["fuzzy"]:
+        kinds["fuzzy"] = lambda: {
+            "search_str": fragment(rng, rng.choice(samples["organization_names"])),
+            "search_mode": "fuzzy",
+        }
+
+    filters = {}
+    for kind in rng.sample(sorted(kinds), rng.randint(1, 3)):
+        if kind == "radius" and "nearest" in filters:
+            continue
+        if kind == "nearest":
+            filters.pop("radius", None)
+        filters.update(kinds[kind]())
+    return filters
+
+
+async def compare_case(
+    sql: OrganizationRepository,
+    replica: OrganizationReplicaRepository,
+    filters: OrganizationFilterSchema,
+    limit: int,
+) -> str | None:
+    """Сравнить ответы; вернуть описание первого расхождения."""
+
+    tree = activity_tree_cache.snapshot
+
+    if filters.nearest:
+        expected = await sql.get_nearest_organizations(filters=filters, activity_tree=tree)
+        actual = await replica.get_nearest_organizations(filters=filters)
+        if dump_organizations_list(expected, None) != dump_organizations_list(actual, None):
+            return "nearest"
+        return None
+
+    cursor = None
+    for page in range(MAX_PAGES):
+        expected, expected_cursor = await sql.get_organizations(
+            filters=filters, activity_tree=tree, limit=limit, cursor=cursor
+        )
+        actual, actual_cursor = await replica.get_organizations(
+            filters=filters, limit=limit, cursor=cursor
+        )
+        if dump_organizations_list(expected, expected_cursor) != dump_organizations_list(
+            actual, actual_cursor
+        ):
+            return f"page {page + 1}"
+        if expected_cursor is None:
+            break
+        cursor = expected_cursor
+
+    expected_stream = b"".join(
+        [
+            dump_organizations_ndjson(rows)
+            async for rows in sql.stream_organizations(
+                filters=filters, batch_size=100, activity_tree=tree
+            )
+        ]
+    )
+    actual_stream = b"".join(
+        [
+            dump_organizations_ndjson(rows)
+            async for rows in replica.stream_organizations(filters=filters, batch_size=100)
+        ]
+    )
+    if expected_stream != actual_stream:
+        return "stream"
+
+    # Маленький лимит проверяет порядок значений с равным количеством
+    expected_facets = await sql.get_organization_facets(
+        filters=filters, facets=list(FACETS), limit=limit, activity_tree=tree
+    )
+    actual_facets = await replica.get_organization_facets(
+        filters=filters, facets=list(FACETS), limit=limit
+    )
+    if dump_organizations_list([], None, facets=expected_facets) != dump_organizations_list(
+        [], None, facets=actual_facets
+    ):
+        return "facets"
+
+    zoom = cluster_zoom(filters)
+    expected_clusters = json.loads(
+        dump_organization_clusters(
+            zoom,
+            await sql.get_organization_clusters(filters=filters, zoom=zoom, activity_tree=tree),
+        )
+    )
+    actual_clusters = json.loads(
+        dump_organization_clusters(
+            zoom,
+            await replica.get_organization_clusters(filters=filters, zoom=zoom),
+        )
+    )
+    if not clusters_match(expected_clusters, actual_clusters):
+        return f"clusters zoom {zoom}"
+    return None
+
+
+def cluster_zoom(filters: OrganizationFilterSchema) -> int:
+    """Уровень сетки, зависящий только от фильтров (случай воспроизводим)."""
+
+    return sum(map(ord, filters.model_dump_json())) % (CELL_LEVELS + 1)
+
+
+def clusters_match(expected: dict, actual: dict) -> bool:
+    """Кластеры совпадают, средние координаты - с точностью CLUSTER_TOLERANCE."""
+
+    if expected["total"] != actual["total"] or len(expected["clusters"]) != len(
+        actual["clusters"]
+    ):
+        return False
+    return all(
+        first["cell"] == second["cell"]
+        and first["count"] == second["count"]
+        and first["bbox"] == second["bbox"]
+        and abs(first["latitude"] - second["latitude"]) <= CLUSTER_TOLERANCE
+        and abs(first["longitude"] - second["longitude"]) <= CLUSTER_TOLERANCE
+        for first, second in zip(expected["clusters"], actual["clusters"])
+    )
+
+
+async def run(cases: int, seed: int) -> list[dict]:
+    """Загрузить реплику и сравнить ответы на cases случайных наборов фильтров."""
+
+    rng = random.Random(seed)
+    replica = DirectoryReplica()
+    await replica.load()
+    await activity_tree_cache.load()
+    samples = await load_samples()
+    replica_repository = OrganizationReplicaRepository(replica.snapshot)
+    mismatches = []
+
+    async with async_session() as session:
+        sql_repository = OrganizationRepository(session)
+
+        for case in range(cases):
+            filters = canonical_filters(
+                OrganizationFilterSchema(**random_filters(rng, samples))
+            )
+            limit = rng.choice([1, 5, 20, 100])
+            difference = await compare_case(sql_repository, replica_repository, filters, limit)
+            if difference is not None:
+                mismatch = {
+                    "case": case,
+                    "filters": filters.model_dump(exclude_defaults=True),
+                    "limit": limit,
+                    "difference": difference,
+                }
+                mismatches.append(mismatch)
+                print(json.dumps(mismatch, ensure_ascii=False), flush=True)
+
+        # Выборка по ID, как в batchGet и GET /organizations/{id}
+        organization_ids = rng.sample(
+            samples["organization_ids"], min(len(samples["organization_ids"]), 50)
+        ) + [10**9]
+        expected, _ = await sql_repository.get_organizations(
+            filters=OrganizationFilterSchema(),
+            organization_ids=sorted(organization_ids),
+        )
+        actual, _ = await replica_repository.get_organizations(
+            filters=OrganizationFilterSchema(),
+            organization_ids=sorted(organization_ids),
+        )
+        if dump_organizations_list(expected, None) != dump_organizations_list(actual, None):
+            mismatches.append({"case": "organization_ids", "difference": "batch"})
+
+    await async_engine.dispose()
+    print(
+        json.dumps(
+            {
+                "cases": cases,
+                "fuzzy_checked": samples["fuzzy"],
+                "mismatches": len(mismatches),
+            }
+        ),
+        flush=True,
+    )
+    return mismatches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if asyncio.run(run(args.cases, args.seed)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
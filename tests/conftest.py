@@ -0,0 +1,5 @@
+import os
+
+# Настройки читаются при импорте модулей приложения; тестам БД не нужна,
+# но обязательные параметры подключения должны быть заданы
+os.environ.setdefault("db_port", "5432")
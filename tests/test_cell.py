@@ -0,0 +1,141 @@
+import random
+import re
+from pathlib import Path
+
+import pytest
+
+from app.queries.cell import (
+    CELL_LEVELS,
+    CELL_SCALE,
+    SPREAD_STEPS,
+    cell_at_level,
+    cell_bounds,
+    cell_key,
+    covering_cell_ranges,
+)
+
+MIGRATION = (
+    Path(__file__).resolve().parent.parent
+    / "alembic"
+    / "versions"
+    / "a3c7e19f4d62_add_building_cell.py"
+)
+
+
+def reference_key(latitude: float, longitude: float) -> int:
+    """Ключ ячейки по определению: биты x и y по одному, начиная со старшего."""
+
+    x = min(int((longitude + 180.0) / 360.0 * CELL_SCALE), CELL_SCALE - 1)
+    y = min(int((latitude + 90.0) / 180.0 * CELL_SCALE), CELL_SCALE - 1)
+    key = 0
+    for bit in reversed(range(CELL_LEVELS)):
+        key = (key << 2) | ((x >> bit) & 1) << 1 | ((y >> bit) & 1)
+    return key
+
+
+def random_points(seed: int, count: int = 500) -> list[tuple[float, float]]:
+    rng = random.Random(seed)
+    return [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(count)]
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_cell_key_interleaves_bits(seed):
+    for latitude, longitude in random_points(seed):
+        assert cell_key(latitude, longitude) == reference_key(latitude, longitude)
+
+
+def test_cell_key_edges():
+    assert cell_key(-90, -180) == 0
+    assert cell_key(90, 180) == CELL_SCALE * CELL_SCALE - 1
+    # Значения за пределами диапазона прижимаются к краю сетки
+    assert cell_key(-91, -181) == 0
+    assert cell_key(91, 181) == CELL_SCALE * CELL_SCALE - 1
+
+
+@pytest.mark.parametrize("level", [0, 1, 5, 12, CELL_LEVELS])
+def test_cell_bounds_contain_point(level):
+    for latitude, longitude in random_points(level):
+        cell = cell_at_level(cell_key(latitude, longitude), level)
+        min_longitude, min_latitude, max_longitude, max_latitude = cell_bounds(cell, level)
+
+        assert min_longitude <= longitude <= max_longitude
+        assert min_latitude <= latitude <= max_latitude
+        assert max_longitude - min_longitude == pytest.approx(360.0 / (1 << level))
+        assert max_latitude - min_latitude == pytest.approx(180.0 / (1 << level))
+
+
+@pytest.mark.parametrize("level", [1, 7, 15])
+def test_cell_bounds_round_trip(level):
+    """Центр ячейки снова попадает в ту же ячейку."""
+
+    rng = random.Random(level)
+    for _ in range(200):
+        cell = rng.randrange(1 << (2 * level))
+        min_longitude, min_latitude, max_longitude, max_latitude = cell_bounds(cell, level)
+        center = (
+            (min_latitude + max_latitude) / 2,
+            (min_longitude + max_longitude) / 2,
+        )
+
+        assert cell_at_level(cell_key(*center), level) == cell
+
+
+def test_cell_at_level_is_prefix():
+    key = cell_key(55.7558, 37.6173)
+
+    assert cell_at_level(key, CELL_LEVELS) == key
+    assert cell_at_level(key, 0) == 0
+    for level in range(1, CELL_LEVELS):
+        assert cell_at_level(key, level) >> 2 == cell_at_level(key, level - 1)
+
+
+@pytest.mark.parametrize(
+    "box",
+    [
+        (37.5, 55.7, 37.7, 55.8),
+        (-0.01, -0.01, 0.01, 0.01),
+        (179.0, 89.0, 180.0, 90.0),
+        (-180.0, -90.0, 180.0, 90.0),
+    ],
+)
+def test_covering_cell_ranges_cover_box(box):
+    ranges = covering_cell_ranges([box])
+    min_longitude, min_latitude, max_longitude, max_latitude = box
+    rng = random.Random(0)
+
+    assert len(ranges) <= 16
+    assert ranges == sorted(ranges)
+    for _ in range(500):
+        key = cell_key(
+            rng.uniform(min_latitude, max_latitude),
+            rng.uniform(min_longitude, max_longitude),
+        )
+        assert any(first <= key <= last for first, last in ranges)
+
+
+def test_covering_cell_ranges_merge_adjacent():
+    ranges = covering_cell_ranges([(0.0, 0.0, 1.0, 1.0), (0.0, 0.0, 1.0, 1.0)])
+
+    assert all(
+        previous[1] + 1 < current[0] for previous, current in zip(ranges, ranges[1:])
+    )
+
+
+def test_sql_function_matches_python():
+    """SQL-функция building_cell в миграции использует те же шаги, что cell_key."""
+
+    source = MIGRATION.read_text(encoding="utf-8")
+    scale = float(2**CELL_LEVELS)
+
+    assert source.count(f"* {scale}") == 2
+    assert f"), {CELL_SCALE - 1})" in source
+    for axis in ("x", "y"):
+        steps = [
+            (int(shift), int(mask, 16))
+            for shift, mask in re.findall(
+                rf"{axis} := \({axis} \| \({axis} << (\d+)\)\) & x'([0-9A-F]+)'::BIGINT",
+                source,
+            )
+        ]
+        assert steps == list(SPREAD_STEPS)
+    assert "RETURN (x << 1) | y;" in source
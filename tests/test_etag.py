@@ -0,0 +1,86 @@
+import pytest
+
+from app.cache import etag
+from app.cache.etag import etag_matches, make_etag
+from app.cache.table_versions import TableVersions
+
+ETAG = '"0123456789abcdef"'
+
+
+@pytest.mark.parametrize(
+    "if_none_match",
+    [
+        ETAG,
+        f"W/{ETAG}",
+        f'"other", {ETAG}',
+        f'"other",W/{ETAG}',
+        f"  {ETAG}  ",
+        "*",
+        '"other", *',
+    ],
+)
+def test_matches(if_none_match):
+    assert etag_matches(if_none_match, ETAG)
+
+
+@pytest.mark.parametrize(
+    "if_none_match",
+    [
+        None,
+        "",
+        '"other"',
+        '"other", W/"another"',
+        ETAG.strip('"'),
+        f"w/{ETAG}",
+        f"{ETAG}x",
+    ],
+)
+def test_does_not_match(if_none_match):
+    assert not etag_matches(if_none_match, ETAG)
+
+
+def test_star_without_match_any():
+    assert not etag_matches("*", ETAG, match_any=False)
+    assert not etag_matches('"other", *', ETAG, match_any=False)
+    assert etag_matches(f"*, {ETAG}", ETAG, match_any=False)
+
+
+@pytest.fixture
+def versions():
+    table_versions = TableVersions(tables=("activity", "organization"))
+    table_versions.versions = {"activity": 1, "organization": 5}
+    return table_versions
+
+
+@pytest.fixture
+def etag_enabled(monkeypatch):
+    monkeypatch.setattr(etag.settings, "etag_enabled", True)
+
+
+def test_make_etag(versions, etag_enabled):
+    value = make_etag("organization", {"id": 1}, versions)
+
+    assert value.startswith('"') and value.endswith('"')
+    assert value == make_etag("organization", {"id": 1}, versions)
+    assert value != make_etag("organization", {"id": 2}, versions)
+    assert value != make_etag("organizations", {"id": 1}, versions)
+    assert etag_matches(value, value)
+
+
+def test_make_etag_changes_with_versions(versions, etag_enabled):
+    before = make_etag("organization", {"id": 1}, versions)
+    versions.versions["organization"] = 6
+
+    assert make_etag("organization", {"id": 1}, versions) != before
+
+
+def test_make_etag_unknown_versions(versions, etag_enabled):
+    versions.versions = None
+
+    assert make_etag("organization", {"id": 1}, versions) is None
+
+
+def test_make_etag_disabled(versions, monkeypatch):
+    monkeypatch.setattr(etag.settings, "etag_enabled", False)
+
+    assert make_etag("organization", {"id": 1}, versions) is None
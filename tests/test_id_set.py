@@ -0,0 +1,146 @@
+import random
+
+import pytest
+
+from app.cache import id_set
+from app.cache.id_set import IdFilter, IdSet, intersect_filters
+
+
+def random_ids(rng: random.Random, size: int, upper: int) -> list[int]:
+    return rng.sample(range(1, upper), size)
+
+
+def expected(first: list[int], second: list[int]) -> list[int]:
+    return sorted(set(first) & set(second))
+
+
+@pytest.fixture(params=[0, 1, 2])
+def rng(request):
+    return random.Random(request.param)
+
+
+def test_from_iterable_sorts_and_deduplicates():
+    ids = IdSet.from_iterable([5, 1, 3, 5, 1])
+
+    assert ids.tolist() == [1, 3, 5]
+    assert len(ids) == 3
+    assert 3 in ids
+    assert 4 not in ids
+    assert 0 not in ids
+    assert 6 not in ids
+
+
+def test_after():
+    ids = IdSet.from_sorted([1, 3, 5, 7])
+
+    assert list(ids.after(3)) == [5, 7]
+    assert list(ids.after(3.5)) == [5, 7]
+    assert list(ids.after(0)) == [1, 3, 5, 7]
+    assert list(ids.after(7)) == []
+
+
+def test_empty_intersection():
+    ids = IdSet.from_sorted([1, 2, 3])
+
+    assert not ids & IdSet.empty()
+    assert not IdSet.empty() & ids
+    assert not ids & IdSet.from_sorted([4, 5])
+
+
+@pytest.mark.parametrize(("small", "large"), [(10, 5000), (1, 100), (50, 50 * 32)])
+def test_probe_strategy(monkeypatch, rng, small, large):
+    """Маленькое множество ищется бинарным поиском в большом."""
+
+    first = random_ids(rng, small, 20000)
+    second = random_ids(rng, large, 20000) + first[: small // 2]
+    probe_calls = []
+    probe = id_set._probe
+    monkeypatch.setattr(
+        id_set, "_probe", lambda *args: probe_calls.append(args) or probe(*args)
+    )
+
+    result = IdSet.from_iterable(first) & IdSet.from_iterable(second)
+
+    assert probe_calls
+    assert result.tolist() == expected(first, second)
+
+
+@pytest.mark.parametrize(("small", "large"), [(100, 200), (1000, 1000), (300, 9000)])
+def test_hash_strategy(monkeypatch, rng, small, large):
+    """Без numpy множества сравнимого размера пересекаются фильтрацией по хешу."""
+
+    monkeypatch.setattr(id_set, "numpy", None)
+    first = random_ids(rng, small, 20000)
+    second = random_ids(rng, large, 20000)
+
+    assert (IdSet.from_iterable(first) & IdSet.from_iterable(second)).tolist() == (
+        expected(first, second)
+    )
+    assert (IdSet.from_iterable(second) & IdSet.from_iterable(first)).tolist() == (
+        expected(first, second)
+    )
+
+
+@pytest.mark.parametrize(("small", "large"), [(4096, 4096), (5000, 60000)])
+def test_numpy_strategy(monkeypatch, rng, small, large):
+    numpy = pytest.importorskip("numpy")
+    calls = []
+    intersect1d = numpy.intersect1d
+    monkeypatch.setattr(
+        numpy,
+        "intersect1d",
+        lambda *args, **kwargs: calls.append(args) or intersect1d(*args, **kwargs),
+    )
+    first = random_ids(rng, small, 200000)
+    second = random_ids(rng, large, 200000)
+
+    result = IdSet.from_iterable(first) & IdSet.from_iterable(second)
+
+    assert calls
+    assert result.tolist() == expected(first, second)
+
+
+def test_strategies_agree(monkeypatch, rng):
+    first = IdSet.from_iterable(random_ids(rng, 5000, 50000))
+    second = IdSet.from_iterable(random_ids(rng, 6000, 50000))
+    with_numpy = first & second
+
+    monkeypatch.setattr(id_set, "numpy", None)
+
+    assert first & second == with_numpy
+
+
+def test_intersect_filters_without_filters():
+    assert intersect_filters([]) is None
+
+
+def test_intersect_filters_order_and_short_circuit():
+    loaded = []
+
+    def id_filter(name: str, estimate: int, ids: list[int]) -> IdFilter:
+        def load() -> IdSet:
+            loaded.append(name)
+            return IdSet.from_iterable(ids)
+
+        return IdFilter(name=name, estimate=estimate, load=load)
+
+    result = intersect_filters(
+        [
+            id_filter("large", 1000, range(1, 1000)),
+            id_filter("small", 2, [10, 20]),
+            id_filter("medium", 50, [20, 30]),
+        ]
+    )
+    assert result.tolist() == [20]
+    assert loaded == ["small", "medium", "large"]
+
+    loaded.clear()
+    result = intersect_filters(
+        [
+            id_filter("large", 1000, range(1, 1000)),
+            id_filter("small", 2, [10]),
+            id_filter("medium", 50, [20, 30]),
+        ]
+    )
+    assert not result
+    assert loaded == ["small", "medium"]
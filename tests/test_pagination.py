@@ -0,0 +1,91 @@
+import base64
+import json
+
+import pytest
+
+from app.queries.pagination import (
+    INT32_MAX,
+    INT32_MIN,
+    InvalidCursorError,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+def raw_cursor(payload: str) -> str:
+    """Курсор с произвольным содержимым (как у подделанного клиентом)."""
+
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        {"id": 1},
+        {"id": INT32_MAX},
+        {"id": INT32_MIN},
+        {"similarity": 0.25, "id": 7},
+        {"distance": 1.5, "id": 3},
+        {"distance": 0, "id": 3},
+    ],
+)
+def test_round_trip(values):
+    cursor = encode_cursor(values)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, list(values)) == values
+
+
+def test_key_order_does_not_matter():
+    cursor = encode_cursor({"similarity": 0.5, "id": 1})
+
+    assert decode_cursor(cursor, ["id", "similarity"]) == {"similarity": 0.5, "id": 1}
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "!!!",
+        raw_cursor("not json"),
+        raw_cursor("[1, 2]"),
+        raw_cursor('"id"'),
+    ],
+)
+def test_malformed_cursor(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, ["id"])
+
+
+@pytest.mark.parametrize(
+    ("values", "names"),
+    [
+        ({"id": 1}, ["similarity", "id"]),
+        ({"similarity": 0.5, "id": 1}, ["id"]),
+        ({"distance": 0.5, "id": 1}, ["similarity", "id"]),
+    ],
+)
+def test_cursor_for_other_sorting(values, names):
+    with pytest.raises(InvalidCursorError, match="sorting"):
+        decode_cursor(encode_cursor(values), names)
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        '{"id": 1.5}',
+        '{"id": 1.0}',
+        '{"id": true}',
+        '{"id": "1"}',
+        '{"id": null}',
+        f'{{"id": {2**40}}}',
+        f'{{"id": {INT32_MAX + 1}}}',
+        f'{{"id": {INT32_MIN - 1}}}',
+        '{"similarity": "high", "id": 1}',
+        '{"similarity": false, "id": 1}',
+    ],
+)
+def test_invalid_values(payload):
+    names = list(json.loads(payload))
+
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(raw_cursor(payload), names)
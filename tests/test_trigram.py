@@ -0,0 +1,77 @@
+import struct
+
+import pytest
+
+from app.cache.trigram import similarity, substring_trigrams, word_trigrams
+
+
+def float4(value: float) -> float:
+    return struct.unpack("f", struct.pack("f", value))[0]
+
+
+def trigram_similarity(first: str, second: str) -> float:
+    """similarity() из pg_trgm через функции модуля."""
+
+    first_trigrams = word_trigrams(first)
+    second_trigrams = word_trigrams(second)
+    return similarity(
+        len(first_trigrams & second_trigrams),
+        len(first_trigrams),
+        len(second_trigrams),
+    )
+
+
+@pytest.mark.parametrize(
+    ("text", "trigrams"),
+    [
+        # SELECT show_trgm('word')
+        ("word", {"  w", " wo", "wor", "ord", "rd "}),
+        ("Cat", {"  c", " ca", "cat", "at "}),
+        ("a", {"  a", " a "}),
+        ("a-b", {"  a", " a ", "  b", " b "}),
+        ("ООО Рога", {"  о", " оо", "ооо", "оо ", "  р", " ро", "рог", "ога", "га "}),
+        ("", set()),
+        ("--- !!!", set()),
+    ],
+)
+def test_word_trigrams(text, trigrams):
+    assert word_trigrams(text) == trigrams
+
+
+def test_word_trigrams_ignore_underscore():
+    assert word_trigrams("a_b") == word_trigrams("a b")
+
+
+def test_substring_trigrams():
+    assert substring_trigrams("рога") == {"рог", "ога"}
+    assert substring_trigrams("ро") == set()
+
+
+def test_similarity_matches_pg_trgm():
+    # SELECT similarity('word', 'two words') = 0.36363637
+    value = trigram_similarity("word", "two words")
+
+    assert f"{value:.8g}" == "0.36363637"
+    assert trigram_similarity("word", "word") == 1.0
+    assert trigram_similarity("word", "cat") == 0.0
+
+
+def test_similarity_without_trigrams():
+    assert similarity(0, 0, 5) == 0.0
+    assert similarity(0, 5, 0) == 0.0
+
+
+def test_similarity_is_float4():
+    value = similarity(1, 2, 2)
+
+    assert value == float4(1 / 3)
+    assert value != 1 / 3
+
+
+def test_threshold_compares_float4_value():
+    """pg_trgm сравнивает с порогом значение float4, а не точную дробь."""
+
+    threshold = 0.333333343
+
+    assert 1 / 3 < threshold
+    assert similarity(1, 2, 2) >= threshold